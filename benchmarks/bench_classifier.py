@@ -0,0 +1,51 @@
+"""Throughput of the commit classifier on large commit ranges.
+
+Run with `python benchmarks/bench_classifier.py [number of commits]`.
+"""
+import sys
+import time
+
+from synthetic import synthetic_messages
+
+from molting.classify import CommitClassifier
+
+
+def legacy_guess_change_type(lines):
+    """The keyword matching molting used before the compiled classifier."""
+    current_guess = "patch"
+    minor_words = ["feat", "change", "improve"]
+    for line in lines:
+        if "breaking" in line.lower():
+            return "major"
+        if any(minor_word in line.lower() for minor_word in minor_words):
+            current_guess = "minor"
+    return current_guess
+
+
+def measure(function, messages, repeat: int = 3) -> float:
+    """Best wall time out of `repeat` runs, in seconds."""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function(messages)
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main(count: int = 100_000):
+    """Print the throughput of both classifiers for every change type."""
+    classifier = CommitClassifier()
+    for change_type in ("patch", "minor", "major"):
+        messages = synthetic_messages(count, change_type)
+        lines = [line for message in messages for line in message.splitlines()]
+        compiled = measure(classifier.classify, messages)
+        legacy = measure(legacy_guess_change_type, lines)
+        print(
+            f"{change_type:>5}: compiled {count / compiled:>12,.0f} commits/s "
+            f"({compiled:.3f}s), legacy {count / legacy:>12,.0f} commits/s "
+            f"({legacy:.3f}s)"
+        )
+
+
+if __name__ == "__main__":
+    main(*map(int, sys.argv[1:]))
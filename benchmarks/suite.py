@@ -0,0 +1,219 @@
+"""Benchmark suite timing molting on synthetic projects at scale.
+
+Run with `python benchmarks/suite.py [--scale 0.01] [--output results.json]`.
+The results are saved as JSON, so that runs of different molting versions can
+be compared with `python benchmarks/suite.py --compare old.json new.json`.
+"""
+import argparse
+import contextlib
+import io
+import json
+import platform
+import shutil
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+from synthetic import Sizes, write_project
+
+import molting
+from molting import log
+from molting.git import Git
+from molting.main import (
+    Project,
+    bump,
+    get_commit_messages,
+    guess_change_type,
+    update_project_files,
+)
+
+
+def measure(function: Callable[[int], None], repeat: int) -> Dict[str, object]:
+    """Time `repeat` runs of a function, which is passed the run number."""
+    timings: List[float] = []
+    for run in range(repeat):
+        start = time.perf_counter()
+        function(run)
+        timings.append(time.perf_counter() - start)
+    return {
+        "best": min(timings),
+        "mean": sum(timings) / len(timings),
+        "runs": timings,
+    }
+
+
+def plan_bump(
+    directory: Path, git_directory: Path, max_workers: Optional[int]
+) -> Callable[[int], None]:
+    """Build a benchmark planning a bump with at most `max_workers` phases at once."""
+
+    def benchmark(run):
+        # Without the saved commit scan, so that git has to read the history
+        scan = git_directory / "molting" / "commit-scan.json"
+        if scan.exists():
+            scan.unlink()
+        project = Project(directory, dry_run=True)
+        with project.transaction():
+            update_project_files(project, max_workers=max_workers)
+        project.git.close()
+
+    return benchmark
+
+
+def commit_messages(
+    directory: Path, start: str, read_objects: bool
+) -> Callable[[int], None]:
+    """Build a benchmark reading the commit messages since `start`."""
+
+    def benchmark(run):
+        with Git(directory, read_objects=read_objects) as git:
+            get_commit_messages(start, git=git)
+
+    return benchmark
+
+
+def benchmarks(directory: Path) -> Dict[str, Callable[[int], None]]:
+    """Build the benchmarks for a synthetic project.
+
+    Every benchmark creates its own `Project`, so no run profits from caches
+    warmed by a previous one, except for the commit scan saved in the git
+    directory, which `saved_commit_scan` measures.
+    """
+    with Git(directory) as git:
+        lines = get_commit_messages("v0.1.0", git=git)
+        git_directory = git.git_directory
+        # A release 100 commits ago, like most bumps start from
+        recent = git.run("rev-parse", "HEAD~100").stdout.strip()
+
+    def extract_changelog_notes(run):
+        Project(directory, dry_run=True).extract_changelog_notes()
+
+    def update_changelog(run):
+        Project(directory, dry_run=True).update_changelog("0.1.0", "0.2.0")
+
+    def add_changelog_notes(run):
+        Project(directory, dry_run=True).add_changelog_notes("\n - More notes")
+
+    def saved_commit_scan(run):
+        project = Project(directory, dry_run=True)
+        project.guess_change_type("v0.1.0")
+        project.git.close()
+
+    def bump_dry_run(run):
+        # The diff of the dry run is part of the measurement, but not printed
+        with contextlib.redirect_stdout(io.StringIO()):
+            bump(directory, dry_run=True)
+
+    def update_init(run):
+        # A new version every run, so the files are actually rewritten
+        Project(directory, dry_run=False).update_init(f"9.9.{run}", "synthetic")
+
+    return {
+        "get_commit_messages": commit_messages(directory, "v0.1.0", False),
+        "get_commit_messages_in_process": commit_messages(directory, "v0.1.0", True),
+        "get_recent_commit_messages": commit_messages(directory, recent, False),
+        "get_recent_commit_messages_in_process": commit_messages(
+            directory, recent, True
+        ),
+        "guess_change_type": lambda run: guess_change_type(lines),
+        "saved_commit_scan": saved_commit_scan,
+        "extract_changelog_notes": extract_changelog_notes,
+        "update_changelog": update_changelog,
+        "add_changelog_notes": add_changelog_notes,
+        "update_init": update_init,
+        "plan_bump_sequential": plan_bump(directory, git_directory, 1),
+        "plan_bump_concurrent": plan_bump(directory, git_directory, None),
+        "bump_dry_run": bump_dry_run,
+    }
+
+
+def run_suite(sizes: Sizes, repeat: int, selected: List[str]) -> Dict[str, object]:
+    """Generate a synthetic project and time every selected benchmark.
+
+    Args:
+        sizes (Sizes): Size of the synthetic project
+        repeat (int): Number of runs of each benchmark
+        selected (List[str]): Benchmarks to run, all of them if empty
+
+    Returns:
+        Dict[str, object]: Results, ready to be saved as JSON
+    """
+    directory = Path(tempfile.mkdtemp(prefix="molting-bench-"))
+    try:
+        start = time.perf_counter()
+        write_project(directory / "project", sizes)
+        print(f"Generated {sizes} in {time.perf_counter() - start:.1f}s")
+        results = {}
+        for name, function in benchmarks(directory / "project").items():
+            if selected and name not in selected:
+                continue
+            results[name] = measure(function, repeat)
+            print(f"{name:>24}: {results[name]['best']:.4f}s")
+    finally:
+        shutil.rmtree(directory)
+    return {
+        "molting_version": molting.__version__,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "date": datetime.now(timezone.utc).isoformat(),
+        "sizes": sizes._asdict(),
+        "repeat": repeat,
+        "results": results,
+    }
+
+
+def compare(old_path: Path, new_path: Path):
+    """Print the change in best time of every benchmark between two runs."""
+    old = json.loads(old_path.read_text())
+    new = json.loads(new_path.read_text())
+    print(f"{old['molting_version']} -> {new['molting_version']}")
+    for name, result in new["results"].items():
+        if name not in old["results"]:
+            continue
+        before = old["results"][name]["best"]
+        after = result["best"]
+        print(f"{name:>24}: {before:.4f}s -> {after:.4f}s ({after / before:.2f}x)")
+
+
+def main():
+    """Handle command-line arguments."""
+    parser = argparse.ArgumentParser("Benchmarks molting on synthetic projects.")
+    parser.add_argument(
+        "--scale",
+        type=float,
+        default=1.0,
+        help="Multiplier of the default project size (100k commits)",
+    )
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per benchmark")
+    parser.add_argument(
+        "--benchmark",
+        action="append",
+        default=[],
+        help="Benchmark to run. Repeat for several, defaults to all of them.",
+    )
+    parser.add_argument("--output", type=Path, help="File to save the results to")
+    parser.add_argument(
+        "--compare",
+        nargs=2,
+        type=Path,
+        metavar=("OLD", "NEW"),
+        help="Compare two saved results instead of running the benchmarks",
+    )
+    args = parser.parse_args()
+    if args.compare:
+        compare(*args.compare)
+        return
+    log.configure("warning")
+    results = run_suite(Sizes().scaled(args.scale), args.repeat, args.benchmark)
+    output = json.dumps(results, indent=2)
+    if args.output:
+        args.output.write_text(f"{output}\n")
+    else:
+        sys.stdout.write(f"{output}\n")
+
+
+if __name__ == "__main__":
+    main()
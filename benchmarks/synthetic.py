@@ -0,0 +1,161 @@
+"""Generators for synthetic projects at scale."""
+import random
+import subprocess
+import textwrap
+from pathlib import Path
+from typing import List, NamedTuple
+
+SUBJECTS = [
+    "Fix a bug in {}",
+    "Update the changelog for {}",
+    "Refactor {}",
+    "docs: describe {}",
+    "chore(deps): bump {}",
+    "Add tests for {}",
+]
+MINOR_SUBJECT = "feat({}): support more options"
+MAJOR_SUBJECT = "refactor({})!: rename the public API"
+REPOSITORY = "https://github.com/example/synthetic/"
+
+
+class Sizes(NamedTuple):
+    """Size of a synthetic project."""
+
+    commits: int = 100_000
+    releases: int = 5_000
+    init_files: int = 5_000
+
+    def scaled(self, scale: float) -> "Sizes":
+        """Returns the sizes multiplied by `scale`, keeping at least one of each."""
+        return Sizes(*(max(1, int(size * scale)) for size in self))
+
+
+def synthetic_messages(count: int, change_type: str, seed: int = 0) -> List[str]:
+    """Generate commit messages, with the deciding commit at the very end."""
+    rng = random.Random(seed)
+    messages = [
+        f"{rng.choice(SUBJECTS).format(index)}\n\nSome longer description {index}."
+        for index in range(count - 1)
+    ]
+    if change_type == "minor":
+        messages.append(MINOR_SUBJECT.format(count))
+    elif change_type == "major":
+        messages.append(MAJOR_SUBJECT.format(count))
+    else:
+        messages.append(SUBJECTS[0].format(count))
+    return messages
+
+
+def _data(text: str) -> bytes:
+    encoded = text.encode("utf-8")
+    return b"data %d\n%s\n" % (len(encoded), encoded)
+
+
+def write_history(directory: Path, messages: List[str], tag: str = "v0.1.0"):
+    """Create a git repository whose history holds one commit per message.
+
+    The history is written with a single `git fast-import`, which takes seconds
+    even for 100k commits. The first commit is tagged with `tag`.
+
+    Args:
+        directory (Path): Directory to create the repository in
+        messages (List[str]): Commit messages, oldest first
+        tag (str): Tag of the first commit
+    """
+    subprocess.run(["git", "init", "-q", str(directory)], check=True)
+    subprocess.run(
+        ["git", "symbolic-ref", "HEAD", "refs/heads/main"], cwd=directory, check=True
+    )
+    stream = []
+    for index, message in enumerate(messages, start=1):
+        stream.append(b"commit refs/heads/main\nmark :%d\n" % index)
+        stream.append(
+            b"committer Bench <bench@example.com> %d +0000\n" % (1_600_000_000 + index)
+        )
+        stream.append(_data(message))
+        if index == 1:
+            stream.append(b"M 644 inline README.md\n")
+            stream.append(_data("# Synthetic\n"))
+    stream.append(b"reset refs/tags/%s\nfrom :1\n\n" % tag.encode("utf-8"))
+    subprocess.run(
+        ["git", "fast-import", "--quiet"],
+        input=b"".join(stream),
+        cwd=directory,
+        check=True,
+    )
+    subprocess.run(["git", "reset", "-q", "--hard"], cwd=directory, check=True)
+
+
+def changelog_text(releases: int, notes_per_release: int = 20) -> str:
+    """Generate a changelog with many releases and a long link footer.
+
+    Args:
+        releases (int): Number of released versions
+        notes_per_release (int): Bullet points in each section
+
+    Returns:
+        str: Contents of `CHANGELOG.md`, about 1MB per 1000 releases
+    """
+    versions = [f"0.{release}.0" for release in range(releases, 0, -1)]
+    parts = [
+        "# Changelog\n\nAll notable changes to this project will be documented "
+        "in this file.\n\n## [Unreleased]\n\n- Some unreleased change\n"
+    ]
+    for version in versions:
+        parts.append(f"\n## [{version}] - 2022-01-01\n\n")
+        parts.extend(
+            f"- Change number {note} of a long list, released in {version}\n"
+            for note in range(notes_per_release)
+        )
+    parts.append(f"\n[Unreleased]: {REPOSITORY}compare/v{versions[0]}...HEAD\n")
+    parts.extend(
+        f"[{newer}]: {REPOSITORY}compare/v{older}...v{newer}\n"
+        for newer, older in zip(versions, versions[1:])
+    )
+    return "".join(parts)
+
+
+def write_package_tree(root: Path, init_files: int, version: str, every: int = 100):
+    """Create a package tree of `__init__.py` files, 50 packages per directory.
+
+    Every `every`-th file holds a `__version__` string.
+
+    Args:
+        root (Path): Top-level package directory
+        init_files (int): Number of `__init__.py` files to create
+        version (str): Version written to the files holding one
+        every (int): How often a file holds a version string
+    """
+    directories = [root]
+    for index in range(1, init_files):
+        directories.append(directories[(index - 1) // 50] / f"package_{index}")
+    for index, directory in enumerate(directories):
+        directory.mkdir(parents=True, exist_ok=True)
+        text = f'"""Package {index}."""\n'
+        if index % every == 0:
+            text += f'__version__ = "{version}"\n'
+        (directory / "__init__.py").write_text(text)
+
+
+def write_project(directory: Path, sizes: Sizes, version: str = "0.1.0"):
+    """Create a synthetic project: git history, changelog and package tree.
+
+    Args:
+        directory (Path): Project root, created if needed
+        sizes (Sizes): Size of the project
+        version (str): Current version of the project
+    """
+    directory.mkdir(parents=True, exist_ok=True)
+    write_history(directory, synthetic_messages(sizes.commits, "minor"))
+    (directory / "pyproject.toml").write_text(
+        textwrap.dedent(
+            f"""\
+            [tool.poetry]
+            name = "synthetic"
+            version = "{version}"
+            repository = "{REPOSITORY}"
+            """
+        )
+    )
+    (directory / "CHANGELOG.md").write_text(changelog_text(sizes.releases))
+    write_package_tree(directory / "src" / "synthetic", sizes.init_files, version)
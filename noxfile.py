@@ -6,7 +6,7 @@ import nox
 
 package = "molting"
 nox.options.sessions = "lint", "safety", "tests"
-locations = "src", "tests", "noxfile.py"
+locations = "src", "tests", "benchmarks", "noxfile.py"
 
 
 def install_with_constraints(session, *args, **kwargs):
@@ -103,3 +103,11 @@ def tests(session):
         "pytest-mock",
     )
     session.run("pytest", *args)
+
+
+@nox.session
+def benchmarks(session):
+    """Run the benchmark suite on synthetic projects, saving the results as JSON."""
+    args = session.posargs or ["--output", "benchmark-results.json"]
+    session.run("poetry", "install", "--no-dev", external=True)
+    session.run("python", "benchmarks/suite.py", *args)
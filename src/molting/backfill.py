@@ -0,0 +1,134 @@
+"""Changelog sections for every past release, from a single pass over history.
+
+Projects adopting molting often have years of release tags and no changelog.
+Rather than reading the commits of every release range on its own, the whole
+history is streamed once from `git log`, children before parents, with the
+release tags as decorations. Every commit belongs to the first release that
+includes it: the release of the tag on the commit itself, or the earliest
+release of its children, which are all read before it. Commits of no release
+are the unreleased changes.
+"""
+from contextlib import closing
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from molting.git import Git
+from molting.log import logger
+from molting.version import TagIndex
+
+# Fields of a commit record are separated by the ASCII unit separator, and
+# records by NUL (`-z`)
+FIELD_SEPARATOR = "\x1f"
+RELEASES_FORMAT = "%H%x1f%P%x1f%cd%x1f%D%x1f%B"
+TAG_DECORATION = "tag: "
+
+
+class Release(NamedTuple):
+    """A release, and the commits it was the first to include.
+
+    `lines` are the non-empty lines of the commit messages, newest commit
+    first. `date` is the date of the tagged commit, as `YYYY-MM-DD`.
+    """
+
+    tag: str
+    version: str
+    date: str
+    lines: List[str]
+
+
+class ReleaseHistory(NamedTuple):
+    """Every release of a project, newest first, and the unreleased changes."""
+
+    releases: List[Release]
+    unreleased: List[str]
+
+
+def read_releases(git: Git, tags: TagIndex) -> ReleaseHistory:
+    """Split the commits of the whole history into releases, in one pass.
+
+    Args:
+        git (Git): Repository to read
+        tags (TagIndex): Release tags of the project
+
+    Returns:
+        ReleaseHistory: Commits of every release, and of none
+    """
+    # Releases are ranked by version, so that the earliest release including
+    # a commit is the one of lowest rank
+    ranks = {tag: rank for rank, tag in enumerate(tags.tags)}
+    pattern = f"refs/tags/{tags.prefix}v*"
+    records = git.stream(
+        "log",
+        "-z",
+        "--topo-order",
+        "--date=short",
+        f"--decorate-refs={pattern}",
+        f"--format={RELEASES_FORMAT}",
+        "HEAD",
+        f"--tags={tags.prefix}v*",
+        check=False,
+    )
+    dates: Dict[int, str] = {}
+    lines: Dict[Optional[int], List[str]] = {None: []}
+    # Earliest release including each commit not read yet, from its children
+    pending: Dict[str, int] = {}
+    count = 0
+    with closing(records):
+        for record in records:
+            record = record.lstrip(b"\n")
+            if not record:
+                continue
+            count += 1
+            fields = record.decode("utf-8", "replace").split(FIELD_SEPARATOR, 4)
+            sha, parents, date, decorations, message = fields
+            rank = pending.pop(sha, None)
+            for decoration in decorations.split(", "):
+                tag_rank = ranks.get(decoration[len(TAG_DECORATION) :])
+                if decoration.startswith(TAG_DECORATION) and tag_rank is not None:
+                    dates[tag_rank] = date
+                    rank = tag_rank if rank is None else min(rank, tag_rank)
+            if rank is not None:
+                for parent in parents.split():
+                    pending[parent] = min(pending.get(parent, rank), rank)
+            lines.setdefault(rank, []).extend(
+                line for line in message.splitlines() if line.strip()
+            )
+    logger.debug("Split {} commits into {} releases", count, len(dates))
+    releases = [
+        Release(tag, str(tags.versions[rank]), dates[rank], lines.get(rank, []))
+        for rank, tag in reversed(list(enumerate(tags.tags)))
+        # Tags of trees or blobs, never found on a commit
+        if rank in dates
+    ]
+    return ReleaseHistory(releases, lines[None])
+
+
+def render_releases(history: ReleaseHistory, repository: str) -> Tuple[str, str]:
+    """Returns the sections of the releases, and the links to compare them.
+
+    Notes are the lines of the commit messages, like the ones of a bump, and
+    every release but the first links to the changes since the previous one.
+
+    Args:
+        history (ReleaseHistory): Releases to write
+        repository (str): URL of the repository, ending with a `/`
+
+    Returns:
+        Tuple[str, str]: The text of the sections, and the link reference lines
+    """
+    sections = []
+    links = []
+    releases = history.releases
+    for index, release in enumerate(releases):
+        heading = f"## [{release.version}] - {release.date}"
+        sections.append("\n".join([heading, "", *render_notes(release.lines)]))
+        if index + 1 < len(releases):
+            previous = releases[index + 1].tag
+            links.append(
+                f"[{release.version}]: {repository}compare/{previous}...{release.tag}"
+            )
+    return "\n\n".join(section.rstrip() for section in sections), "\n".join(links)
+
+
+def render_notes(lines: List[str]) -> List[str]:
+    """Returns the lines of commit messages as changelog notes."""
+    return [f" - {line}" for line in lines]
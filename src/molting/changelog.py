@@ -0,0 +1,405 @@
+"""Bounded-memory access to `CHANGELOG.md`.
+
+Only the head of the changelog (up to the first released section) and the
+link reference footer are ever read, so the cost of a release doesn't grow
+with the amount of release history kept in the file.
+
+The notes of older releases are found through an index of the byte range of
+every section, cached in `.molting_cache` next to the changelog and rebuilt
+whenever the changelog changes. Old releases can be moved to yearly archive
+files, e.g. `CHANGELOG-2021.md`, which are searched as well.
+"""
+import re
+from pathlib import Path
+from typing import BinaryIO, Dict, List, NamedTuple, Optional, Tuple
+
+from molting.files import Edit, splice_file, write_file
+from molting.log import logger
+
+CHANGES_TITLES = ["Unreleased", "Latest Changes"]
+RE_LINK = re.compile(r"^\[(.*)\]: (.*)$")
+RE_SECTION = re.compile(r"^## \[([^\]]+)\](?:\s+-\s+(\d{4})-\d{2}-\d{2})?")
+
+FOOTER_CHUNK_SIZE = 8192
+INDEX_FORMAT = 1
+CACHE_DIRECTORY = ".molting_cache"
+
+
+class ChangelogLayout(NamedTuple):
+    """Positions of the parts of a changelog that molting edits.
+
+    All offsets are in bytes.
+    """
+
+    title: Optional[str]
+    title_end: Optional[int]
+    notes: List[str]
+    head_end: int
+    title_link: Optional[Tuple[int, int]]
+    size: int
+
+
+def _scan_head(handle: BinaryIO) -> Tuple[Optional[str], Optional[int], List[str], int]:
+    """Read lines until the first released section after the changes title.
+
+    Headings inside fenced code blocks, e.g. a description of the heading
+    format, are ignored.
+
+    Returns:
+        Tuple: The changes title, the offset right after its heading, the notes
+        found under it and the offset where the head ends.
+    """
+    headings = {f"## [{title}]": title for title in CHANGES_TITLES}
+    title = None
+    title_end = None
+    notes = []
+    position = 0
+    in_fence = False
+    for raw_line in handle:
+        line = raw_line.decode("utf-8").rstrip("\r\n")
+        is_fence = line.startswith("```")
+        if is_fence:
+            in_fence = not in_fence
+        is_heading = not in_fence and not is_fence
+        if title is None:
+            if is_heading and line in headings:
+                title = headings[line]
+                title_end = position + len(line.encode("utf-8"))
+        elif is_heading and line.startswith("## ["):
+            # First released version, no need to look at the rest of the lines
+            break
+        elif line.strip() and not RE_LINK.fullmatch(line):
+            notes.append(line)
+        position += len(raw_line)
+    return title, title_end, notes, position
+
+
+def _scan_footer(handle: BinaryIO, size: int, title: str) -> Optional[Tuple[int, int]]:
+    """Search the link references at the end of the file for the title link.
+
+    The file is read backwards in chunks, stopping at the first line that isn't
+    blank or a link reference.
+
+    Returns:
+        Optional[Tuple[int, int]]: Span of the `[title]: ...` line, without its
+        line ending
+    """
+    link_prefix = f"[{title}]:".encode("utf-8")
+    position = size
+    remainder = b""
+    while position > 0:
+        read_size = min(FOOTER_CHUNK_SIZE, position)
+        position -= read_size
+        handle.seek(position)
+        chunk = handle.read(read_size) + remainder
+        lines = chunk.split(b"\n")
+        start = position
+        if position > 0:
+            # The first line may continue in the previous chunk
+            remainder = lines.pop(0)
+            start += len(remainder) + 1
+        located = []
+        for line in lines:
+            located.append((start, line.rstrip(b"\r")))
+            start += len(line) + 1
+        for line_start, line in reversed(located):
+            if not line.strip():
+                continue
+            if RE_LINK.fullmatch(line.decode("utf-8")) is None:
+                return None
+            if line.startswith(link_prefix):
+                return line_start, line_start + len(line)
+    return None
+
+
+class ChangelogSection(NamedTuple):
+    """Byte range of a `## [title]` section of a changelog.
+
+    `end` is the end of the last line of the section, `stop` where the next
+    section, or the link reference footer, starts.
+    """
+
+    title: str
+    year: Optional[int]
+    start: int
+    end: int
+    stop: int
+
+
+class ChangelogIndex(NamedTuple):
+    """Sections and link references of a changelog, in the order of the file."""
+
+    stat: Tuple[int, int]
+    sections: List[ChangelogSection]
+    links: Dict[str, Tuple[int, int]]
+
+    def find(self, title: str) -> Optional[ChangelogSection]:
+        """Returns the section of a version, e.g. `1.2.3` or `v1.2.3`."""
+        for candidate in (title, title[1:] if title.startswith("v") else None):
+            for section in self.sections:
+                if section.title == candidate:
+                    return section
+        return None
+
+
+def _index_lines(handle: BinaryIO) -> Tuple[List[ChangelogSection], Dict]:
+    """Locate every section and link reference in a single pass."""
+    sections = []
+    links = {}
+    current = None
+    footer_start = None
+    position = 0
+    in_fence = False
+    for raw_line in handle:
+        line = raw_line.decode("utf-8").rstrip("\r\n")
+        line_end = position + len(raw_line.rstrip(b"\r\n"))
+        is_fence = line.startswith("```")
+        if is_fence:
+            in_fence = not in_fence
+        is_markup = not in_fence and not is_fence
+        link = RE_LINK.fullmatch(line) if is_markup else None
+        if is_markup and line.startswith("## "):
+            if current is not None:
+                sections.append(current._replace(stop=position))
+            match = RE_SECTION.match(line)
+            current = None
+            if match:
+                year = int(match[2]) if match[2] else None
+                current = ChangelogSection(match[1], year, position, line_end, line_end)
+            footer_start = None
+        elif link is not None:
+            links[link[1]] = (position, position + len(raw_line))
+            if footer_start is None:
+                footer_start = position
+        elif line.strip() and current is not None:
+            current = current._replace(end=line_end)
+            footer_start = None
+        position += len(raw_line)
+    if current is not None:
+        stop = footer_start if footer_start is not None else position
+        sections.append(current._replace(stop=max(stop, current.end)))
+    return sections, links
+
+
+class Changelog:
+    """A `CHANGELOG.md` following the Keep a Changelog format."""
+
+    path: Path
+
+    def __init__(self, path: Path) -> None:
+        """Initialize Changelog."""
+        self.path = Path(path)
+
+    def scan(self) -> ChangelogLayout:
+        """Locate the unreleased section and its link reference.
+
+        Returns:
+            ChangelogLayout: Positions of the editable parts of the changelog
+        """
+        with open(self.path, "rb") as handle:
+            title, title_end, notes, head_end = _scan_head(handle)
+            handle.seek(0, 2)
+            size = handle.tell()
+            title_link = None
+            if title is not None:
+                title_link = _scan_footer(handle, size, title)
+        logger.debug(
+            "Scanned {} of {} bytes of {} for [{}]", head_end, size, self.path, title
+        )
+        return ChangelogLayout(title, title_end, notes, head_end, title_link, size)
+
+    @staticmethod
+    def insert_after_title(layout: ChangelogLayout, text: str) -> Edit:
+        """Returns an edit inserting a new paragraph below the changes title.
+
+        Args:
+            layout (ChangelogLayout): Scanned changelog
+            text (str): Text of the paragraph
+
+        Raises:
+            ValueError: The changelog has no unreleased changes section.
+
+        Returns:
+            Edit: Insertion right after the changes title
+        """
+        if layout.title_end is None:
+            raise ValueError("Could not find an unreleased changes section")
+        return layout.title_end, layout.title_end, f"\n\n{text}".encode("utf-8")
+
+    @staticmethod
+    def replace_title_link(layout: ChangelogLayout, links: List[str]) -> Edit:
+        """Returns an edit replacing the link reference of the changes title.
+
+        If the changelog doesn't have a link for the changes title yet, the
+        links are appended to the end of the file instead.
+
+        Args:
+            layout (ChangelogLayout): Scanned changelog
+            links (List[str]): Link reference lines to write
+
+        Returns:
+            Edit: Replacement of the title link
+        """
+        text = "\n".join(links)
+        if layout.title_link is None:
+            logger.debug("Didn't find [{}] section", layout.title)
+            return layout.size, layout.size, f"\n\n{text}".encode("utf-8")
+        logger.debug("Found [{}] section", layout.title)
+        start, end = layout.title_link
+        return start, end, text.encode("utf-8")
+
+    @property
+    def index_path(self) -> Path:
+        """File the section index is cached in."""
+        return self.path.parent / CACHE_DIRECTORY / f"{self.path.name}.index.json"
+
+    def _save_index(self, index: ChangelogIndex) -> None:
+        import json
+
+        cache = self.index_path.parent
+        try:
+            cache.mkdir(exist_ok=True)
+            # Keeps the cache out of git, and out of the release commit
+            ignore = cache / ".gitignore"
+            if not ignore.exists():
+                ignore.write_text("*\n")
+            data = {
+                "format": INDEX_FORMAT,
+                "stat": index.stat,
+                "sections": index.sections,
+                "links": index.links,
+            }
+            write_file(self.index_path, json.dumps(data).encode("utf-8"))
+        except OSError as error:
+            logger.debug("Couldn't save the changelog index: {}", error)
+
+    def _load_index(self, stat: Tuple[int, int]) -> Optional[ChangelogIndex]:
+        import json
+
+        try:
+            data = json.loads(self.index_path.read_text())
+        except (OSError, ValueError):
+            return None
+        if data.get("format") != INDEX_FORMAT or tuple(data["stat"]) != stat:
+            return None
+        return ChangelogIndex(
+            stat,
+            [ChangelogSection(*section) for section in data["sections"]],
+            {title: tuple(span) for title, span in data["links"].items()},
+        )
+
+    def index(self) -> ChangelogIndex:
+        """Returns the index of the sections, reading the file only if it changed.
+
+        Returns:
+            ChangelogIndex: Byte ranges of the sections and link references
+        """
+        stat_result = self.path.stat()
+        stat = (stat_result.st_mtime_ns, stat_result.st_size)
+        index = self._load_index(stat)
+        if index is None:
+            with open(self.path, "rb") as handle:
+                sections, links = _index_lines(handle)
+            index = ChangelogIndex(stat, sections, links)
+            logger.debug("Indexed {} sections of {}", len(sections), self.path)
+            self._save_index(index)
+        return index
+
+    @property
+    def archives(self) -> List[Path]:
+        """Yearly archives of the changelog, newest first."""
+        pattern = f"{self.path.stem}-[0-9][0-9][0-9][0-9]{self.path.suffix}"
+        return sorted(self.path.parent.glob(pattern), reverse=True)
+
+    def archive_path(self, year: int) -> Path:
+        """Returns the archive file of the releases of a year."""
+        return self.path.with_name(f"{self.path.stem}-{year}{self.path.suffix}")
+
+    def _read_range(self, start: int, end: int) -> str:
+        with open(self.path, "rb") as handle:
+            handle.seek(start)
+            return handle.read(end - start).decode("utf-8")
+
+    def release_notes(self, version: str) -> Optional[str]:
+        """Returns the notes of a release, also searching the yearly archives.
+
+        Only the section of the release is read, once the changelog is
+        indexed.
+
+        Args:
+            version (str): Version, with or without a leading `v`, or a changes
+              title like `Unreleased`
+
+        Returns:
+            Optional[str]: Text of the section below its heading, None if the
+            changelog has no section for the version
+        """
+        for changelog in (self, *map(Changelog, self.archives)):
+            section = changelog.index().find(version)
+            if section is not None:
+                text = changelog._read_range(section.start, section.end)
+                return text.partition("\n")[2].strip("\r\n")
+        return None
+
+    def archive(self, before_year: int, dry_run: bool = False) -> Dict[Path, List[str]]:
+        """Move the releases of the years before `before_year` to yearly archives.
+
+        Their link references move along with them. Archives that already
+        exist keep their releases, below the ones moved in.
+
+        Args:
+            before_year (int): First year whose releases stay in the changelog
+            dry_run (bool): Only report what would be moved
+
+        Returns:
+            Dict[Path, List[str]]: Titles of the releases moved to each archive
+        """
+        index = self.index()
+        by_year: Dict[int, List[ChangelogSection]] = {}
+        for section in index.sections:
+            if section.year is not None and section.year < before_year:
+                by_year.setdefault(section.year, []).append(section)
+        moved = {
+            self.archive_path(year): [section.title for section in sections]
+            for year, sections in by_year.items()
+        }
+        if dry_run or not by_year:
+            return moved
+        edits: List[Edit] = []
+        for year, sections in sorted(by_year.items()):
+            texts = [self._read_range(s.start, s.end) for s in sections]
+            # Link references inside a section move with the section itself
+            links = [
+                index.links[s.title]
+                for s in sections
+                if s.title in index.links
+                and not any(
+                    other.start <= index.links[s.title][0] < other.stop
+                    for other in index.sections
+                )
+            ]
+            link_texts = [self._read_range(*span).rstrip("\r\n") for span in links]
+            self._write_archive(self.archive_path(year), year, texts, link_texts)
+            edits.extend((s.start, s.stop, b"") for s in sections)
+            edits.extend((start, end, b"") for start, end in links)
+            logger.info(
+                "Archived {} releases to {}", len(sections), self.archive_path(year)
+            )
+        splice_file(self.path, edits)
+        return moved
+
+    def _write_archive(
+        self, path: Path, year: int, sections: List[str], links: List[str]
+    ) -> None:
+        text = "".join(f"{section}\n\n" for section in sections)
+        if path.exists():
+            existing = path.read_text()
+            match = re.search(r"^## \[", existing, re.MULTILINE)
+            position = match.start() if match else len(existing)
+            head, tail = existing[:position], existing[position:]
+            body = f"{head}{text}{tail}".rstrip("\n")
+        else:
+            body = f"# {self.path.stem.title()} {year}\n\n{text}".rstrip("\n")
+        if links:
+            body = f"{body}\n\n" + "\n".join(links)
+        write_file(path, f"{body}\n".encode("utf-8"))
@@ -0,0 +1,135 @@
+"""Classification of commit messages into semver change types."""
+import re
+from typing import Iterable, NamedTuple, Optional, Sequence, Tuple
+
+# Change types, from least to most significant
+CHANGE_TYPES = ("patch", "minor", "major")
+_RANKS = {change_type: rank for rank, change_type in enumerate(CHANGE_TYPES)}
+
+
+class Rule(NamedTuple):
+    """A pattern that marks a commit as a given change type.
+
+    Patterns are matched case-insensitively, with `^` matching at the start of
+    every line of the commit message. `hints` are lowercase substrings that
+    any match of the pattern contains; when every rule has hints, messages
+    containing none of them are skipped without running the patterns.
+    """
+
+    change_type: str
+    pattern: str
+    hints: Tuple[str, ...] = ()
+
+
+DEFAULT_RULES = (
+    # Conventional commits: `feat!: ...`, `fix(parser)!: ...`
+    Rule("major", r"^[a-z]+(?:\([^)\n]*\))?!:", ("!:",)),
+    # Conventional commits trailer: `BREAKING CHANGE: ...`
+    Rule("major", r"^breaking[ -]change:", ("breaking",)),
+    Rule("major", r"\bbreaking\b", ("breaking",)),
+    # Conventional commits: `feat: ...`, `feat(parser): ...`
+    Rule("minor", r"^feat(?:\([^)\n]*\))?:", ("feat",)),
+    # Keywords, without matching words like "changelog"
+    Rule(
+        "minor",
+        r"\b(?:feat\w*|change[sd]?|changing|improve\w*)\b",
+        ("feat", "chang", "improv"),
+    ),
+)
+
+
+class Classification(NamedTuple):
+    """Change type of a range of commits, and the commit that decided it."""
+
+    change_type: str
+    decided_by: Optional[str]
+
+
+class CommitClassifier:
+    """Classifies commit messages with a single combined regular expression.
+
+    The rules are compiled into one pattern with a named group per change
+    type, so each commit message is scanned once. The hints of the rules are
+    compiled into a second, literal-only pattern that cheaply rules out most
+    commit messages before the full pattern runs.
+
+    Args:
+        rules (Sequence[Rule]): Rules to apply
+        default (str): Change type used when no rule matches
+    """
+
+    default: str
+    key: str
+
+    def __init__(
+        self, rules: Sequence[Rule] = DEFAULT_RULES, default: str = "patch"
+    ) -> None:
+        """Initialize CommitClassifier."""
+        self.default = default
+        alternatives = []
+        # More significant change types first, so they win at equal positions
+        for change_type in reversed(CHANGE_TYPES):
+            patterns = [
+                rule.pattern for rule in rules if rule.change_type == change_type
+            ]
+            if patterns:
+                alternatives.append(f"(?P<{change_type}>{'|'.join(patterns)})")
+        # `(?!)` never matches, for classifiers without any rules
+        self._pattern = re.compile(
+            "|".join(alternatives) or "(?!)", re.IGNORECASE | re.MULTILINE
+        )
+        # Identifies the classification rules, e.g. for results saved to disk
+        self.key = f"{default}:{self._pattern.pattern}"
+        self._hints = None
+        if all(rule.hints for rule in rules):
+            hints = sorted({hint.lower() for rule in rules for hint in rule.hints})
+            self._hints = re.compile("|".join(map(re.escape, hints)) or "(?!)")
+
+    def classify_message(self, message: str) -> Optional[str]:
+        """Returns the most significant change type matched by a message.
+
+        Args:
+            message (str): Full commit message
+
+        Returns:
+            Optional[str]: Change type, or None if no rule matched
+        """
+        if self._hints is not None and self._hints.search(message.lower()) is None:
+            return None
+        found = None
+        for match in self._pattern.finditer(message):
+            change_type = match.lastgroup
+            if change_type == CHANGE_TYPES[-1]:
+                return change_type
+            if found is None or _RANKS[change_type] > _RANKS[found]:
+                found = change_type
+        return found
+
+    def classify(self, messages: Iterable[str]) -> Classification:
+        """Classify a range of commits.
+
+        Stops reading messages as soon as a major change is found.
+
+        Args:
+            messages (Iterable[str]): Commit messages
+
+        Returns:
+            Classification: Most significant change type, and the first message
+            that matched it
+        """
+        result = Classification(self.default, None)
+        rank = -1
+        for message in messages:
+            change_type = self.classify_message(message)
+            if change_type is None:
+                continue
+            change_rank = _RANKS[change_type]
+            if change_rank > rank:
+                result = Classification(change_type, message)
+                rank = change_rank
+                if change_type == CHANGE_TYPES[-1]:
+                    break
+        return result
+
+
+DEFAULT_CLASSIFIER = CommitClassifier()
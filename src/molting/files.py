@@ -0,0 +1,326 @@
+"""Helpers for rewriting project files."""
+import os
+import stat
+from contextlib import contextmanager
+from pathlib import Path
+from threading import Lock
+from typing import BinaryIO, Dict, List, Optional, Sequence, Tuple
+
+# A `(start, end, replacement)` byte range edit against the original file
+Edit = Tuple[int, int, bytes]
+
+COPY_CHUNK_SIZE = 1024 * 1024
+
+_FILE_LOCKS: Dict[Path, Lock] = {}
+_FILE_LOCKS_GUARD = Lock()
+
+
+@contextmanager
+def file_lock(path: Path):
+    """Serialize reads and writes of a file shared between several projects.
+
+    Args:
+        path (Path): File that is about to be read and rewritten
+    """
+    path = Path(path).resolve()
+    with _FILE_LOCKS_GUARD:
+        lock = _FILE_LOCKS.setdefault(path, Lock())
+    with lock:
+        yield
+
+
+def file_sha256(path: Path) -> str:
+    """Returns the SHA-256 of a file, read in chunks.
+
+    Args:
+        path (Path): File to hash
+
+    Returns:
+        str: Hex digest
+    """
+    import hashlib
+
+    digest = hashlib.sha256()
+    with open(path, "rb") as handle:
+        for chunk in iter(lambda: handle.read(COPY_CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _copy_range(
+    source: BinaryIO, target: BinaryIO, start: int, end: Optional[int]
+) -> None:
+    """Copy bytes from `start` up to `end` (or the end of the file) in chunks."""
+    source.seek(start)
+    remaining = None if end is None else end - start
+    while remaining is None or remaining > 0:
+        size = COPY_CHUNK_SIZE if remaining is None else min(COPY_CHUNK_SIZE, remaining)
+        chunk = source.read(size)
+        if not chunk:
+            break
+        target.write(chunk)
+        if remaining is not None:
+            remaining -= len(chunk)
+
+
+def splice_file(
+    path: Path, edits: Sequence[Edit], backup: Optional[Path] = None
+) -> None:
+    """Apply byte range edits to a file in a single streaming pass.
+
+    Unchanged parts of the file are copied in chunks, so memory use doesn't
+    depend on the size of the file. The result is written to a temporary file
+    next to `path`, which is synced to disk and then atomically renamed over
+    the original.
+
+    Args:
+        path (Path): File to edit
+        edits (Sequence[Edit]): Non-overlapping edits, with offsets relative to
+          the current contents of the file. Edits starting at the same offset
+          are applied in the order given.
+        backup (Path, optional): Where to keep the original file
+
+    Raises:
+        ValueError: Two of the edits overlap.
+    """
+    # Imported here, as they are slow to import and only needed for writes
+    import shutil
+    import tempfile
+
+    path = Path(path)
+    ordered = sorted(edits, key=lambda edit: (edit[0], edit[1]))
+    with open(path, "rb") as source, tempfile.NamedTemporaryFile(
+        dir=path.parent, prefix=f".{path.name}.", delete=False
+    ) as target:
+        try:
+            position = 0
+            for start, end, replacement in ordered:
+                if start < position:
+                    raise ValueError(f"Overlapping edits for {path}")
+                _copy_range(source, target, position, start)
+                target.write(replacement)
+                position = end
+            _copy_range(source, target, position, None)
+            target.flush()
+            os.fsync(target.fileno())
+        except BaseException:
+            target.close()
+            os.unlink(target.name)
+            raise
+    os.chmod(target.name, stat.S_IMODE(os.stat(path).st_mode))
+    if backup is not None:
+        try:
+            os.link(path, backup)
+        except OSError:
+            shutil.copy2(path, backup)
+    os.replace(target.name, path)
+
+
+def write_file(path: Path, data: bytes) -> None:
+    """Write a whole file atomically, through a temporary file next to it.
+
+    Args:
+        path (Path): File to create or replace
+        data (bytes): New contents
+    """
+    import tempfile
+
+    path = Path(path)
+    with tempfile.NamedTemporaryFile(
+        dir=path.parent, prefix=f".{path.name}.", delete=False
+    ) as target:
+        try:
+            target.write(data)
+            target.flush()
+            os.fsync(target.fileno())
+        except BaseException:
+            target.close()
+            os.unlink(target.name)
+            raise
+    mode = stat.S_IMODE(os.stat(path).st_mode) if path.exists() else 0o644
+    os.chmod(target.name, mode)
+    os.replace(target.name, path)
+
+
+def _check_overlaps(path: Path, edits: Sequence[Edit]) -> None:
+    """Refuse edits replacing overlapping byte ranges of a file.
+
+    Insertions at the start or end of a replaced range don't overlap it.
+
+    Raises:
+        ValueError: Two of the edits overlap.
+    """
+    end = 0
+    for start, stop, _ in sorted(edits, key=lambda edit: (edit[0], edit[1])):
+        if start < end:
+            raise ValueError(f"Overlapping edits to {path} at byte {start}")
+        end = max(end, stop)
+
+
+class WritePlan:
+    """Edits to several files, staged in memory and written all at once.
+
+    Edits are offsets into the files as they were when first staged, so
+    edits from several steps of a release can be merged and each file is
+    written exactly once. Insertions staged later at the same offset end up in
+    front of earlier ones, as if the later edit had been made to the already
+    edited text, right after the same anchor.
+
+    Files are keyed by their resolved path, so a file shared by several
+    projects is written once. Edits staged twice, e.g. by each of those
+    projects, are merged, and other overlapping edits are refused.
+
+    Files are only replaced once they were fully written to disk, and the
+    originals are kept until `commit` so that `rollback` can restore them.
+    Originals are kept in a temporary directory outside of the work tree, so
+    that a release commit staging every change never picks them up.
+    """
+
+    def __init__(self) -> None:
+        """Initialize WritePlan."""
+        self._edits: Dict[Path, List[Edit]] = {}
+        self._stats: Dict[Path, Tuple[int, int]] = {}
+        self._backups: Dict[Path, Path] = {}
+        self._backup_directory: Optional[Path] = None
+        self._lock = Lock()
+
+    def __contains__(self, path: Path) -> bool:
+        """Whether edits to a file have been staged."""
+        return Path(path).resolve() in self._edits
+
+    @property
+    def paths(self) -> List[Path]:
+        """Files with staged edits."""
+        return list(self._edits)
+
+    def edits(self, path: Path) -> List[Edit]:
+        """Returns the merged edits of a file, in the order they will be applied.
+
+        Args:
+            path (Path): Edited file
+        """
+        edits = self._edits.get(Path(path).resolve(), [])
+        indexed = sorted(
+            enumerate(edits), key=lambda item: (item[1][0], item[1][1], -item[0])
+        )
+        return [edit for _, edit in indexed]
+
+    def stage(self, path: Path, edits: Sequence[Edit]) -> None:
+        """Stage edits to a file.
+
+        Args:
+            path (Path): File to edit
+            edits (Sequence[Edit]): Edits relative to the file on disk
+
+        Raises:
+            ValueError: An edit overlaps with a different edit staged before.
+        """
+        path = Path(path).resolve()
+        stat_result = path.stat()
+        with self._lock:
+            staged = self._edits.get(path, [])
+            # The same replacement staged again, e.g. of a shared version file
+            edits = [edit for edit in edits if edit[0] == edit[1] or edit not in staged]
+            _check_overlaps(path, [*staged, *edits])
+            self._stats.setdefault(path, (stat_result.st_mtime_ns, stat_result.st_size))
+            self._edits.setdefault(path, []).extend(edits)
+
+    def stage_ordered(self, path: Path, edits: Sequence[Edit]) -> None:
+        """Stage edits already in the order they will be applied.
+
+        Edits returned by `edits`, e.g. those of a saved plan, keep their
+        order, rather than insertions at the same offset being reversed again.
+
+        Args:
+            path (Path): File to edit
+            edits (Sequence[Edit]): Edits relative to the file on disk, in the
+              order returned by `edits`
+        """
+        self.stage(path, list(reversed(edits)))
+
+    def write(self, path: Path, text: str) -> None:
+        """Stage replacing the whole contents of a file.
+
+        Args:
+            path (Path): File to edit
+            text (str): New contents
+        """
+        path = Path(path)
+        self.stage(path, [(0, path.stat().st_size, text.encode("utf-8"))])
+
+    def to_dict(self) -> Dict[str, object]:
+        """Describe the staged edits, e.g. to save them as JSON.
+
+        Returns:
+            Dict[str, object]: Every staged file with the modification time and
+            size it had when staged, and its edits with the replacement text
+            decoded as UTF-8
+        """
+        return {
+            "files": [
+                {
+                    "path": str(path),
+                    "mtime_ns": self._stats[path][0],
+                    "size": self._stats[path][1],
+                    "edits": [
+                        {"start": start, "end": end, "text": text.decode("utf-8")}
+                        for start, end, text in self.edits(path)
+                    ],
+                }
+                for path in self._edits
+            ]
+        }
+
+    def apply(self) -> None:
+        """Write every staged file exactly once.
+
+        Raises:
+            ValueError: A file changed on disk since its edits were staged.
+              Nothing is written in that case.
+        """
+        for path, staged_stat in self._stats.items():
+            stat_result = path.stat()
+            if (stat_result.st_mtime_ns, stat_result.st_size) != staged_stat:
+                raise ValueError(f"{path} changed since its edits were staged")
+        try:
+            for path in self._edits:
+                backup = self._backup_path(path)
+                splice_file(path, self.edits(path), backup)
+                self._backups[path] = backup
+        except BaseException:
+            self.rollback()
+            raise
+
+    def _backup_path(self, path: Path) -> Path:
+        """Returns where to keep the original of a file until `commit`."""
+        if self._backup_directory is None:
+            import tempfile
+
+            self._backup_directory = Path(tempfile.mkdtemp(prefix="molting-"))
+        # Files of different projects may share their name
+        return self._backup_directory / f"{len(self._backups)}-{path.name}"
+
+    def _remove_backup_directory(self) -> None:
+        """Forget the backups, once restored or no longer needed."""
+        self._backups.clear()
+        if self._backup_directory is not None:
+            os.rmdir(self._backup_directory)
+            self._backup_directory = None
+
+    def rollback(self) -> None:
+        """Restore the files that were already written."""
+        import shutil
+
+        for path, backup in self._backups.items():
+            try:
+                os.replace(backup, path)
+            except OSError:
+                # The temporary directory is on another file system
+                shutil.move(str(backup), str(path))
+        self._remove_backup_directory()
+
+    def commit(self) -> None:
+        """Forget the original files, making the writes final."""
+        for backup in self._backups.values():
+            os.unlink(backup)
+        self._remove_backup_directory()
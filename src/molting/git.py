@@ -0,0 +1,412 @@
+"""Access to git through as few processes as possible."""
+import os
+import time
+from pathlib import Path
+from subprocess import PIPE, CalledProcessError, CompletedProcess, Popen, run
+from threading import Lock
+from typing import IO, TYPE_CHECKING, Iterator, List, Optional, Tuple
+
+from molting import trace
+from molting.log import logger
+
+if TYPE_CHECKING:  # pragma: no cover
+    from molting.objects import GitReader
+
+STREAM_CHUNK_SIZE = 64 * 1024
+
+
+class GitBatch:
+    """A long-lived `git cat-file` process answering object queries.
+
+    Args:
+        process (Popen): Running `git cat-file --batch` or `--batch-check`
+    """
+
+    process: Popen
+
+    def __init__(self, process: Popen) -> None:
+        """Initialize GitBatch."""
+        self.process = process
+        self.with_contents = "--batch" in process.args
+        self.queries = 0
+        self.bytes_written = 0
+        self.bytes_read = 0
+        self._started = time.perf_counter()
+        self._lock = Lock()
+
+    def query(self, name: str) -> Tuple[Optional[str], Optional[bytes]]:
+        """Look up an object by name.
+
+        Args:
+            name (str): Any object name git understands, e.g. a sha or tag
+
+        Returns:
+            Tuple[Optional[str], Optional[bytes]]: The header line, or None if
+            the object doesn't exist, and the object contents for `--batch`
+            processes
+        """
+        stdin: IO[bytes] = self.process.stdin
+        stdout: IO[bytes] = self.process.stdout
+        with self._lock:
+            query = f"{name}\n".encode("utf-8")
+            try:
+                stdin.write(query)
+                stdin.flush()
+            except BrokenPipeError:
+                # The process has exited, e.g. outside of a git repository
+                return None, None
+            self.queries += 1
+            self.bytes_written += len(query)
+            line = stdout.readline()
+            self.bytes_read += len(line)
+            header = line.decode("utf-8").rstrip("\n")
+            fields = header.split(" ")
+            if len(fields) != 3 or fields[-1] in ("missing", "ambiguous"):
+                return None, None
+            contents = None
+            if self.with_contents:
+                contents = stdout.read(int(fields[2]))
+                stdout.read(1)
+                self.bytes_read += len(contents) + 1
+            return header, contents
+
+    def close(self) -> None:
+        """Stop the process."""
+        try:
+            self.process.stdin.close()
+        except BrokenPipeError:
+            pass
+        returncode = self.process.wait()
+        self.process.stdout.close()
+        trace.record(
+            " ".join(self.process.args[:3]),
+            "subprocess",
+            self._started,
+            time.perf_counter(),
+            exit_code=returncode,
+            queries=self.queries,
+            written_bytes=self.bytes_written,
+            read_bytes=self.bytes_read,
+        )
+
+
+def find_git_directory(directory: Path) -> Optional[Path]:
+    """Find the `.git` directory of a work tree without starting git.
+
+    Args:
+        directory (Path): Directory inside the work tree
+
+    Returns:
+        Optional[Path]: The `.git` directory, or None when git has to be
+        asked: when the environment overrides the repository, or for linked
+        worktrees and submodules, whose `.git` is a file
+    """
+    if "GIT_DIR" in os.environ or "GIT_COMMON_DIR" in os.environ:
+        return None
+    for parent in (directory, *directory.resolve().parents):
+        candidate = parent / ".git"
+        if candidate.is_dir():
+            return candidate
+        if candidate.exists():
+            return None
+    return None
+
+
+class Git:
+    """A git repository, accessed through a small number of git processes.
+
+    Lookups of refs and objects are streamed through a single persistent
+    `git cat-file` process per mode, instead of one process per query.
+    Every process started is counted in `spawn_count`.
+
+    Refs and commits can also be read in-process, see `molting.objects`. That
+    is opt-in, with `read_objects=True` or the `MOLTING_READ_OBJECTS=1`
+    environment variable, as `git log` still streams commits faster.
+    """
+
+    directory: Optional[Path]
+    spawn_count: int
+    read_objects: bool
+
+    def __init__(
+        self, directory: Optional[Path] = None, read_objects: Optional[bool] = None
+    ) -> None:
+        """Initialize Git."""
+        self.directory = Path(directory) if directory is not None else None
+        self.spawn_count = 0
+        self.read_objects = (
+            read_objects
+            if read_objects is not None
+            else os.environ.get("MOLTING_READ_OBJECTS") == "1"
+        )
+        self._batches = {}
+        self._git_directory: Optional[Path] = None
+        self._reader: Optional["GitReader"] = None
+        self._reader_opened = False
+        self._lock = Lock()
+
+    def __enter__(self) -> "Git":
+        """Use the repository as a context manager, closing it on exit."""
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        """Close the persistent processes."""
+        self.close()
+
+    def run(self, *args: str, check: bool = False, capture_output: bool = True):
+        """Run a git command and wait for it to finish.
+
+        Args:
+            *args (str): Arguments passed to `git`
+            check (bool): Raise `CalledProcessError` if the command fails
+            capture_output (bool): Capture stdout and stderr instead of letting
+              them through to the terminal
+
+        Returns:
+            CompletedProcess: The finished command
+        """
+        command = ["git", *args]
+        self.record_spawn(command)
+        subcommand = next((arg for arg in args if not arg.startswith("-")), "")
+        with trace.span(f"git {subcommand}", "subprocess", command=command) as span:
+            result: CompletedProcess = run(
+                command,
+                capture_output=capture_output,
+                text=True,
+                check=check,
+                cwd=self.directory,
+            )
+            span["exit_code"] = result.returncode
+            if capture_output:
+                span["stdout_bytes"] = len(result.stdout)
+                span["stderr_bytes"] = len(result.stderr)
+        return result
+
+    def stream(
+        self, *args: str, separator: bytes = b"\0", check: bool = True
+    ) -> Iterator[bytes]:
+        """Run a git command, yielding its output record by record as it arrives.
+
+        Closing the generator before the output ends stops the process, so
+        callers can stop reading as soon as they have what they need, e.g.
+        with `contextlib.closing`.
+
+        Args:
+            *args (str): Arguments passed to `git`
+            separator (bytes): Delimiter of the records, e.g. NUL with `-z`
+            check (bool): Raise `CalledProcessError` if the command fails
+
+        Raises:
+            CalledProcessError: The command failed, and `check` is set.
+
+        Yields:
+            bytes: Records, without their separator
+        """
+        command = ["git", *args]
+        self.record_spawn(command)
+        subcommand = next((arg for arg in args if not arg.startswith("-")), "")
+        with trace.span(f"git {subcommand}", "subprocess", command=command) as span:
+            process = Popen(command, stdout=PIPE, stderr=PIPE, cwd=self.directory)
+            stdout: IO[bytes] = process.stdout
+            finished = False
+            records = 0
+            try:
+                pending = b""
+                while True:
+                    chunk = stdout.read1(STREAM_CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    *complete, pending = (pending + chunk).split(separator)
+                    for record in complete:
+                        records += 1
+                        yield record
+                if pending:
+                    records += 1
+                    yield pending
+                finished = True
+            finally:
+                if not finished:
+                    process.kill()
+                stdout.close()
+                stderr = process.stderr.read()
+                process.stderr.close()
+                returncode = process.wait()
+                span["exit_code"] = returncode
+                span["records"] = records
+                span["stopped_early"] = not finished
+        if check and returncode:
+            raise CalledProcessError(returncode, command, stderr=stderr)
+
+    def record_spawn(self, command: List[str]) -> None:
+        """Count a git process started on behalf of this repository.
+
+        Args:
+            command (List[str]): Command line of the process
+        """
+        with self._lock:
+            self.spawn_count += 1
+        logger.trace("Spawning {!r} (#{})", " ".join(command), self.spawn_count)
+
+    def _batch(self, mode: str) -> GitBatch:
+        with self._lock:
+            batch = self._batches.get(mode)
+            if batch is None:
+                command = ["git", "cat-file", mode]
+                self.spawn_count += 1
+                logger.trace("Spawning {!r} (#{})", " ".join(command), self.spawn_count)
+                batch = GitBatch(
+                    Popen(command, stdin=PIPE, stdout=PIPE, cwd=self.directory)
+                )
+                self._batches[mode] = batch
+            return batch
+
+    def resolve(self, name: str) -> Optional[str]:
+        """Returns the sha of an object, or None if it doesn't exist.
+
+        Args:
+            name (str): Ref, tag or revision to resolve
+        """
+        reader = self.reader
+        if reader is not None:
+            from molting.objects import UnsupportedRepository
+
+            try:
+                sha = reader.resolve(name)
+            except UnsupportedRepository:
+                sha = None
+            # Names the reader doesn't find are looked up by git, to be sure
+            if sha is not None:
+                return sha
+        header, _ = self._batch("--batch-check").query(name)
+        if header is None:
+            return None
+        return header.split(" ")[0]
+
+    def read_object(self, name: str) -> Tuple[Optional[str], Optional[bytes]]:
+        """Returns the type and raw contents of an object.
+
+        Args:
+            name (str): Ref, tag or revision to read
+
+        Returns:
+            Tuple[Optional[str], Optional[bytes]]: Object type and contents, or
+            `(None, None)` if the object doesn't exist
+        """
+        header, contents = self._batch("--batch").query(name)
+        if header is None:
+            return None, None
+        return header.split(" ")[1], contents
+
+    def is_ancestor(self, ancestor: str, descendant: str) -> bool:
+        """Whether a commit is reachable from another one.
+
+        Args:
+            ancestor (str): Commit that may be reachable
+            descendant (str): Commit to start from
+
+        Returns:
+            bool: True if `ancestor` is `descendant` or one of its parents,
+            False otherwise, including when a commit doesn't exist
+        """
+        reader = self.reader
+        if reader is not None:
+            from molting.objects import UnsupportedRepository
+
+            try:
+                return reader.is_ancestor(ancestor, descendant)
+            except UnsupportedRepository as error:
+                logger.debug("Checking the ancestry with git instead: {}", error)
+        return (
+            self.run("merge-base", "--is-ancestor", ancestor, descendant).returncode
+            == 0
+        )
+
+    def tags(self, pattern: str = "*") -> List[str]:
+        """Returns the names of the tags matching a pattern, in a single process.
+
+        Args:
+            pattern (str): Glob pattern the tag names match, e.g. `v*`
+
+        Returns:
+            List[str]: Tag names, empty outside of a git repository
+        """
+        result = self.run(
+            "for-each-ref", "--format=%(refname:strip=2)", f"refs/tags/{pattern}"
+        )
+        if result.returncode:
+            return []
+        return result.stdout.splitlines()
+
+    @property
+    def git_directory(self) -> Optional[Path]:
+        """The git directory shared by every worktree, None outside a repository."""
+        if self._git_directory is None:
+            directory = self.directory if self.directory is not None else Path.cwd()
+            self._git_directory = find_git_directory(directory)
+            if self._git_directory is None:
+                result = self.run("rev-parse", "--git-common-dir")
+                if result.returncode:
+                    return None
+                self._git_directory = directory / result.stdout.strip()
+        return self._git_directory
+
+    @property
+    def reader(self) -> Optional["GitReader"]:
+        """In-process reader of the repository, None if it can't be used.
+
+        See `molting.objects`. Only used with `read_objects`.
+        """
+        if not self.read_objects:
+            return None
+        with self._lock:
+            if not self._reader_opened:
+                from molting.objects import GitReader, UnsupportedRepository
+
+                self._reader_opened = True
+                try:
+                    self._reader = GitReader.open(self.directory)
+                except UnsupportedRepository as error:
+                    logger.debug("Reading the repository with git: {}", error)
+            return self._reader
+
+    @property
+    def is_shallow(self) -> bool:
+        """Whether the repository is a shallow clone, with a truncated history."""
+        git_directory = self.git_directory
+        return git_directory is not None and (git_directory / "shallow").exists()
+
+    def tags_stat(self) -> Optional[Tuple[Optional[Tuple[int, int]], ...]]:
+        """Modification time and size of the places tags are stored in.
+
+        Creating, moving or deleting a tag changes the result, so it can be
+        used to tell whether a cached list of tags is still current.
+
+        Returns:
+            Optional[Tuple]: Stats of `refs/tags` and `packed-refs`, None
+            outside of a git repository
+        """
+        git_directory = self.git_directory
+        if git_directory is None:
+            return None
+        stats = []
+        for path in (git_directory / "refs" / "tags", git_directory / "packed-refs"):
+            try:
+                stat_result = path.stat()
+            except FileNotFoundError:
+                stats.append(None)
+            else:
+                stats.append((stat_result.st_mtime_ns, stat_result.st_size))
+        return tuple(stats)
+
+    def close(self) -> None:
+        """Stop the persistent `git cat-file` processes, and close the reader."""
+        with self._lock:
+            batches = list(self._batches.values())
+            self._batches.clear()
+            reader, self._reader = self._reader, None
+            self._reader_opened = False
+        for batch in batches:
+            batch.close()
+        if reader is not None:
+            reader.close()
+        logger.debug("Spawned {} git processes", self.spawn_count)
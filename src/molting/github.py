@@ -0,0 +1,378 @@
+"""GitHub releases through the REST API, over pooled keep-alive connections.
+
+Creating releases with the GitHub CLI costs a process start and a new TLS
+connection per release, and passes the notes on the command line. The client
+here sends the notes in the request body, and reuses a small pool of HTTPS
+connections for every request of the process, e.g. the releases of all the
+projects of a batch bump. Failed connections, rate limits and server errors
+are retried with exponential backoff.
+
+The client is configured from the environment, like GitHub Actions does:
+
+- `GITHUB_TOKEN` or `GH_TOKEN`: the token to authenticate with. Without one,
+  releases are created with the GitHub CLI, which has its own login.
+- `GITHUB_API_URL`: the API root, e.g. of a GitHub Enterprise server.
+- `GITHUB_REPOSITORY`: the `owner/name` of the repository, otherwise read from
+  the URL of the `origin` remote.
+- `MOLTING_GITHUB_CLIENT=gh`: always use the GitHub CLI.
+"""
+import os
+import re
+import time
+from pathlib import Path
+from threading import Lock
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Tuple
+
+from molting import trace
+from molting.git import Git
+from molting.log import logger
+
+if TYPE_CHECKING:  # pragma: no cover
+    from http.client import HTTPConnection
+
+    from molting.publish import Step
+
+API_URL = "https://api.github.com"
+RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+MAX_RETRY_DELAY = 60.0
+
+RE_REPOSITORY_URL = re.compile(
+    r"github\.com[:/](?P<repository>[^/]+/[^/]+?)(?:\.git)?/?$"
+)
+
+
+def repository_from_url(url: str) -> Optional[str]:
+    """Returns the `owner/name` of a GitHub repository from its URL.
+
+    Args:
+        url (str): HTTPS or SSH URL of the repository
+
+    Returns:
+        Optional[str]: `owner/name`, None if the URL isn't a GitHub repository
+    """
+    match = RE_REPOSITORY_URL.search(url)
+    return match.group("repository") if match is not None else None
+
+
+class GitHubError(Exception):
+    """A request to the GitHub API failed.
+
+    Args:
+        status (int): HTTP status of the response, 0 if there was none
+        message (str): Description of the failure
+    """
+
+    status: int
+
+    def __init__(self, status: int, message: str) -> None:
+        """Initialize GitHubError."""
+        super().__init__(message)
+        self.status = status
+
+
+class ConnectionPool:
+    """Keep-alive HTTP connections to a host, reused across requests and threads.
+
+    Args:
+        url (str): Root URL of the host
+        size (int): Maximum number of idle connections kept open
+        timeout (float): Socket timeout of the connections, in seconds
+    """
+
+    def __init__(self, url: str, size: int = 4, timeout: float = 30.0) -> None:
+        """Initialize ConnectionPool."""
+        from urllib.parse import urlsplit
+
+        parts = urlsplit(url)
+        self.scheme = parts.scheme
+        self.host = parts.hostname
+        self.port = parts.port
+        self.size = size
+        self.timeout = timeout
+        self.opened = 0
+        self._idle: List["HTTPConnection"] = []
+        self._lock = Lock()
+
+    def acquire(self) -> Tuple["HTTPConnection", bool]:
+        """Returns an idle connection, or a new one, and whether it was reused."""
+        with self._lock:
+            if self._idle:
+                return self._idle.pop(), True
+            self.opened += 1
+        from http.client import HTTPConnection, HTTPSConnection
+
+        connection_class = HTTPSConnection if self.scheme == "https" else HTTPConnection
+        return connection_class(self.host, self.port, timeout=self.timeout), False
+
+    def release(self, connection: "HTTPConnection") -> None:
+        """Return a connection whose response was fully read to the pool."""
+        with self._lock:
+            if len(self._idle) < self.size:
+                self._idle.append(connection)
+                return
+        connection.close()
+
+    def close(self) -> None:
+        """Close the idle connections."""
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for connection in idle:
+            connection.close()
+
+
+def _retry_delay(headers: Any, default: float) -> float:
+    retry_after = headers.get("Retry-After") if headers is not None else None
+    if retry_after is not None and retry_after.isdigit():
+        return min(float(retry_after), MAX_RETRY_DELAY)
+    return min(default, MAX_RETRY_DELAY)
+
+
+class GitHubClient:
+    """A client of the GitHub REST API.
+
+    Args:
+        token (str): Token to authenticate with
+        api_url (str): Root URL of the API
+        retries (int): Number of times a failed request is retried
+        backoff (float): Delay before the first retry, doubled for every
+          following one, in seconds
+        pool_size (int): Maximum number of idle connections kept open
+        timeout (float): Socket timeout, in seconds
+    """
+
+    def __init__(
+        self,
+        token: str,
+        api_url: str = API_URL,
+        retries: int = 3,
+        backoff: float = 0.5,
+        pool_size: int = 4,
+        timeout: float = 30.0,
+    ) -> None:
+        """Initialize GitHubClient."""
+        from urllib.parse import urlsplit
+
+        self.token = token
+        self.api_url = api_url.rstrip("/")
+        self.retries = retries
+        self.backoff = backoff
+        self.pool = ConnectionPool(self.api_url, pool_size, timeout)
+        self._path_prefix = urlsplit(self.api_url).path
+        self._repositories: Dict[Path, str] = {}
+
+    @classmethod
+    def from_environment(cls) -> Optional["GitHubClient"]:
+        """Returns a client configured by environment variables.
+
+        Returns:
+            Optional[GitHubClient]: The client, or None if releases should be
+            created with the GitHub CLI instead
+        """
+        token = os.environ.get("GITHUB_TOKEN") or os.environ.get("GH_TOKEN")
+        if not token or os.environ.get("MOLTING_GITHUB_CLIENT") == "gh":
+            return None
+        return cls(token, os.environ.get("GITHUB_API_URL") or API_URL)
+
+    def _send(
+        self, method: str, path: str, body: Optional[bytes]
+    ) -> Tuple[int, Any, bytes]:
+        """Send a request on a pooled connection, returning the response."""
+        from http.client import HTTPException
+
+        headers = {
+            "Accept": "application/vnd.github+json",
+            "Authorization": f"Bearer {self.token}",
+            "User-Agent": "molting",
+            "X-GitHub-Api-Version": "2022-11-28",
+        }
+        if body is not None:
+            headers["Content-Type"] = "application/json"
+        while True:
+            connection, reused = self.pool.acquire()
+            try:
+                connection.request(method, f"{self._path_prefix}{path}", body, headers)
+                response = connection.getresponse()
+                data = response.read()
+            except (OSError, HTTPException):
+                connection.close()
+                # The server may close idle connections at any time, which is
+                # only noticed when reusing them: try again on a new one
+                if reused:
+                    continue
+                raise
+            if response.will_close:
+                connection.close()
+            else:
+                self.pool.release(connection)
+            return response.status, response.headers, data
+
+    def request(self, method: str, path: str, data: Any = None) -> Any:
+        """Send a request to the API, retrying failures with backoff.
+
+        Args:
+            method (str): HTTP method
+            path (str): Path of the endpoint, e.g. `/repos/{owner}/{name}`
+            data (Any): Data sent as the JSON body of the request
+
+        Raises:
+            GitHubError: The request failed, after retries if the failure
+              could be temporary.
+
+        Returns:
+            Any: Decoded JSON response
+        """
+        import json
+        from http.client import HTTPException
+
+        body = json.dumps(data).encode("utf-8") if data is not None else None
+        delay = self.backoff
+        for attempt in range(self.retries + 1):
+            with trace.span(f"{method} {path}", "http", attempt=attempt) as span:
+                try:
+                    status, headers, content = self._send(method, path, body)
+                except (OSError, HTTPException) as error:
+                    status, headers, content = 0, None, str(error).encode()
+                span["status"] = status
+            if status < 400:
+                return json.loads(content) if content else None
+            retry = status == 0 or status in RETRY_STATUSES
+            # Secondary rate limits answer 403 with the delay to wait for
+            retry = retry or (status == 403 and "Retry-After" in headers)
+            if not retry or attempt == self.retries:
+                message = content.decode("utf-8", "replace")
+                raise GitHubError(
+                    status, f"{method} {path} failed ({status}): {message}"
+                )
+            wait = _retry_delay(headers, delay)
+            logger.debug(
+                "{} {} failed ({}), retrying in {}s", method, path, status, wait
+            )
+            time.sleep(wait)
+            delay *= 2
+
+    def get_repository(self, directory: Optional[Path] = None) -> str:
+        """Returns the `owner/name` of the GitHub repository of a checkout.
+
+        Args:
+            directory (Path, optional): Checkout, defaults to the current
+              working directory
+
+        Raises:
+            GitHubError: The `origin` remote isn't a GitHub repository.
+        """
+        repository = os.environ.get("GITHUB_REPOSITORY")
+        if repository:
+            return repository
+        key = Path(directory if directory is not None else ".").resolve()
+        if key not in self._repositories:
+            with Git(key) as git:
+                url = git.run("remote", "get-url", "origin").stdout.strip()
+            repository = repository_from_url(url)
+            if repository is None:
+                raise GitHubError(0, f"Remote {url!r} isn't a GitHub repository")
+            self._repositories[key] = repository
+        return self._repositories[key]
+
+    def create_release(
+        self,
+        repository: str,
+        tag: str,
+        notes: str,
+        title: Optional[str] = None,
+        verify_tag: bool = False,
+    ) -> Dict[str, Any]:
+        """Create a release for a tag.
+
+        Args:
+            repository (str): `owner/name` of the repository
+            tag (str): Tag to release
+            notes (str): Release notes
+            title (str, optional): Title of the release, defaults to the tag
+            verify_tag (bool): Fail if the tag doesn't exist on GitHub yet,
+              instead of letting GitHub create it from the default branch
+
+        Raises:
+            GitHubError: The release couldn't be created.
+
+        Returns:
+            Dict[str, Any]: The release
+        """
+        from urllib.parse import quote
+
+        if verify_tag:
+            try:
+                self.request("GET", f"/repos/{repository}/git/ref/tags/{quote(tag)}")
+            except GitHubError as error:
+                if error.status == 404:
+                    raise GitHubError(404, f"Tag {tag!r} isn't on GitHub") from None
+                raise
+        data = {"tag_name": tag, "name": title or tag, "body": notes}
+        try:
+            release = self.request("POST", f"/repos/{repository}/releases", data)
+        except GitHubError as error:
+            # A retried request may have created the release the first time
+            if error.status != 422 or "already_exists" not in str(error):
+                raise
+            release = self.request(
+                "GET", f"/repos/{repository}/releases/tags/{quote(tag)}"
+            )
+            if release.get("body") != notes:
+                raise
+        logger.debug("Created release {!r}", release.get("html_url", tag))
+        return release
+
+    def run_release_step(self, step: "Step", directory: Optional[Path]) -> None:
+        """Create the release of a `gh release create` step.
+
+        Args:
+            step (Step): Step made by `github_release_step`
+            directory (Path, optional): Checkout the step runs in
+
+        Raises:
+            GitHubError: The release couldn't be created.
+        """
+        command = step.command
+        self.create_release(
+            self.get_repository(directory),
+            command[3],
+            step.input or "",
+            _option(command, "--title"),
+            "--verify-tag" in command,
+        )
+
+    def close(self) -> None:
+        """Close the pooled connections."""
+        self.pool.close()
+
+
+def _option(command: List[str], name: str) -> Optional[str]:
+    if name not in command[:-1]:
+        return None
+    return command[command.index(name) + 1]
+
+
+def is_release_step(step: "Step") -> bool:
+    """Whether a step creates a GitHub release with the GitHub CLI."""
+    return step.command[:3] == ["gh", "release", "create"]
+
+
+_clients: Dict[Tuple[str, ...], GitHubClient] = {}
+_clients_lock = Lock()
+
+
+def get_client() -> Optional[GitHubClient]:
+    """Returns the client configured by the environment, shared by the process.
+
+    Sharing the client keeps its connections open between bumps, e.g. in
+    `molting serve`.
+
+    Returns:
+        Optional[GitHubClient]: The client, or None if releases should be
+        created with the GitHub CLI
+    """
+    client = GitHubClient.from_environment()
+    if client is None:
+        return None
+    key = (client.token, client.api_url)
+    with _clients_lock:
+        return _clients.setdefault(key, client)
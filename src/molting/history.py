@@ -0,0 +1,326 @@
+"""A cache of the commits scanned since a release, kept in the git directory.
+
+Reading and classifying every commit since the last release is the slowest
+part of a bump on long-lived branches. Commits are read in-process (see
+`molting.objects`), or streamed from `git log` when the repository can't be
+read that way. They are classified as they arrive, so that git can be
+stopped as soon as a major change decides the release. The commits scanned
+by a bump are saved to `molting/commit-scan.json` inside the git directory,
+where they don't dirty the work tree. Later bumps from the same release only
+read the commits added on top of the last scanned one.
+
+One scan is saved per release and classification rules, so that the
+projects of a repository bumped together don't evict each other's scans.
+Only the `MAX_SAVED_SCANS` most recently saved scans are kept. A saved scan
+is rebuilt when its last scanned commit is no longer an ancestor of `HEAD`
+(e.g. after a force-push or rebase).
+"""
+from contextlib import closing
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, NamedTuple, Optional, Tuple
+
+from molting.classify import (
+    CHANGE_TYPES,
+    DEFAULT_CLASSIFIER,
+    Classification,
+    CommitClassifier,
+)
+from molting.files import file_lock, write_file
+from molting.git import Git
+from molting.log import logger
+
+CACHE_FORMAT = 3
+MAX_SAVED_SCANS = 16
+
+
+class ScannedCommit(NamedTuple):
+    """The message of a commit, and the change type it implies on its own."""
+
+    sha: str
+    lines: List[str]
+    change_type: Optional[str]
+
+
+class CommitScan(NamedTuple):
+    """Commits from a release up to a commit, newest first.
+
+    An incomplete scan stops at the newest major change: enough to classify
+    the range, but not to list every message.
+    """
+
+    start: str
+    head: str
+    commits: List[ScannedCommit]
+    complete: bool = True
+
+    @property
+    def messages(self) -> List[str]:
+        """Non-empty lines of the commit messages, newest commit first."""
+        return [line for commit in self.commits for line in commit.lines]
+
+
+# Fields of a commit record are separated by the ASCII unit separator, and
+# records by NUL (`-z`), neither of which appears in commit messages
+FIELD_SEPARATOR = "\x1f"
+COMMIT_FORMAT = "%H%x1f%B%x1f%(trailers:only,unfold)"
+
+
+class Commit(NamedTuple):
+    """A commit read from `git log`."""
+
+    sha: str
+    message: str
+    trailers: Tuple[Tuple[str, str], ...]
+
+    @property
+    def subject(self) -> str:
+        """First paragraph of the message, joined into one line like git does."""
+        paragraph = self.message.strip().split("\n\n", 1)[0]
+        return " ".join(line.strip() for line in paragraph.splitlines())
+
+    @property
+    def body(self) -> str:
+        """The message after the subject."""
+        parts = self.message.strip().split("\n\n", 1)
+        return parts[1].strip() if len(parts) > 1 else ""
+
+    @property
+    def lines(self) -> List[str]:
+        """Non-empty lines of the message."""
+        return [line for line in self.message.splitlines() if line.strip()]
+
+
+def _parse_commit(record: bytes) -> Commit:
+    sha, message, trailers = record.decode("utf-8", "replace").split(FIELD_SEPARATOR)
+    pairs = []
+    for line in trailers.splitlines():
+        key, _, value = line.partition(":")
+        pairs.append((key.strip(), value.strip()))
+    return Commit(sha, message, tuple(pairs))
+
+
+def iter_commits(git: Git, revision_range: str, check: bool = True) -> Iterator[Commit]:
+    """Stream the commits of a range from `git log`, newest first.
+
+    Commits are parsed as git writes them. Closing the iterator early stops
+    git, so that a caller that has found what it needs doesn't wait for the
+    rest of the range.
+
+    Args:
+        git (Git): Repository to read
+        revision_range (str): Commits to read, e.g. `v1.0.0..HEAD`
+        check (bool): Raise `CalledProcessError` if git fails
+
+    Yields:
+        Commit: The commits of the range
+    """
+    records = git.stream(
+        "log", "-z", f"--format={COMMIT_FORMAT}", revision_range, check=check
+    )
+    with closing(records):
+        for record in records:
+            # The newline between a commit and the NUL of the next one
+            record = record.lstrip(b"\n")
+            if record:
+                yield _parse_commit(record)
+
+
+class CommitScanCache:
+    """Commits scanned since a release, saved between runs.
+
+    Args:
+        git (Git): Repository to scan
+        classifier (CommitClassifier, optional): Rules the commits are
+          classified with, defaults to keywords and conventional commits
+    """
+
+    git: Git
+    classifier: CommitClassifier
+
+    def __init__(self, git: Git, classifier: Optional[CommitClassifier] = None) -> None:
+        """Initialize CommitScanCache."""
+        self.git = git
+        self.classifier = classifier or DEFAULT_CLASSIFIER
+
+    @property
+    def path(self) -> Optional[Path]:
+        """File the scan is saved to, None outside of a git repository."""
+        git_directory = self.git.git_directory
+        if git_directory is None:
+            return None
+        return git_directory / "molting" / "commit-scan.json"
+
+    def _iter_messages(self, start: str, head: str) -> Iterator[Tuple[str, str]]:
+        """Stream the sha and message of the commits of `start...head`.
+
+        Commits are read in-process when the repository allows it, and from
+        `git log` otherwise, or from where the reader had to give up.
+        """
+        read = set()
+        reader = self.git.reader
+        if reader is not None:
+            from molting.objects import UnsupportedRepository
+
+            try:
+                for raw_commit in reader.read_range(start, head):
+                    read.add(raw_commit.sha)
+                    yield raw_commit.sha, raw_commit.message
+                return
+            except UnsupportedRepository as error:
+                logger.debug("Reading the commits with git instead: {}", error)
+        with closing(iter_commits(self.git, f"{start}...{head}")) as commits:
+            for commit in commits:
+                if commit.sha not in read:
+                    yield commit.sha, commit.message
+
+    def _read(
+        self, start: str, head: str, complete: bool
+    ) -> Tuple[List[ScannedCommit], bool]:
+        """Classify the commits of `start...head` as they are read.
+
+        Returns the commits, and whether reading stopped at a major change
+        before the end of the range.
+        """
+        scanned = []
+        with closing(self._iter_messages(start, head)) as messages:
+            for sha, message in messages:
+                # The rules match within lines, so classifying the whole
+                # message gives the change type of its most significant line
+                change_type = self.classifier.classify_message(message)
+                lines = [line for line in message.splitlines() if line.strip()]
+                scanned.append(ScannedCommit(sha, lines, change_type))
+                if not complete and change_type == CHANGE_TYPES[-1]:
+                    return scanned, True
+        return scanned, False
+
+    def _load_entries(self) -> List[Dict[str, Any]]:
+        """Returns the saved scans, oldest first, as saved in the cache file."""
+        import json
+
+        path = self.path
+        if path is None:
+            return []
+        try:
+            data = json.loads(path.read_text())
+        except (OSError, ValueError):
+            return []
+        if not isinstance(data, dict) or data.get("format") != CACHE_FORMAT:
+            return []
+        return data["scans"]
+
+    def _is_entry_of(self, entry: Dict[str, Any], start: str) -> bool:
+        """Whether a saved scan is the one from a release, with these rules."""
+        return entry["start"] == start and entry["classifier"] == self.classifier.key
+
+    def load(self, start: str) -> Optional[CommitScan]:
+        """Returns the saved scan from a release, None if there is no usable one.
+
+        Args:
+            start (str): Sha of the release commit
+        """
+        for entry in self._load_entries():
+            if self._is_entry_of(entry, start):
+                return CommitScan(
+                    entry["start"],
+                    entry["head"],
+                    [ScannedCommit(*commit) for commit in entry["commits"]],
+                    entry["complete"],
+                )
+        return None
+
+    def save(self, scan: CommitScan) -> None:
+        """Save a scan atomically, replacing the previous one from its release."""
+        import json
+
+        path = self.path
+        if path is None:
+            return
+        entry = {
+            "classifier": self.classifier.key,
+            "start": scan.start,
+            "head": scan.head,
+            "complete": scan.complete,
+            "commits": [list(commit) for commit in scan.commits],
+        }
+        try:
+            # Projects bumped on other threads save to the same file
+            with file_lock(path):
+                entries = [
+                    saved
+                    for saved in self._load_entries()
+                    if not self._is_entry_of(saved, scan.start)
+                ]
+                entries = [*entries, entry][-MAX_SAVED_SCANS:]
+                data = {"format": CACHE_FORMAT, "scans": entries}
+                path.parent.mkdir(exist_ok=True)
+                write_file(path, json.dumps(data, separators=(",", ":")).encode())
+        except OSError as error:
+            # The cache only saves time, a bump never fails because of it
+            logger.warning("Couldn't save the commit scan to {}: {}", path, error)
+
+    def scan(self, start: str, head: str, complete: bool = True) -> CommitScan:
+        """Returns the commits from a release up to a commit.
+
+        Only the commits added since the saved scan are read, and the result
+        is saved for the next run.
+
+        Args:
+            start (str): Sha of the release commit, not included in the results
+            head (str): Sha of the last commit to include, usually `HEAD`
+            complete (bool): Whether every commit is needed. If not, reading
+              stops at the newest major change, which decides the change type
+              of the whole range.
+
+        Returns:
+            CommitScan: The scanned commits
+        """
+        saved = self.load(start)
+        if saved is not None and (saved.complete or not complete):
+            if saved.head == head:
+                logger.debug("Reusing the {} scanned commits", len(saved.commits))
+                return saved
+            if self.git.is_ancestor(saved.head, head):
+                # `saved.head` is an ancestor, so this is `saved.head..head`
+                added, stopped = self._read(saved.head, head, complete)
+                logger.debug("Scanned {} commits added since the last scan", len(added))
+                if stopped:
+                    scan = CommitScan(start, head, added, False)
+                else:
+                    known = {commit.sha for commit in added}
+                    commits = [
+                        *added,
+                        *(c for c in saved.commits if c.sha not in known),
+                    ]
+                    scan = CommitScan(start, head, commits, saved.complete)
+                self.save(scan)
+                return scan
+            logger.debug("History was rewritten since the last scan, rescanning")
+        commits, stopped = self._read(start, head, complete)
+        logger.debug("Scanned {} commits", len(commits))
+        scan = CommitScan(start, head, commits, not stopped)
+        self.save(scan)
+        return scan
+
+    def classify(self, scan: CommitScan) -> Classification:
+        """Combine the change types of the scanned commits.
+
+        Gives the same result as classifying all their messages at once.
+
+        Args:
+            scan (CommitScan): Scanned commits
+
+        Returns:
+            Classification: Most significant change type, and the first message
+            line that matched it
+        """
+        decisive: Optional[ScannedCommit] = None
+        for commit in scan.commits:
+            if commit.change_type is not None and (
+                decisive is None
+                or CHANGE_TYPES.index(commit.change_type)
+                > CHANGE_TYPES.index(decisive.change_type)
+            ):
+                decisive = commit
+        if decisive is None:
+            return Classification(self.classifier.default, None)
+        return self.classifier.classify(decisive.lines)
@@ -0,0 +1,125 @@
+"""Logging that costs next to nothing for messages below the configured level.
+
+loguru, together with the asyncio, logging and multiprocessing modules it
+imports, makes up most of the import time of molting, and every loguru call
+inspects the calling frame and reads the clock before finding out that its
+message is filtered out. `logger` forwards to loguru, which is only imported
+once a message is actually emitted. Once `configure` has set a level, calls
+below it return right away.
+
+Messages take `{}` placeholders instead of being f-strings, so they are only
+formatted when emitted. Use `logger.opt(lazy=True)` with callables for
+arguments that are expensive to compute.
+"""
+import sys
+from typing import Any, Dict, Optional, TextIO
+
+LEVELS = {
+    "TRACE": 5,
+    "DEBUG": 10,
+    "INFO": 20,
+    "SUCCESS": 25,
+    "WARNING": 30,
+    "ERROR": 40,
+    "CRITICAL": 50,
+}
+
+# Messages below this level are dropped without importing loguru. Until
+# `configure` is called every message goes to loguru, which decides itself.
+_threshold = 0
+_sink: Optional[TextIO] = None
+_level: Optional[str] = None
+_loguru_logger = None
+
+
+def _apply_configuration(loguru_logger) -> None:
+    if _sink is not None:
+        loguru_logger.remove()
+        loguru_logger.add(_sink, level=_level)
+
+
+def _get_loguru():
+    global _loguru_logger
+    if _loguru_logger is None:
+        from loguru import logger as loguru_logger
+
+        _apply_configuration(loguru_logger)
+        _loguru_logger = loguru_logger
+    return _loguru_logger
+
+
+def configure(level: str, sink: TextIO = sys.stderr) -> None:
+    """Send messages at or above a level to a sink, dropping all others.
+
+    Args:
+        level (str): Lowest level emitted, e.g. `warning`
+        sink (TextIO): Stream the messages are written to
+    """
+    global _threshold, _sink, _level
+    _level = level.upper()
+    _threshold = LEVELS[_level]
+    _sink = sink
+    if _loguru_logger is not None:
+        _apply_configuration(_loguru_logger)
+
+
+def is_enabled(level: str) -> bool:
+    """Whether messages of a level may be emitted."""
+    return LEVELS[level] >= _threshold
+
+
+class Logger:
+    """Forwards messages to loguru, unless they are below the configured level.
+
+    Args:
+        options (Dict[str, Any], optional): Options passed to loguru's `opt`
+    """
+
+    __slots__ = ("_options",)
+
+    def __init__(self, options: Optional[Dict[str, Any]] = None) -> None:
+        """Initialize Logger."""
+        self._options = options or {}
+
+    def opt(self, **options: Any) -> "Logger":
+        """Returns a logger passing options to loguru, e.g. `lazy=True`."""
+        return Logger({**self._options, **options})
+
+    def _log(self, level: str, message: Any, args: tuple, kwargs: dict) -> None:
+        if LEVELS[level] < _threshold:
+            return
+        options = dict(self._options)
+        # Report the caller of the logging method, not this module
+        options["depth"] = options.get("depth", 0) + 2
+        _get_loguru().opt(**options).log(level, message, *args, **kwargs)
+
+    def trace(self, message: Any, *args: Any, **kwargs: Any) -> None:
+        """Log a message at the `TRACE` level."""
+        self._log("TRACE", message, args, kwargs)
+
+    def debug(self, message: Any, *args: Any, **kwargs: Any) -> None:
+        """Log a message at the `DEBUG` level."""
+        self._log("DEBUG", message, args, kwargs)
+
+    def info(self, message: Any, *args: Any, **kwargs: Any) -> None:
+        """Log a message at the `INFO` level."""
+        self._log("INFO", message, args, kwargs)
+
+    def success(self, message: Any, *args: Any, **kwargs: Any) -> None:
+        """Log a message at the `SUCCESS` level."""
+        self._log("SUCCESS", message, args, kwargs)
+
+    def warning(self, message: Any, *args: Any, **kwargs: Any) -> None:
+        """Log a message at the `WARNING` level."""
+        self._log("WARNING", message, args, kwargs)
+
+    def error(self, message: Any, *args: Any, **kwargs: Any) -> None:
+        """Log a message at the `ERROR` level."""
+        self._log("ERROR", message, args, kwargs)
+
+    def critical(self, message: Any, *args: Any, **kwargs: Any) -> None:
+        """Log a message at the `CRITICAL` level."""
+        self._log("CRITICAL", message, args, kwargs)
+
+
+logger = Logger()
@@ -1,26 +1,54 @@
 """molting main."""
-import argparse
+import os
 import re
 import sys
+import time
+from contextlib import contextmanager
 from datetime import datetime
 from functools import partial
 from pathlib import Path
-from subprocess import CalledProcessError, run
-from typing import List
+from typing import (
+    TYPE_CHECKING,
+    Dict,
+    FrozenSet,
+    Iterator,
+    List,
+    NamedTuple,
+    Optional,
+    Sequence,
+    Set,
+    TextIO,
+    Tuple,
+)
+
+from molting import log, trace
+from molting.changelog import CHANGES_TITLES, RE_SECTION, Changelog, ChangelogLayout
+from molting.classify import DEFAULT_CLASSIFIER, CommitClassifier
+from molting.files import Edit, WritePlan, file_lock, splice_file, write_file
+from molting.git import Git
+from molting.history import CommitScan, CommitScanCache, iter_commits
+from molting.log import logger
+from molting.manifests import PYPROJECT_FORMAT, VersionSpan
+from molting.phases import Phase, run_phases
+from molting.publish import (
+    Step,
+    commit_steps,
+    github_release_step,
+    publish,
+    push_steps,
+)
+from molting.shallow import deepen_history
+from molting.targets import PRUNED_DIRECTORIES, VersionTargetIndex
+from molting.version import TagIndex, Version
 
-from loguru import logger
+if TYPE_CHECKING:  # pragma: no cover
+    from molting.objects import GitReader
+    from molting.plan import BumpPlan
 
 RE_REPOSITORY = re.compile(
     r'^repository = (["\'])(?P<repository>.*)(["\'])$', re.MULTILINE
 )
-RE_PYPROJECT_VERSION = re.compile(
-    r'version = (["\'])(?P<version>\d+\.\d+(\.\d+)?)(["\'])'
-)
-RE_INIT_VERSION = re.compile(
-    r'__version__ = (["\'])(?P<version>\d+\.\d+(\.\d+)?)(["\'])'
-)
 RE_NAME = re.compile(r'^name = (["\'])(?P<name>.*)(["\'])$', re.MULTILINE)
-RE_LINK = re.compile(r"^\[(.*)\]: (.*)$")
 
 
 def combine_items(items, callable):
@@ -32,16 +60,287 @@ def combine_items(items, callable):
     return callable(args)
 
 
+class PyprojectDocument(NamedTuple):
+    """Fields parsed from a single read of `pyproject.toml`.
+
+    Versions are the ones of the `[project]` and `[tool.poetry]` tables, with
+    byte offsets into the file.
+    """
+
+    text: str
+    stat: Tuple[int, int]
+    name: Optional[str]
+    version: Optional[str]
+    versions: List[VersionSpan]
+    repository: Optional[str]
+
+    @classmethod
+    def parse(cls, data: bytes, stat: Tuple[int, int]) -> "PyprojectDocument":
+        """Parse the contents of a `pyproject.toml` file.
+
+        Args:
+            data (bytes): Contents of the file
+            stat (Tuple[int, int]): Modification time in nanoseconds and size of
+              the file the text was read from
+
+        Returns:
+            PyprojectDocument: Parsed document
+        """
+        text = data.decode("utf-8")
+        name = RE_NAME.search(text)
+        versions = PYPROJECT_FORMAT.locate(data)
+        repository = RE_REPOSITORY.search(text)
+        return cls(
+            text=text,
+            stat=stat,
+            name=name.group("name") if name else None,
+            version=versions[0].version if versions else None,
+            versions=versions,
+            repository=repository.group("repository") if repository else None,
+        )
+
+
 class Project:
-    """Data and methods for a project."""
+    """Data and methods for a project.
+
+    Parsed files, release tags and commit messages are cached, and reused for
+    as long as they are current. A project can therefore serve many bumps,
+    e.g. in a long-running `molting serve`.
+    """
 
     project_directory: Path
     dry_run: bool
-
-    def __init__(self, project_directory: Path, dry_run: bool) -> None:
+    tag_prefix: str
+    version_targets: Optional[List[Path]]
+    searched_directories: FrozenSet[str]
+    max_workers: Optional[int]
+    git: Git
+    write_plan: Optional[WritePlan]
+
+    def __init__(
+        self,
+        project_directory: Path,
+        dry_run: bool,
+        tag_prefix: str = "",
+        version_targets: Optional[Sequence[Path]] = None,
+        max_workers: Optional[int] = None,
+        searched_directories: Sequence[str] = (),
+    ) -> None:
         """Initialize Project."""
         self.project_directory = Path(project_directory)
         self.dry_run = dry_run
+        self.tag_prefix = tag_prefix
+        # Threads each level of a bump of the project may use, e.g. to run
+        # phases or rewrite files, None for the `ThreadPoolExecutor` default
+        self.max_workers = max_workers
+        self.version_targets = (
+            [Path(target) for target in version_targets]
+            if version_targets is not None
+            else None
+        )
+        # Directories searched for version files even though they are part
+        # of `targets.PRUNED_DIRECTORIES`, e.g. `generated`
+        self.searched_directories = frozenset(searched_directories)
+        self._version_index: Optional[VersionTargetIndex] = None
+        self.git = Git(self.project_directory)
+        self._pyproject_document: Optional[PyprojectDocument] = None
+        self._changelog_layout: Optional[Tuple[Tuple[int, int], ChangelogLayout]] = None
+        self._tag_index: Optional[Tuple[object, TagIndex]] = None
+        self._commit_scan: Optional[CommitScan] = None
+        self._commit_scans = CommitScanCache(self.git)
+        self._deepened: Set[str] = set()
+        self._package_scans: Dict[str, CommitScan] = {}
+        self.write_plan = None
+
+    @contextmanager
+    def transaction(
+        self, write_plan: Optional[WritePlan] = None
+    ) -> Iterator[WritePlan]:
+        """Stage every file change in a write plan instead of writing it.
+
+        The caller applies the plan once all changes are staged. If anything
+        fails before the end of the block, the files already written are
+        restored.
+
+        Args:
+            write_plan (WritePlan, optional): Plan to stage the changes in,
+              e.g. to share one plan between several projects
+
+        Yields:
+            WritePlan: Plan holding the staged changes
+        """
+        write_plan = write_plan if write_plan is not None else WritePlan()
+        self.write_plan = write_plan
+        try:
+            yield write_plan
+        except BaseException:
+            write_plan.rollback()
+            raise
+        else:
+            write_plan.commit()
+        finally:
+            self.write_plan = None
+
+    def _splice_file(self, path: Path, edits: Sequence[Edit]) -> None:
+        """Apply byte range edits to a file, or stage them during a transaction.
+
+        Outside of a transaction, nothing is written in dry-run mode.
+        """
+        if self.write_plan is not None:
+            self.write_plan.stage(path, edits)
+        elif self.dry_run:
+            logger.debug("Would edit {}", path)
+        else:
+            splice_file(path, edits)
+
+    @property
+    def pyproject(self) -> Path:
+        """Path to the `pyproject.toml` of the project."""
+        return self.project_directory / "pyproject.toml"
+
+    def get_pyproject_document(self) -> PyprojectDocument:
+        """Returns the parsed `pyproject.toml`, reading it only when it changed.
+
+        The cached document is reused for as long as the modification time and
+        size of the file stay the same.
+
+        Returns:
+            PyprojectDocument: Parsed `pyproject.toml`
+        """
+        stat_result = self.pyproject.stat()
+        stat = (stat_result.st_mtime_ns, stat_result.st_size)
+        document = self._pyproject_document
+        if document is None or document.stat != stat:
+            logger.debug("Parsing {}", self.pyproject)
+            document = PyprojectDocument.parse(self.pyproject.read_bytes(), stat)
+            self._pyproject_document = document
+        return document
+
+    def tag_name(self, version: str) -> str:
+        """Returns the git tag used for a version of this project.
+
+        Args:
+            version (str): Version number
+
+        Returns:
+            str: Tag name, e.g. `v1.2.3`, or `name-v1.2.3` inside a monorepo
+        """
+        return f"{self.tag_prefix}v{version}"
+
+    def get_release_tags(self) -> TagIndex:
+        """Returns the sorted release tags, reading them only when tags changed.
+
+        Returns:
+            TagIndex: Release tags of the project
+        """
+        stat = self.git.tags_stat()
+        cached = self._tag_index
+        if (
+            stat is None
+            or cached is None
+            or cached[0] != stat
+            or cached[1].prefix != self.tag_prefix
+        ):
+            tags = TagIndex.from_git(self.git, self.tag_prefix)
+            logger.debug("Found {} release tags", len(tags))
+            cached = (stat, tags)
+            self._tag_index = cached
+        return cached[1]
+
+    def use_commit_scan(self, starting_version: str, scan: CommitScan) -> None:
+        """Use commits read elsewhere as the ones since a release.
+
+        Used for the packages of a monorepo, whose commits are only the ones
+        that touched their directory.
+
+        Args:
+            starting_version (str): Tag of the release
+            scan (CommitScan): Complete scan of the commits since the release
+        """
+        self._package_scans[starting_version] = scan
+
+    def _scan_commits(
+        self, starting_version: str, complete: bool
+    ) -> Optional[CommitScan]:
+        if starting_version in self._package_scans:
+            return self._package_scans[starting_version]
+        if starting_version not in self._deepened:
+            deepen_history(self.git, starting_version)
+            self._deepened.add(starting_version)
+        start = self.git.resolve(starting_version)
+        end = self.git.resolve("HEAD")
+        if start is None or end is None:
+            return None
+        cached = self._commit_scan
+        if (
+            cached is None
+            or (cached.start, cached.head) != (start, end)
+            or (complete and not cached.complete)
+        ):
+            cached = self._commit_scans.scan(start, end, complete)
+            self._commit_scan = cached
+        return cached
+
+    def get_commit_messages(self, starting_version: str) -> List[str]:
+        """Returns the commit messages since a release.
+
+        The messages are cached for as long as neither the release nor `HEAD`
+        move.
+
+        Args:
+            starting_version (str): Tag of the release, not included in the
+              results
+
+        Returns:
+            List[str]: Non-empty lines of the commit messages
+        """
+        scan = self._scan_commits(starting_version, complete=True)
+        if scan is None:
+            return get_commit_messages(starting_version, git=self.git)
+        return scan.messages
+
+    def guess_change_type(self, starting_version: str) -> str:
+        """Guess the change type of the commits since a release.
+
+        Commits are only read up to the newest major change, and cached
+        together with their messages.
+
+        Args:
+            starting_version (str): Tag of the release
+
+        Returns:
+            str: One of `patch`, `minor` or `major`
+        """
+        scan = self._scan_commits(starting_version, complete=False)
+        if scan is None:
+            return guess_change_type(
+                get_commit_messages(starting_version, git=self.git)
+            )
+        change_type, decided_by = self._commit_scans.classify(scan)
+        if decided_by is not None:
+            logger.debug("Found `{}` version keyword in {}", change_type, decided_by)
+        logger.debug("Guessing change is {!r}", change_type)
+        return change_type
+
+    def get_previous_release(self, version: str) -> str:
+        """Returns the tag of the release a version was bumped from.
+
+        This is the highest release tag not above `version`, so a
+        `pyproject.toml` that is ahead of the last release still finds it.
+
+        Args:
+            version (str): Current version number
+
+        Returns:
+            str: Tag name, or the tag of `version` itself if no release tag
+            is at or below it
+        """
+        tags = self.get_release_tags()
+        previous = tags.previous_release(Version.parse(version))
+        if previous is None:
+            return self.tag_name(version)
+        logger.debug("Found previous release {!r}", previous)
+        return previous
 
     def get_repository(self) -> str:
         """Returns the repository URL.
@@ -53,15 +352,16 @@ class Project:
         Returns:
             str: Full URL of the repository
         """
-        pyproject = self.project_directory / "pyproject.toml"
-        logger.debug(f"Searching for `repository` in {pyproject.resolve()}")
-        match = RE_REPOSITORY.search(pyproject.read_text())
-        if not match:
+        pyproject = self.pyproject
+        logger.opt(lazy=True).debug(
+            "Searching for `repository` in {}", pyproject.resolve
+        )
+        repository = self.get_pyproject_document().repository
+        if repository is None:
             raise ValueError(f"Could not find repository in {pyproject}")
-        repository = match.group("repository")
         if not repository.endswith("/"):
             repository = f"{repository}/"
-        logger.debug(f"Found repository {repository!r} in pyproject.toml")
+        logger.debug("Found repository {!r} in pyproject.toml", repository)
         return repository
 
     def get_name(self) -> str:
@@ -74,13 +374,12 @@ class Project:
         Returns:
             str: Name of the project
         """
-        pyproject = self.project_directory / "pyproject.toml"
-        logger.debug(f"Searching for `name` in {pyproject.resolve()}")
-        match = RE_NAME.search(pyproject.read_text())
-        if not match:
+        pyproject = self.pyproject
+        logger.opt(lazy=True).debug("Searching for `name` in {}", pyproject.resolve)
+        name = self.get_pyproject_document().name
+        if name is None:
             raise ValueError(f"Could not find name in {pyproject}")
-        name = match.group("name")
-        logger.debug(f"Found name {name!r} in pyproject.toml")
+        logger.debug("Found name {!r} in pyproject.toml", name)
         return name
 
     def get_version(self) -> str:
@@ -89,52 +388,93 @@ class Project:
         Returns:
             str: Current project version
         """
-        pyproject = self.project_directory / "pyproject.toml"
-        logger.debug(f"Searching for `version` in {pyproject.resolve()}")
-        match = RE_PYPROJECT_VERSION.search(pyproject.read_text())
-        if not match:
+        pyproject = self.pyproject
+        logger.opt(lazy=True).debug("Searching for `version` in {}", pyproject.resolve)
+        version = self.get_pyproject_document().version
+        if version is None:
             raise ValueError(f"Could not find version in {pyproject}")
-        version = match.group("version")
-        logger.debug(f"Found version {version!r} in pyproject.toml")
+        logger.debug("Found version {!r} in pyproject.toml", version)
         return version
 
     def update_pyproject(self, version_number: str):
         """Update the version found in `pyproject.toml`.
 
         Args:
-            version_number (str): _description_
+            version_number (str): New version number
         """
-        pyproject = self.project_directory / "pyproject.toml"
-        file_text = pyproject.read_text()
-        new_text = RE_PYPROJECT_VERSION.sub(f'version = "{version_number}"', file_text)
-        logger.debug("Writing pyproject.toml changes")
-        if self.dry_run:
-            logger.trace(new_text)
-        else:
-            pyproject.write_text(new_text)
+        pyproject = self.pyproject
+        with file_lock(pyproject):
+            document = self.get_pyproject_document()
+            # Only the version of the project, not the ones of its dependencies
+            edits = PYPROJECT_FORMAT.edits(document.versions, version_number)
+            if not edits:
+                logger.debug("pyproject.toml is already at {!r}", version_number)
+                return
+            logger.debug("Writing pyproject.toml changes")
+            self._splice_file(pyproject, edits)
+            self._pyproject_document = None
 
     def update_init(self, version_number: str, project_name: str):
         """Update the version found in `__init__.py`.
 
         Will not add a version string if one doesn't already exist in the file.
+        Searches `src/{project_name}` unless the project has version targets.
 
         Args:
             version_number (str): New version number
             project_name (str): Name of the python project containing __init__
               files
         """
-        init_files = self.project_directory.glob(f"src/{project_name}/**/__init__.py")
-        for init in init_files:
-            logger.debug(f"Searching for `__version__` in {init.resolve()}")
-            file_text = init.read_text()
-            new_text = RE_INIT_VERSION.sub(
-                f'__version__ = "{version_number}"', file_text
+        changed = self.get_version_index(project_name).rewrite(
+            version_number,
+            dry_run=False,
+            max_workers=self.max_workers,
+            splice=self._splice_file,
+        )
+        logger.debug("Updated the version in {} files", len(changed))
+
+    def get_version_index(self, project_name: str) -> VersionTargetIndex:
+        """Returns the index of the files holding a `__version__` string.
+
+        Args:
+            project_name (str): Name of the python project, used to search
+              `src/{project_name}` when no version targets were configured
+
+        Returns:
+            VersionTargetIndex: Index of the version files
+        """
+        targets = self.version_targets or [Path("src") / project_name]
+        targets = [self.project_directory / target for target in targets]
+        pruned = PRUNED_DIRECTORIES - self.searched_directories
+        index = self._version_index
+        if index is None or (index.targets, index.pruned) != (targets, pruned):
+            git_directory = self.git.git_directory
+            manifest_path = (
+                git_directory / "molting" / "version-files.json"
+                if git_directory is not None
+                else None
             )
-            logger.debug("Writing __init__.py changes")
-            if self.dry_run:
-                logger.trace(new_text)
-            else:
-                init.write_text(new_text)
+            index = VersionTargetIndex(targets, pruned, manifest_path)
+            self._version_index = index
+        return index
+
+    @property
+    def changelog(self) -> Changelog:
+        """The `CHANGELOG.md` of the project."""
+        return Changelog(self.project_directory / "CHANGELOG.md")
+
+    def get_changelog_layout(self) -> ChangelogLayout:
+        """Returns the scanned `CHANGELOG.md`, scanning it only when it changed.
+
+        Returns:
+            ChangelogLayout: Positions of the editable parts of the changelog
+        """
+        changelog = self.changelog
+        stat_result = changelog.path.stat()
+        stat = (stat_result.st_mtime_ns, stat_result.st_size)
+        if self._changelog_layout is None or self._changelog_layout[0] != stat:
+            self._changelog_layout = (stat, changelog.scan())
+        return self._changelog_layout[1]
 
     def update_changelog(self, old_version_number: str, version_number: str):
         """Update `CHANGELOG.md` for the new version.
@@ -143,84 +483,97 @@ class Project:
             old_version_number (str): Previous version
             version_number (str): Version to be released
         """
-        changelog = self.project_directory / "CHANGELOG.md"
-        file_text = changelog.read_text()
-        file_lines = file_text.splitlines()
-        changes_title = guess_title(file_lines)
-        file_text = file_text.replace(
-            f"## [{changes_title}]",
-            f"## [{changes_title}]\n\n## [{version_number}] - {datetime.now():%Y-%m-%d}",
-        )
-        repository = self.get_repository()
-
-        # Update links at the bottom of the GHANGELOG
-        if re.search(rf"^\[{changes_title}\]:.*$", file_text, flags=re.MULTILINE):
-            logger.debug(f"Found [{changes_title}] section")
-            file_text = re.sub(
-                rf"^\[{changes_title}\]:.*$",
-                "\n".join(
-                    [
-                        f"[{changes_title}]: "
-                        f"{repository}compare/v{version_number}...HEAD",
-                        f"[{version_number}]: "
-                        f"{repository}compare/v{old_version_number}...v{version_number}",
-                    ]
-                ),
-                file_text,
-                flags=re.MULTILINE,
+        changelog = self.changelog
+        with file_lock(changelog.path):
+            layout = self.get_changelog_layout()
+            changes_title = layout.title
+            repository = self.get_repository()
+            old_tag = self.tag_name(old_version_number)
+            new_tag = self.tag_name(version_number)
+            heading = changelog.insert_after_title(
+                layout, f"## [{version_number}] - {datetime.now():%Y-%m-%d}"
             )
-        else:
-            logger.debug(f"Didn't find [{changes_title}] section")
-            file_text = "\n\n".join(
-                [
-                    file_text,
-                    f"[{changes_title}]: {repository}compare/v{version_number}...HEAD",
-                ]
+
+            # Update links at the bottom of the GHANGELOG
+            links = [f"[{changes_title}]: {repository}compare/{new_tag}...HEAD"]
+            if layout.title_link is not None:
+                links.append(
+                    f"[{version_number}]: {repository}compare/{old_tag}...{new_tag}"
+                )
+            link = changelog.replace_title_link(layout, links)
+            logger.debug(
+                "Moving change notes from [{}] to v{}", changes_title, version_number
             )
-        logger.debug(f"Moving change notes from [{changes_title}] to v{version_number}")
-        if self.dry_run:
-            logger.trace(file_text)
-        else:
-            changelog.write_text(file_text)
+            self._splice_file(changelog.path, [heading, link])
+
+    def backfill_changelog(self) -> str:
+        """Write the sections of every past release to `CHANGELOG.md` at once.
+
+        The commits of the whole history are read in a single pass and split
+        into releases at the release tags. The head of an existing changelog
+        is kept, and the unreleased commits become its notes if it has none.
+
+        Raises:
+            ValueError: There are no release tags, or the changelog already
+              has released sections.
+
+        Returns:
+            str: The new contents of the changelog, not written in dry-run mode
+        """
+        from molting.backfill import read_releases, render_notes, render_releases
+
+        changelog = self.changelog
+        with file_lock(changelog.path):
+            if changelog.path.exists():
+                layout = self.get_changelog_layout()
+                head = changelog.path.read_text().rstrip()
+                released = any(
+                    match[1] not in CHANGES_TITLES
+                    for match in map(RE_SECTION.match, head.splitlines())
+                    if match is not None
+                )
+                if released or layout.title_link is not None:
+                    raise ValueError(f"{changelog.path} already has releases")
+            else:
+                layout = None
+                head = "# Changelog"
+            title = layout.title if layout is not None else None
+            if title is None:
+                title = CHANGES_TITLES[0]
+                head = f"{head}\n\n## [{title}]"
+            history = read_releases(self.git, self.get_release_tags())
+            if not history.releases:
+                raise ValueError(f"No {self.tag_prefix}v* release tags to backfill")
+            if layout is None or not layout.notes:
+                head = "\n".join([head, "", *render_notes(history.unreleased)])
+            repository = self.get_repository()
+            sections, links = render_releases(history, repository)
+            latest = history.releases[0].tag
+            footer = "\n".join(
+                [f"[{title}]: {repository}compare/{latest}...HEAD", links]
+            )
+            text = f"{head.rstrip()}\n\n{sections}\n\n\n{footer.rstrip()}\n"
+            logger.debug(
+                "Backfilled {} releases in {}", len(history.releases), changelog.path
+            )
+            if not self.dry_run:
+                write_file(changelog.path, text.encode("utf-8"))
+            return text
 
     def extract_changelog_notes(self):
         """Parse the CHANGELOG.md and return the latest unreleased changes.
 
-        Args:
-            project_directory (Path): Path to the current project
-
         Returns:
             str: Description of the changes
         """
-        changelog = self.project_directory / "CHANGELOG.md"
-        logger.debug(f"Searching for changelog notes in {changelog}")
-        file_text = changelog.read_text()
-        file_lines = file_text.splitlines()
-        changes_title = guess_title(file_lines)
-        try:
-            index = [
-                idx
-                for idx, line in enumerate(file_lines)
-                if line.startswith(f"## [{changes_title}]")
-            ][0]
-        except IndexError:
-            logger.debug(f"Couldn't find any lines staring with ## [{changes_title}]")
+        changelog = self.changelog
+        logger.debug("Searching for changelog notes in {}", changelog.path)
+        layout = self.get_changelog_layout()
+        if layout.title is None:
+            logger.debug("Couldn't find an unreleased changes section")
             return ""
-        after_latest = file_lines[index + 1 :]
-        latest_changes = []
-        for line in after_latest:
-            if RE_LINK.fullmatch(line) is not None:
-                pass
-            elif line.startswith("## ["):
-                # New version, no need to look at the rest of the lines
-                break
-            elif not line.strip():
-                pass
-            else:
-                latest_changes.append(line)
-        notes = "\n".join(latest_changes)
-        line_count = notes.count("\n") + 1 if notes else 0
-        logger.debug(f"Found {line_count} notes in CHANGELOG.md")
+        notes = "\n".join(layout.notes)
+        logger.debug("Found {} notes in CHANGELOG.md", len(layout.notes))
         return notes
 
     def add_changelog_notes(self, notes: str):
@@ -229,105 +582,151 @@ class Project:
         Args:
             notes (str): Notes to add
         """
-        changelog = self.project_directory / "CHANGELOG.md"
-        file_text = changelog.read_text()
-        file_lines = file_text.splitlines()
-        changes_title = guess_title(file_lines)
-        logger.debug(f"Adding to [{changes_title}] section in {changelog}")
-
-        file_text = file_text.replace(
-            f"## [{changes_title}]", f"## [{changes_title}]\n\n{notes}"
-        )
-        if self.dry_run:
-            logger.trace(file_text)
-        else:
-            changelog.write_text(file_text)
+        changelog = self.changelog
+        with file_lock(changelog.path):
+            layout = self.get_changelog_layout()
+            logger.debug("Adding to [{}] section in {}", layout.title, changelog.path)
+            edit = changelog.insert_after_title(layout, notes)
+            self._splice_file(changelog.path, [edit])
 
     def create_tag(self, version: str):
         """Create a tag for the specified version.
 
+        The commit and tag are pushed in a single atomic push. Depends on `git`.
+
+        Args:
+            version (str): Version number to use for the tag
+        """
+        logger.info("Creating git tag for {!r}", version)
+        self.commit_release(version)
+        steps = push_steps([(self.tag_name(version), "")])
+        publish(steps[:1], self.project_directory, self.dry_run, self.git)
+
+    def commit_release(self, version: str):
+        """Commit the bumped files and tag the commit, without pushing them.
+
         Depends on `git`.
 
         Args:
             version (str): Version number to use for the tag
         """
-        logger.info(f"Creating git tag for {version!r}")
-        if self.dry_run:
-            run_command = partial(combine_items, callable=logger.debug)
-        else:
-            run_command = partial(run, text=True, cwd=self.project_directory)
-        run_command(["git", "add", "."])
-        run_command(["git", "commit", "-m", f"Bump version to v{version}"])
-        run_command(["git", "tag", f"v{version}"])
-        run_command(["git", "push"])
-        run_command(["git", "push", "--tags"])
+        steps = self.release_commit_steps(version)
+        publish(steps, self.project_directory, self.dry_run, self.git)
+
+    def push_release(self, version: str, notes: str):
+        """Push the release commit and tag, then create a GitHub release.
+
+        Depends on `git`, and on a GitHub token or the GitHub CLI.
+
+        Args:
+            version (str): Version number to release
+            notes (str): Release notes
+        """
+        steps = self.release_push_steps(version, notes)
+        publish(steps, self.project_directory, self.dry_run, self.git)
+
+    def release_commit_steps(self, version: str) -> List[Step]:
+        """Returns the steps committing the bumped files and tagging the commit.
+
+        Args:
+            version (str): Version number to use for the tag
+        """
+        return commit_steps([self.tag_name(version)], self._commit_message(version))
+
+    def release_push_steps(self, version: str, notes: str) -> List[Step]:
+        """Returns the steps pushing the release and creating a GitHub release.
+
+        Args:
+            version (str): Version number to release
+            notes (str): Release notes
+        """
+        return push_steps([(self.tag_name(version), notes)])
 
     def create_github_release(self, version: str, notes: str):
         """Create a new GitHub release.
 
-        Depends on the GitHub CLI.
+        Depends on a GitHub token or the GitHub CLI.
 
         Args:
             version (str): Version tag to release. If a matching git tag does not
             exist yet, one will automatically be created.
             notes (str): Release notes.
         """
-        logger.info(f"Creating GitHub release for {version!r}")
-        if self.dry_run:
-            run_command = partial(combine_items, callable=logger.debug)
-        else:
-            run_command = partial(run, text=True, cwd=self.project_directory)
-        run_command(
-            [
-                "gh",
-                "release",
-                "create",
-                f"v{version}",
-                "--title",
-                f"v{version}",
-                "--notes",
-                notes,
-            ]
-        )
+        logger.info("Creating GitHub release for {!r}", version)
+        step = github_release_step(self.tag_name(version), notes)
+        publish([step], self.project_directory, self.dry_run)
+
+    def _commit_message(self, version: str) -> str:
+        return f"Bump version to {self.tag_name(version)}"
 
 
-def get_commit_messages(starting_version: str, ending_version: str = "HEAD"):
+def get_commit_messages(
+    starting_version: str, ending_version: str = "HEAD", git: Optional[Git] = None
+):
     """Get the commit messages from the current git branch.
 
-    Depends on `git`.
+    Depends on `git`. Shallow clones are deepened first, until the starting
+    version is reachable.
 
     Args:
         starting_version (str): Starting version number, not included in the results
         ending_version (str): Ending version number, defaults to HEAD
+        git (Git, optional): Repository to read, defaults to the one in the
+          current working directory
 
     Returns:
         list: List of commit message lines
     """
-    run_command = partial(run, capture_output=True, text=True)
-    try:
-        # If this executes successfully, then the version exists locally
-        result = run_command(["git", "rev-parse", starting_version], check=True)
-        result.check_returncode()
-        logger.debug(f"Found git ref for {starting_version!r}")
-    except CalledProcessError:
-        logger.debug(f"Didn't find git ref {starting_version!r}")
+    if git is None:
+        with Git() as git:
+            return get_commit_messages(starting_version, ending_version, git)
+    deepen_history(git, starting_version)
+    reader = git.reader
+    if reader is not None:
+        from molting.objects import UnsupportedRepository
+
+        try:
+            return _read_commit_messages(reader, starting_version, ending_version)
+        except UnsupportedRepository as error:
+            logger.debug("Reading the commits with git instead: {}", error)
+    # If this resolves, then the version exists locally
+    if git.resolve(starting_version) is not None:
+        logger.debug("Found git ref for {!r}", starting_version)
+    else:
+        logger.debug("Didn't find git ref {!r}", starting_version)
         # Couldn't find the starting version, so instead get the initial repo commit
-        starting_version = run_command(
-            ["git", "rev-list", "--max-parents=0", "HEAD"],
-        ).stdout[:7]
-        logger.debug(f"Using git ref {starting_version!r} as starting point")
+        starting_version = git.run("rev-list", "--max-parents=0", "HEAD").stdout[:7]
+        logger.debug("Using git ref {!r} as starting point", starting_version)
 
-    log_lines = run_command(
-        [
-            "git",
-            "--no-pager",
-            "log",
-            "--format=%B",
-            f"{starting_version}...{ending_version}",
-        ],
-    ).stdout.splitlines()
-    non_empty_lines = [line for line in log_lines if line.strip()]
-    logger.debug(f"Found {len(non_empty_lines)} lines")
+    commits = iter_commits(git, f"{starting_version}...{ending_version}", check=False)
+    non_empty_lines = [line for commit in commits for line in commit.lines]
+    logger.debug("Found {} lines", len(non_empty_lines))
+    return non_empty_lines
+
+
+def _read_commit_messages(
+    reader: "GitReader", starting_version: str, ending_version: str
+) -> List[str]:
+    """`get_commit_messages`, without starting git."""
+    from molting.objects import UnsupportedRepository
+
+    if reader.resolve(starting_version) is not None:
+        logger.debug("Found git ref for {!r}", starting_version)
+    else:
+        logger.debug("Didn't find git ref {!r}", starting_version)
+        starting_version = reader.root_commit(ending_version)
+        if starting_version is None:
+            raise UnsupportedRepository("No commits to start from")
+        logger.debug("Using git ref {!r} as starting point", starting_version)
+    # Only the lines of the messages are needed, not their trailers
+    commits = reader.read_range(starting_version, ending_version)
+    non_empty_lines = [
+        line
+        for commit in commits
+        for line in commit.message.splitlines()
+        if line.strip()
+    ]
+    logger.debug("Found {} lines", len(non_empty_lines))
     return non_empty_lines
 
 
@@ -341,14 +740,13 @@ def guess_title(notes) -> str:
         str: Found title
     """
     logger.debug("Searching for new changes title")
-    titles = ["Unreleased", "Latest Changes"]
-    for title in titles:
+    for title in CHANGES_TITLES:
         search = f"## [{title}]"
         if search in notes:
-            logger.debug(f"Found {search}")
+            logger.debug("Found {}", search)
             return title
         else:
-            logger.debug(f"Didn't find {search}")
+            logger.debug("Didn't find {}", search)
 
 
 def increase_version_number(version_number: str, version_part: str) -> str:
@@ -358,51 +756,323 @@ def increase_version_number(version_number: str, version_part: str) -> str:
         version_number (str): Current version number
         version_part (str): SemVer version part, one of `patch`, `minor` or `major`
 
+    Raises:
+        ValueError: The version number or version part is invalid.
+
     Returns:
         str: New version number
     """
-    version_split = list(map(int, version_number.split(".")))
+    return str(Version.parse(version_number).bump(version_part))
 
-    if len(version_split) == 2:
-        version_split.append(0)
 
-    if version_part == "patch":
-        version_split[2] += 1
-    elif version_part == "minor":
-        version_split[1] += 1
-        version_split[2] = 0
-    elif version_part == "major":
-        version_split[0] += 1
-        version_split[1] = 0
-        version_split[2] = 0
-
-    return ".".join(map(str, version_split))
+def guess_change_type(
+    lines: List[str], classifier: Optional[CommitClassifier] = None
+) -> str:
+    """Guess the change type based on the commit message.
 
+    Args:
+        lines (List[str]): Commit messages, or lines of commit messages
+        classifier (CommitClassifier, optional): Rules to classify the messages
+          with. Defaults to keywords and conventional commits.
 
-def guess_change_type(lines: List[str]) -> str:
-    """Guess the change type based on the commit message."""
-    # Default to patch version
+    Returns:
+        str: One of `patch`, `minor` or `major`
+    """
     logger.debug("Attempting to guess change type")
-    current_guess = "patch"
-    minor_words = ["feat", "change", "improve"]
-    for line in lines:
-        # If breaking is found, immediately guess major without considering the
-        # rest of the lines
-        if "breaking" in line.lower():
-            logger.debug(f"Found `major` version keyword in {line}")
-            return "major"
-
-        # If we come across a minor version word, change our guess
-        if any(minor_word in line.lower() for minor_word in minor_words):
-            logger.debug(f"Found `minor` version keyword in {line}")
-            current_guess = "minor"
-
-    logger.debug(f"Guessing change is {current_guess!r}")
-    # Will either be patch or minor at this point
-    return current_guess
-
-
-def bump(project_directory: Path, version_part: str = None, dry_run: bool = True):
+    classifier = classifier or DEFAULT_CLASSIFIER
+    change_type, decided_by = classifier.classify(lines)
+    if decided_by is not None:
+        logger.debug("Found `{}` version keyword in {}", change_type, decided_by)
+    logger.debug("Guessing change is {!r}", change_type)
+    return change_type
+
+
+class BumpResult(NamedTuple):
+    """Outcome of bumping the files of a single project."""
+
+    project: Project
+    old_version: str
+    version: str
+    notes: str
+    seconds: float
+
+
+def update_project_files(
+    project: Project, version_part: str = None, max_workers: Optional[int] = None
+) -> BumpResult:
+    """Bump the version in the files of a project and prepare its release notes.
+
+    Reading the git history, scanning the changelog and finding the version
+    files run concurrently. The changes are staged once all of them are read.
+
+    Args:
+        project (Project): Project to bump
+        version_part (str, optional): Version to bump, one of `patch`, `minor`
+          or `major`. If not specified, then the commit messages will be parsed
+          in order to formulate a guess.
+        max_workers (int, optional): Maximum number of phases run at once, 1
+          to run them one after the other. Defaults to the `max_workers` of
+          the project.
+
+    Returns:
+        BumpResult: Versions, release notes and the time spent on the project
+    """
+    start = time.perf_counter()
+    if max_workers is None:
+        max_workers = project.max_workers
+
+    def read_pyproject(inputs):
+        return project.get_version(), project.get_name()
+
+    def scan_changelog(inputs):
+        return project.extract_changelog_notes()
+
+    def read_history(inputs):
+        old_version, _ = inputs["read pyproject"]
+        previous_release = project.get_previous_release(old_version)
+        part = version_part or project.guess_change_type(previous_release)
+        version = increase_version_number(old_version, part)
+        logger.info("Bumping the {!r} version to {!r}", part, version)
+        return previous_release, version
+
+    def find_version_files(inputs):
+        # Warms the version index, which the rewrite reuses
+        _, project_name = inputs["read pyproject"]
+        return project.get_version_index(project_name).version_files()
+
+    def update_changelog(inputs):
+        old_version, _ = inputs["read pyproject"]
+        previous_release, version = inputs["read history"]
+        notes = inputs["scan changelog"]
+        # If empty, use the commit messages
+        if not notes:
+            logger.info("Using the commit messages as changelog notes")
+            commit_messages = project.get_commit_messages(previous_release)
+            notes = "\n - ".join(["", *commit_messages])
+            project.add_changelog_notes(notes)
+        project.update_changelog(old_version, version)
+        return notes
+
+    def update_pyproject(inputs):
+        _, version = inputs["read history"]
+        project.update_pyproject(version)
+
+    def update_version_files(inputs):
+        _, project_name = inputs["read pyproject"]
+        _, version = inputs["read history"]
+        project.update_init(version, project_name)
+
+    results = run_phases(
+        [
+            Phase("read pyproject", read_pyproject),
+            Phase("scan changelog", scan_changelog),
+            Phase("read history", read_history, ("read pyproject",)),
+            Phase("find version files", find_version_files, ("read pyproject",)),
+            Phase(
+                "update changelog",
+                update_changelog,
+                ("read pyproject", "read history", "scan changelog"),
+            ),
+            Phase("update pyproject", update_pyproject, ("read history",)),
+            Phase(
+                "update version files",
+                update_version_files,
+                ("read pyproject", "read history", "find version files"),
+            ),
+        ],
+        max_workers,
+        project=str(project.project_directory),
+    )
+    old_version, _ = results["read pyproject"]
+    _, version = results["read history"]
+    notes = results["update changelog"]
+    logger.info("Bumped files from {!r} to {!r}", old_version, version)
+    return BumpResult(project, old_version, version, notes, time.perf_counter() - start)
+
+
+def write_changes(
+    write_plan: WritePlan,
+    dry_run: bool,
+    plan_file: Optional[Path] = None,
+    output: Optional[TextIO] = None,
+):
+    """Write the staged file changes, or print them as a diff in dry-run mode.
+
+    Args:
+        write_plan (WritePlan): Staged file changes
+        dry_run (bool): Print a unified diff of the changes instead of writing
+          them
+        plan_file (Path, optional): File to save the planned changes to, as
+          JSON
+        output (TextIO, optional): Stream the diff is printed to, defaults to
+          stdout
+    """
+    if plan_file is not None:
+        import json
+
+        plan_file.write_text(f"{json.dumps(write_plan.to_dict(), indent=2)}\n")
+    if not dry_run:
+        write_plan.apply()
+        return
+    from molting.preview import diff_plan
+
+    (output or sys.stdout).writelines(diff_plan(write_plan))
+
+
+def bump_project(
+    project: Project,
+    version_part: str = None,
+    plan_file: Optional[Path] = None,
+    output: Optional[TextIO] = None,
+) -> BumpResult:
+    """Bump the files of a project, then commit, tag, push and release them.
+
+    The git processes of the project are left running, so that the project
+    can be bumped again later.
+
+    Args:
+        project (Project): Project to bump
+        version_part (str, optional): Version to bump, one of `patch`, `minor`
+          or `major`. If not specified, then the commit messages will be parsed
+          in order to formulate a guess.
+        plan_file (Path, optional): File to save the planned file changes to,
+          as JSON
+        output (TextIO, optional): Stream the diff of a dry run is printed to
+
+    Returns:
+        BumpResult: Versions, release notes and the time spent on the project
+    """
+    with trace.span("bump"):
+        # Files are restored if anything fails before the release is committed
+        with project.transaction() as write_plan:
+            result = update_project_files(project, version_part)
+            with trace.span("write files"):
+                write_changes(write_plan, project.dry_run, plan_file, output)
+            with trace.span("commit release"):
+                project.commit_release(result.version)
+        with trace.span("push release"):
+            project.push_release(result.version, result.notes)
+    return result
+
+
+def plan_project(
+    project: Project, version_part: str = None
+) -> Tuple[BumpResult, WritePlan]:
+    """Stage the changes a bump would make to the files of a project.
+
+    Nothing is written, committed or pushed.
+
+    Args:
+        project (Project): Project to plan the bump of
+        version_part (str, optional): Version to bump, guessed from the commit
+          messages if not specified
+
+    Returns:
+        Tuple[BumpResult, WritePlan]: The planned bump, and its file changes
+    """
+    with trace.span("plan"), project.transaction() as write_plan:
+        result = update_project_files(project, version_part)
+    return result, write_plan
+
+
+def plan(
+    project_directory: Path,
+    version_part: str = None,
+    version_targets: Optional[Sequence[Path]] = None,
+    searched_directories: Sequence[str] = (),
+) -> "BumpPlan":
+    """Decide everything about a bump of a project, without changing anything.
+
+    The plan can be saved, and carried out later with `apply`, e.g. by
+    another job, without reading the git history again.
+
+    Args:
+        project_directory (Path): Project root directory
+        version_part (str, optional): Version to bump, one of `patch`, `minor`
+          or `major`. If not specified, then the commit messages will be parsed
+          in order to formulate a guess.
+        version_targets (Sequence[Path], optional): Files, or directories
+          holding `__init__.py` files, whose version should be updated. Files
+          may be manifests of `manifests.VERSION_FORMATS`, e.g. `package.json`.
+          Relative to the project directory, defaults to `src/{project name}`.
+        searched_directories (Sequence[str], optional): Names of directories
+          searched for `__init__.py` files although they are skipped by
+          default, e.g. `generated`
+
+    Returns:
+        BumpPlan: Versions, release notes, file edits and git commands
+    """
+    from molting.plan import BumpPlan
+
+    project = Project(
+        project_directory,
+        True,
+        version_targets=version_targets,
+        searched_directories=searched_directories,
+    )
+    with project.git:
+        result, write_plan = plan_project(project, version_part)
+    return BumpPlan.from_write_plan(
+        project.project_directory,
+        write_plan,
+        old_version=result.old_version,
+        version=result.version,
+        tag=project.tag_name(result.version),
+        notes=result.notes,
+        commit_steps=project.release_commit_steps(result.version),
+        push_steps=project.release_push_steps(result.version, result.notes),
+    )
+
+
+def apply(
+    bump_plan: "BumpPlan",
+    project_directory: Optional[Path] = None,
+    dry_run: bool = False,
+    output: Optional[TextIO] = None,
+):
+    """Carry out a bump plan: write the files, then commit, tag, push and release.
+
+    Args:
+        bump_plan (BumpPlan): Plan made by `plan`
+        project_directory (Path, optional): Checkout to apply the plan to,
+          defaults to the directory the plan was made in
+        dry_run (bool, optional): Print a diff of the changes and log the
+          commands instead of running them
+        output (TextIO, optional): Stream the diff of a dry run is printed to
+
+    Raises:
+        ValueError: A file changed since the plan was made. Nothing is written
+          in that case.
+    """
+    directory = Path(
+        project_directory
+        if project_directory is not None
+        else bump_plan.project_directory
+    )
+    logger.info("Applying the bump to {}", bump_plan.tag)
+    write_plan = bump_plan.stage(directory)
+    with trace.span("apply"), Git(directory) as git:
+        try:
+            with trace.span("write files"):
+                write_changes(write_plan, dry_run, output=output)
+            with trace.span("commit release"):
+                publish(bump_plan.commit_steps, directory, dry_run, git)
+        except BaseException:
+            write_plan.rollback()
+            raise
+        write_plan.commit()
+        with trace.span("push release"):
+            publish(bump_plan.push_steps, directory, dry_run, git)
+
+
+def bump(
+    project_directory: Path,
+    version_part: str = None,
+    dry_run: bool = True,
+    version_targets: Optional[Sequence[Path]] = None,
+    plan_file: Optional[Path] = None,
+    searched_directories: Sequence[str] = (),
+):
     """Bump the project files to the latest version and generate a release.
 
     Args:
@@ -412,36 +1082,229 @@ def bump(project_directory: Path, version_part: str = None, dry_run: bool = True
           in order to formulate a guess.
         dry_run (bool, optional): Don't make any changes, just print out what
           would happen. Defaults to True.
+        version_targets (Sequence[Path], optional): Files, or directories
+          holding `__init__.py` files, whose version should be updated. Files
+          may be manifests of `manifests.VERSION_FORMATS`, e.g. `package.json`.
+          Relative to the project directory, defaults to `src/{project name}`.
+        plan_file (Path, optional): File to save the planned file changes to,
+          as JSON
+        searched_directories (Sequence[str], optional): Names of directories
+          searched for `__init__.py` files although they are skipped by
+          default, e.g. `generated`
+    """
+    project = Project(
+        project_directory,
+        dry_run,
+        version_targets=version_targets,
+        searched_directories=searched_directories,
+    )
+    with project.git:
+        bump_project(project, version_part, plan_file)
+
+
+def publish_releases(
+    results: Sequence[BumpResult],
+    dry_run: bool,
+    write_plan: Optional[WritePlan] = None,
+    plan_file: Optional[Path] = None,
+):
+    """Commit, tag and push the bumps of several projects, then release them.
+
+    All tags are pushed together with the commit in a single atomic push, after
+    which the GitHub releases are created concurrently.
+
+    Depends on `git`, and on a GitHub token or the GitHub CLI.
+
+    Args:
+        results (Sequence[BumpResult]): Bumped projects
+        dry_run (bool): Only log the commands that would be run
+        write_plan (WritePlan, optional): Staged file changes of the projects,
+          applied right before committing. Rolled back if the commit fails.
+        plan_file (Path, optional): File to save the planned file changes to,
+          as JSON
+    """
+    directories = [
+        str(result.project.project_directory.resolve()) for result in results
+    ]
+    repository_directory = Path(os.path.commonpath(directories))
+    releases = [
+        (result.project.tag_name(result.version), result.notes) for result in results
+    ]
+    tags = [tag for tag, _ in releases]
+    logger.info("Publishing {}", ", ".join(tags))
+    with Git(repository_directory) as git:
+        write_plan = write_plan if write_plan is not None else WritePlan()
+        try:
+            with trace.span("write files"):
+                write_changes(write_plan, dry_run, plan_file)
+            steps = commit_steps(
+                tags, f"Bump versions to {', '.join(tags)}", directories
+            )
+            with trace.span("commit release"):
+                publish(steps, repository_directory, dry_run, git)
+        except BaseException:
+            write_plan.rollback()
+            raise
+        write_plan.commit()
+        with trace.span("push release"):
+            publish(push_steps(releases), repository_directory, dry_run, git)
+
+
+def backfill(project_directory: Path, dry_run: bool = True) -> str:
+    """Write the changelog sections of every past release of a project.
+
+    Args:
+        project_directory (Path): Root directory of the project
+        dry_run (bool, optional): Don't write the changelog, just return it.
+          Defaults to True.
+
+    Returns:
+        str: The backfilled changelog
     """
     project = Project(project_directory, dry_run)
-    old_version = project.get_version()
-    commit_messages = get_commit_messages(f"v{old_version}")
+    with project.git:
+        return project.backfill_changelog()
 
-    if not version_part:
-        version_part = guess_change_type(commit_messages)
 
-    version = increase_version_number(old_version, version_part)
+def scan_packages(projects: Sequence[Project]) -> None:
+    """Read the commits of the projects of a monorepo in a single pass.
+
+    Every project then only considers the commits that touched its directory
+    since its previous release, for its change type and changelog notes.
+
+    Args:
+        projects (Sequence[Project]): Projects of the same repository
+
+    Raises:
+        ValueError: Two projects have the same directory.
+    """
+    from molting import monorepo
+
+    git = projects[0].git
+    top = Path(git.run("rev-parse", "--show-toplevel", check=True).stdout.strip())
+    head = git.resolve("HEAD")
+    if head is None:
+        return
+    releases = {}
+    starts: Dict[str, Optional[str]] = {}
+    for project in projects:
+        root = project.project_directory.resolve().relative_to(top.resolve())
+        package = root.as_posix() if root.parts else ""
+        if package in starts:
+            raise ValueError(f"Several projects in {project.project_directory}")
+        previous_release = project.get_previous_release(project.get_version())
+        deepen_history(git, previous_release)
+        releases[package] = (project, previous_release)
+        # Annotated tags are peeled, the scan compares commit shas
+        starts[package] = git.resolve(f"{previous_release}^{{commit}}")
+    with trace.span("scan packages", packages=len(starts)):
+        histories = monorepo.scan_packages(git, starts, head)
+    for package, (project, previous_release) in releases.items():
+        history = histories[package]
+        logger.debug(
+            "Found {} commits touching {!r}", len(history.scan.commits), package
+        )
+        project.use_commit_scan(previous_release, history.scan)
+
+
+def bump_projects(
+    project_directories: Sequence[Path],
+    version_part: str = None,
+    dry_run: bool = True,
+    max_workers: Optional[int] = None,
+    version_targets: Optional[Sequence[Path]] = None,
+    plan_file: Optional[Path] = None,
+    monorepo: bool = False,
+    searched_directories: Sequence[str] = (),
+) -> List[BumpResult]:
+    """Bump several projects in parallel and release them together.
+
+    The files of each project are bumped in a bounded thread pool and staged
+    in a shared write plan, after which every file is written once and a
+    single commit containing every project is tagged and pushed. Tags are
+    prefixed with the project name when more than one project is bumped.
 
-    logger.info(f"Bumping the {version_part!r} version to {version!r}")
+    Args:
+        project_directories (Sequence[Path]): Root directories of the projects
+        version_part (str, optional): Version to bump, one of `patch`, `minor`
+          or `major`. If not specified, then the commit messages of each project
+          will be parsed in order to formulate a guess.
+        dry_run (bool, optional): Don't make any changes, just print out what
+          would happen. Defaults to True.
+        max_workers (int, optional): Maximum number of projects bumped at the
+          same time. The projects bumped at once share the rest of this budget
+          to run their phases and rewrite their files. Defaults to the
+          `ThreadPoolExecutor` default at every level.
+        version_targets (Sequence[Path], optional): Version files of every
+          project, relative to its directory. Defaults to `src/{project name}`.
+        plan_file (Path, optional): File to save the planned file changes to,
+          as JSON
+        monorepo (bool, optional): The projects are packages of the same
+          repository, each released from the commits touching its directory
+        searched_directories (Sequence[str], optional): Names of directories
+          searched for `__init__.py` files although they are skipped by
+          default, e.g. `generated`
 
-    notes = project.extract_changelog_notes()
+    Returns:
+        List[BumpResult]: One result per project, in the order given
+    """
+    project_workers = None
+    if max_workers is not None:
+        concurrent_projects = max(1, min(max_workers, len(project_directories)))
+        project_workers = max(1, max_workers // concurrent_projects)
+    projects = [
+        Project(
+            directory,
+            dry_run,
+            version_targets=version_targets,
+            max_workers=project_workers,
+            searched_directories=searched_directories,
+        )
+        for directory in project_directories
+    ]
+    if len(projects) > 1:
+        for project in projects:
+            project.tag_prefix = f"{project.get_name()}-"
+    if monorepo:
+        scan_packages(projects)
+    write_plan = WritePlan()
+    for project in projects:
+        project.write_plan = write_plan
+    from concurrent.futures import ThreadPoolExecutor
 
-    # If empty, use the commit messages
-    if not notes:
-        logger.info("Using the commit messages as changelog notes")
-        notes = "\n - ".join(["", *commit_messages])
-        project.add_changelog_notes(notes)
-    project.update_changelog(old_version, version)
-    project.update_pyproject(version)
-    project_name = project.get_name()
-    project.update_init(version, project_name)
-    logger.info(f"Bumped files from {old_version!r} to {version!r}")
-    project.create_tag(version)
-    project.create_github_release(version, notes)
+    try:
+        with trace.span("update files"), ThreadPoolExecutor(max_workers) as executor:
+            results = list(
+                executor.map(
+                    partial(update_project_files, version_part=version_part), projects
+                )
+            )
+        for project in projects:
+            project.write_plan = None
+        publish_releases(results, dry_run, write_plan, plan_file)
+    finally:
+        for project in projects:
+            project.git.close()
+    return results
 
 
-def cli():
+def cli(argv: Optional[List[str]] = None):
     """Handle command-line arguments."""
+    # Only imported by the command line, to keep `import molting.main` fast
+    import argparse
+
+    argv = sys.argv[1:] if argv is None else argv
+    commands = {
+        "serve": _serve_from_args,
+        "plan": _plan_from_args,
+        "apply": _apply_from_args,
+        "notes": _notes_from_args,
+        "archive": _archive_from_args,
+        "backfill": _backfill_from_args,
+    }
+    if argv[:1] and argv[0] in commands:
+        commands[argv[0]](argv[1:])
+        return
     parser = argparse.ArgumentParser("Kicks off an automated bump and release process.")
     parser.add_argument(
         "version",
@@ -450,12 +1313,83 @@ def cli():
         help="The type of semver release to make.",
         choices={"major", "minor", "patch"},
     )
-    parser.add_argument("--project-directory", "-d", nargs="?", default=Path("."))
+    parser.add_argument(
+        "--project-directory",
+        "-d",
+        action="append",
+        type=Path,
+        help="Project to bump. Repeat to bump several projects together.",
+    )
+    parser.add_argument(
+        "--version-target",
+        action="append",
+        type=Path,
+        dest="version_targets",
+        help=(
+            "File, or directory of `__init__.py` files, holding `__version__`, "
+            "or a package.json, Cargo.toml, setup.cfg or VERSION file. "
+            "Repeat for several targets. Defaults to src/<project name>."
+        ),
+    )
+    parser.add_argument(
+        "--search-directory",
+        action="append",
+        default=[],
+        dest="searched_directories",
+        metavar="NAME",
+        help=(
+            "Also search directories with this name for `__init__.py` files, "
+            f"although {', '.join(sorted(PRUNED_DIRECTORIES))} are skipped "
+            "by default. Repeat for several names."
+        ),
+    )
+    parser.add_argument(
+        "--monorepo",
+        action="store_true",
+        help=(
+            "The projects are packages of one repository: bump each from the "
+            "commits that touched its directory, read in a single pass"
+        ),
+    )
+    parser.add_argument(
+        "--jobs",
+        "-j",
+        type=int,
+        default=None,
+        help=(
+            "Maximum number of projects to bump in parallel, which share the "
+            "rest of the threads"
+        ),
+    )
     parser.add_argument(
         "--dry-run",
         dest="dry_run",
         action="store_true",
-        help="Don't make any changes, just print out what would happen",
+        help="Don't make any changes, print a diff of the changes instead",
+    )
+    parser.add_argument(
+        "--plan-file",
+        type=Path,
+        help="Save the planned file changes to this file, as JSON",
+    )
+    parser.add_argument(
+        "--connect",
+        action="store_true",
+        help="Let a running `molting serve` bump the project, with its warm caches",
+    )
+    parser.add_argument(
+        "--socket",
+        type=Path,
+        default=None,
+        help="Socket of the `molting serve` to connect to",
+    )
+    parser.add_argument(
+        "--trace-file",
+        type=Path,
+        help=(
+            "Write the time spent in each phase and git or gh process to this "
+            "file, in the Chrome trace format"
+        ),
     )
     parser.add_argument(
         "-log",
@@ -464,12 +1398,280 @@ def cli():
         help=("Provide logging level. " "Example --log debug', default='warning'"),
         choices={"critical", "error", "warning", "success", "info", "debug", "trace"},
     )
-    args = parser.parse_args()
-    logger.remove()
-    log_level = "TRACE" if args.dry_run else args.log.upper()
-    logger.add(sys.stderr, level=log_level)
-    logger.debug(f"Args: {args}")
-    bump(args.project_directory, args.version, args.dry_run)
+    args = parser.parse_args(argv)
+    log.configure(args.log)
+    logger.debug("Args: {}", args)
+    if args.connect and args.project_directory and len(args.project_directory) > 1:
+        parser.error("--connect bumps a single project")
+    if args.trace_file:
+        trace.enable(args.trace_file)
+    try:
+        _bump_from_args(args)
+    finally:
+        trace.disable()
+
+
+def _serve_from_args(argv: List[str]):
+    import argparse
+
+    from molting import server
+
+    parser = argparse.ArgumentParser(
+        "molting serve",
+        description="Serves bumps, keeping the caches of every project warm.",
+    )
+    parser.add_argument(
+        "--socket",
+        type=Path,
+        default=server.DEFAULT_SOCKET,
+        help=f"Socket to listen on, defaults to {server.DEFAULT_SOCKET}",
+    )
+    parser.add_argument(
+        "-log",
+        "--log",
+        default="info",
+        help="Provide logging level, default='info'",
+        choices={"critical", "error", "warning", "success", "info", "debug", "trace"},
+    )
+    args = parser.parse_args(argv)
+    log.configure(args.log)
+    server.serve(args.socket)
+
+
+def _plan_from_args(argv: List[str]):
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        "molting plan",
+        description=(
+            "Decides a bump without changing anything, and saves it as JSON "
+            "for `molting apply`."
+        ),
+    )
+    parser.add_argument(
+        "version",
+        nargs="?",
+        help="The type of semver release to make.",
+        choices={"major", "minor", "patch"},
+    )
+    parser.add_argument(
+        "--project-directory", "-d", type=Path, default=Path("."), help="Project"
+    )
+    parser.add_argument(
+        "--version-target",
+        action="append",
+        type=Path,
+        dest="version_targets",
+        help=(
+            "File, or directory of `__init__.py` files, holding `__version__`, "
+            "or a package.json, Cargo.toml, setup.cfg or VERSION file"
+        ),
+    )
+    parser.add_argument(
+        "--search-directory",
+        action="append",
+        default=[],
+        dest="searched_directories",
+        metavar="NAME",
+        help="Also search directories with this name for `__init__.py` files",
+    )
+    parser.add_argument(
+        "--output", "-o", type=Path, help="File to save the plan to, default stdout"
+    )
+    parser.add_argument(
+        "-log",
+        "--log",
+        default="warning",
+        help="Provide logging level, default='warning'",
+        choices={"critical", "error", "warning", "success", "info", "debug", "trace"},
+    )
+    args = parser.parse_args(argv)
+    log.configure(args.log)
+    bump_plan = plan(
+        args.project_directory,
+        args.version,
+        args.version_targets,
+        args.searched_directories,
+    )
+    if args.output:
+        bump_plan.save(args.output)
+    else:
+        import json
+
+        sys.stdout.write(f"{json.dumps(bump_plan.to_dict(), indent=2)}\n")
+
+
+def _apply_from_args(argv: List[str]):
+    import argparse
+
+    from molting.plan import BumpPlan
+
+    parser = argparse.ArgumentParser(
+        "molting apply",
+        description="Carries out a bump saved by `molting plan`.",
+    )
+    parser.add_argument("plan", type=Path, help="Saved plan")
+    parser.add_argument(
+        "--project-directory",
+        "-d",
+        type=Path,
+        help="Checkout to apply the plan to, defaults to where it was made",
+    )
+    parser.add_argument(
+        "--dry-run",
+        action="store_true",
+        help="Don't make any changes, print a diff of the changes instead",
+    )
+    parser.add_argument(
+        "-log",
+        "--log",
+        default="warning",
+        help="Provide logging level, default='warning'",
+        choices={"critical", "error", "warning", "success", "info", "debug", "trace"},
+    )
+    args = parser.parse_args(argv)
+    log.configure(args.log)
+    apply(BumpPlan.load(args.plan), args.project_directory, args.dry_run)
+
+
+def _notes_from_args(argv: List[str]):
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        "molting notes",
+        description="Prints the changelog notes of a release.",
+    )
+    parser.add_argument("version", help="Version of the release, e.g. 1.2.3")
+    parser.add_argument(
+        "--project-directory", "-d", type=Path, default=Path("."), help="Project"
+    )
+    args = parser.parse_args(argv)
+    log.configure("warning")
+    changelog = Project(args.project_directory, dry_run=True).changelog
+    notes = changelog.release_notes(args.version)
+    if notes is None:
+        parser.exit(1, f"No release {args.version!r} in {changelog.path}\n")
+    print(notes)
+
+
+def _archive_from_args(argv: List[str]):
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        "molting archive",
+        description=(
+            "Moves the releases of past years from the changelog to yearly "
+            "archive files, e.g. CHANGELOG-2021.md."
+        ),
+    )
+    parser.add_argument(
+        "--keep-years",
+        type=int,
+        default=1,
+        help="Number of years of releases kept in the changelog, default 1",
+    )
+    parser.add_argument(
+        "--project-directory", "-d", type=Path, default=Path("."), help="Project"
+    )
+    parser.add_argument(
+        "--dry-run",
+        action="store_true",
+        help="Only print which releases would be moved",
+    )
+    args = parser.parse_args(argv)
+    log.configure("warning")
+    changelog = Project(args.project_directory, dry_run=args.dry_run).changelog
+    before_year = datetime.now().year - args.keep_years + 1
+    moved = changelog.archive(before_year, args.dry_run)
+    for path, titles in moved.items():
+        print(f"{path}: {', '.join(titles)}")
+
+
+def _backfill_from_args(argv: List[str]):
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        "molting backfill",
+        description=(
+            "Writes the changelog sections of every past release, from the "
+            "commits between the release tags."
+        ),
+    )
+    parser.add_argument(
+        "--project-directory", "-d", type=Path, default=Path("."), help="Project"
+    )
+    parser.add_argument(
+        "--dry-run",
+        action="store_true",
+        help="Only print the backfilled changelog",
+    )
+    args = parser.parse_args(argv)
+    log.configure("warning")
+    try:
+        text = backfill(args.project_directory, dry_run=args.dry_run)
+    except ValueError as error:
+        parser.exit(1, f"{error}\n")
+    if args.dry_run:
+        sys.stdout.write(text)
+
+
+def _bump_with_service(args, project_directory: Path):
+    import json
+
+    from molting import server
+
+    request = {
+        "command": "plan" if args.dry_run else "bump",
+        "project_directory": str(project_directory.resolve()),
+        "version_part": args.version,
+        "version_targets": [
+            str(target.resolve()) for target in args.version_targets or []
+        ],
+        "searched_directories": args.searched_directories,
+    }
+    result = server.send_request(request, args.socket or server.DEFAULT_SOCKET)
+    if result["plan"] is not None:
+        if args.plan_file:
+            args.plan_file.write_text(f"{json.dumps(result['plan'], indent=2)}\n")
+        sys.stdout.write(result["diff"])
+    print(
+        f"{result['project_directory']}: {result['old_version']} -> "
+        f"{result['version']} ({result['seconds']:.2f}s)"
+    )
+
+
+def _bump_from_args(args):
+    project_directories = args.project_directory or [Path(".")]
+    if args.connect:
+        _bump_with_service(args, project_directories[0])
+        return
+    if len(project_directories) == 1 and not args.monorepo:
+        bump(
+            project_directories[0],
+            args.version,
+            args.dry_run,
+            args.version_targets,
+            args.plan_file,
+            args.searched_directories,
+        )
+        return
+    start = time.perf_counter()
+    results = bump_projects(
+        project_directories,
+        args.version,
+        args.dry_run,
+        args.jobs,
+        args.version_targets,
+        args.plan_file,
+        args.monorepo,
+        args.searched_directories,
+    )
+    for result in results:
+        print(
+            f"{result.project.project_directory}: {result.old_version} -> "
+            f"{result.version} ({result.seconds:.2f}s)"
+        )
+    print(f"Bumped {len(results)} projects in {time.perf_counter() - start:.2f}s")
 
 
 if __name__ == "__main__":
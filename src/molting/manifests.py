@@ -0,0 +1,239 @@
+"""Anchored locators of the version in the manifests of several ecosystems.
+
+A locator finds the exact bytes of the version of the project in a manifest,
+so that a new version is written by patching only those bytes. Locators look
+for the table or key the version belongs to with `bytes.find` and only then
+read the few lines of that table, instead of running a regular expression
+over the whole file. Versions of dependencies or tools elsewhere in the file
+are never touched.
+"""
+import re
+from pathlib import Path
+from typing import Callable, Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+from molting.files import Edit
+
+RE_INIT_VERSION = re.compile(
+    rb'__version__ = (["\'])(?P<version>\d+\.\d+(\.\d+)?)(["\'])'
+)
+# Strings and brackets of a JSON document, skipping everything in between
+RE_JSON_TOKEN = re.compile(rb'"(?:[^"\\]|\\.)*"|[{}\[\]]')
+
+
+class VersionSpan(NamedTuple):
+    """The version of a project in a manifest.
+
+    `start` and `end` are byte offsets of the text replaced by the
+    `template` of the format, the version itself without quotes for most of
+    them.
+    """
+
+    version: str
+    start: int
+    end: int
+
+
+class VersionFormat(NamedTuple):
+    """A kind of file holding the version of a project.
+
+    Args:
+        name (str): Name of the format, for messages
+        locate (Callable[[bytes], List[VersionSpan]]): Returns the versions of
+          the project in the contents of a file, usually a single one
+        template (str): Replacement of the spans, formatted with the version
+    """
+
+    name: str
+    locate: Callable[[bytes], List[VersionSpan]]
+    template: str = "{}"
+
+    def edits(self, versions: Sequence[VersionSpan], version_number: str) -> List[Edit]:
+        """Returns the edits setting versions to a new one.
+
+        Args:
+            versions (Sequence[VersionSpan]): Versions found by `locate`
+            version_number (str): New version
+
+        Returns:
+            List[Edit]: Edits of the versions that differ from the new one
+        """
+        replacement = self.template.format(version_number).encode("utf-8")
+        return [
+            (version.start, version.end, replacement)
+            for version in versions
+            if version.version != version_number
+        ]
+
+
+def _line_end(data: bytes, position: int) -> int:
+    end = data.find(b"\n", position)
+    return end if end != -1 else len(data)
+
+
+def _find_line(data: bytes, prefix: bytes, start: int = 0, end: int = -1) -> int:
+    """Returns the offset of the first line starting with `prefix`, or -1."""
+    end = len(data) if end == -1 else end
+    if start == 0 and data.startswith(prefix):
+        return 0
+    position = data.find(b"\n" + prefix, max(start - 1, 0), end)
+    return position + 1 if position != -1 else -1
+
+
+def _read_value(
+    data: bytes, line: int, key: bytes, quoted: bool
+) -> Optional[VersionSpan]:
+    """Read the value of a `key = value` line, if the line assigns `key`."""
+    end = _line_end(data, line)
+    position = line + len(key)
+    while position < end and data[position] in b" \t":
+        position += 1
+    if data[position : position + 1] not in (b"=", b":"):
+        # Another key starting with the same name, like `version_scheme`
+        return None
+    position += 1
+    while position < end and data[position] in b" \t":
+        position += 1
+    if quoted:
+        quote = data[position : position + 1]
+        if quote not in (b'"', b"'"):
+            return None
+        closing = data.find(quote, position + 1, end)
+        if closing == -1:
+            return None
+        start, stop = position + 1, closing
+    else:
+        start, stop = position, len(data[position:end].rstrip()) + position
+    version = data[start:stop].decode("utf-8", "replace")
+    # Dynamic versions, like `attr: package.__version__` in `setup.cfg`
+    if not version or not version[0].isdigit():
+        return None
+    return VersionSpan(version, start, stop)
+
+
+def _table_bounds(data: bytes, header: bytes) -> Optional[Tuple[int, int]]:
+    """Returns the offsets of the body of an INI or TOML table, if it exists.
+
+    The root table of TOML files, before any header, has an empty `header`.
+    """
+    if not header:
+        if data.startswith(b"["):
+            return None
+        start = 0
+    else:
+        line = _find_line(data, header)
+        while line != -1:
+            rest = data[line + len(header) : _line_end(data, line)].strip()
+            if not rest or rest.startswith(b"#") or rest.startswith(b";"):
+                break
+            # Not a header, e.g. a line of a multi-line string
+            line = _find_line(data, header, line + 1)
+        if line == -1:
+            return None
+        start = _line_end(data, line)
+    end = _find_line(data, b"[", start)
+    return start, end if end != -1 else len(data)
+
+
+def _table_versions(
+    data: bytes, headers: Sequence[bytes], quoted: bool = True
+) -> List[VersionSpan]:
+    """Returns the `version` keys set directly in some tables."""
+    versions = []
+    for header in headers:
+        bounds = _table_bounds(data, header)
+        if bounds is None:
+            continue
+        start, end = bounds
+        line = _find_line(data, b"version", start, end)
+        while line != -1:
+            span = _read_value(data, line, b"version", quoted)
+            if span is not None:
+                versions.append(span)
+                break
+            line = _find_line(data, b"version", line + 1, end)
+    return versions
+
+
+def locate_pyproject_version(data: bytes) -> List[VersionSpan]:
+    """Versions of `pyproject.toml`, in `[project]` and `[tool.poetry]`.
+
+    Files without either table may set the version in the root table.
+    """
+    versions = _table_versions(data, (b"[project]", b"[tool.poetry]"))
+    return versions or _table_versions(data, (b"",))
+
+
+def locate_cargo_version(data: bytes) -> List[VersionSpan]:
+    """Version of `Cargo.toml`, in `[package]` or `[workspace.package]`."""
+    return _table_versions(data, (b"[package]", b"[workspace.package]"))
+
+
+def locate_setup_cfg_version(data: bytes) -> List[VersionSpan]:
+    """Version of `setup.cfg`, in `[metadata]`."""
+    return _table_versions(data, (b"[metadata]",), quoted=False)
+
+
+def locate_package_json_version(data: bytes) -> List[VersionSpan]:
+    """Version of `package.json`, the `version` key of the top-level object.
+
+    Only strings and brackets are looked at, up to the version, so the
+    versions of dependencies are skipped whatever the layout of the file.
+    """
+    depth = 0
+    key = None
+    for token in RE_JSON_TOKEN.finditer(data):
+        text = token.group()
+        if key is not None and data[key.end() : token.start()].strip() == b":":
+            if not text.startswith(b'"'):
+                return []
+            start, end = token.start() + 1, token.end() - 1
+            return [VersionSpan(data[start:end].decode("utf-8"), start, end)]
+        key = None
+        if text in (b"{", b"["):
+            depth += 1
+        elif text in (b"}", b"]"):
+            depth -= 1
+        elif depth == 1 and text == b'"version"':
+            # A key if followed by a colon, otherwise a value
+            key = token
+    return []
+
+
+def locate_plain_version(data: bytes) -> List[VersionSpan]:
+    """Version of a `VERSION` file, its only line."""
+    stripped = data.strip()
+    if not stripped or b"\n" in stripped:
+        return []
+    start = data.find(stripped)
+    return [VersionSpan(stripped.decode("utf-8"), start, start + len(stripped))]
+
+
+def locate_init_version(data: bytes) -> List[VersionSpan]:
+    """Versions of Python modules, every `__version__ = "..."` assignment."""
+    return [
+        VersionSpan(match.group("version").decode("ascii"), *match.span())
+        for match in RE_INIT_VERSION.finditer(data)
+    ]
+
+
+PYPROJECT_FORMAT = VersionFormat("pyproject.toml", locate_pyproject_version)
+# Single quotes are replaced too, the way black would
+INIT_FORMAT = VersionFormat("Python module", locate_init_version, '__version__ = "{}"')
+
+# Formats of version targets, by file name. Files named otherwise are Python
+# modules. Add to it to support other manifests.
+VERSION_FORMATS: Dict[str, VersionFormat] = {
+    "Cargo.toml": VersionFormat("Cargo.toml", locate_cargo_version),
+    "package.json": VersionFormat("package.json", locate_package_json_version),
+    "setup.cfg": VersionFormat("setup.cfg", locate_setup_cfg_version),
+    "VERSION": VersionFormat("VERSION", locate_plain_version),
+}
+
+
+def format_for(path: Path) -> VersionFormat:
+    """Returns the format of a version target, from its file name.
+
+    Args:
+        path (Path): Version target
+    """
+    return VERSION_FORMATS.get(Path(path).name, INIT_FORMAT)
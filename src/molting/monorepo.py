@@ -0,0 +1,229 @@
+"""The history of every package of a monorepo, read in a single pass.
+
+Packages of a monorepo are released on their own, from the commits that
+touched their directory. Rather than running `git log -- <path>` once per
+package, each walking the whole history again, the paths changed by every
+commit are streamed once, and each commit is sent to the packages whose
+directory it touched, found in a prefix trie of the package roots. Commits
+are classified as they arrive, once however many packages they touched.
+
+Packages may be released from different commits: a commit belongs to a
+package unless it is an ancestor of the previous release of that package.
+"""
+from contextlib import closing
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Optional, Set, Tuple
+
+from molting.classify import (
+    CHANGE_TYPES,
+    DEFAULT_CLASSIFIER,
+    Classification,
+    CommitClassifier,
+)
+from molting.git import Git
+from molting.history import CommitScan, ScannedCommit
+from molting.log import logger
+
+# Commit records start with the ASCII record separator, and their fields are
+# separated by the unit separator. With `-z`, the record and every path
+# changed by the commit after it end with NUL.
+RECORD_SEPARATOR = b"\x1e"
+FIELD_SEPARATOR = "\x1f"
+CHANGES_FORMAT = "%x1e%H%x1f%P%x1f%B"
+
+
+class _Node:
+    """A directory of the trie, and the package rooted there, if any."""
+
+    __slots__ = ("children", "root")
+
+    def __init__(self) -> None:
+        """Initialize _Node."""
+        self.children: Dict[str, "_Node"] = {}
+        self.root: Optional[str] = None
+
+
+class PackageTrie:
+    """Package roots, looked up by the paths of the files they contain.
+
+    Roots are directories relative to the top of the work tree, with `/`
+    separators, and `""` for a package at the top. A path belongs to the
+    deepest root above it, so nested packages don't share their commits with
+    the package around them.
+
+    Args:
+        roots (Iterable[str]): Package roots
+    """
+
+    def __init__(self, roots: Iterable[str] = ()) -> None:
+        """Initialize PackageTrie."""
+        self._trie = _Node()
+        self._directories: Dict[str, Optional[str]] = {}
+        for root in roots:
+            self.add(root)
+
+    def add(self, root: str) -> None:
+        """Add the root of a package.
+
+        Args:
+            root (str): Directory of the package
+        """
+        root = root.strip("/")
+        node = self._trie
+        for part in root.split("/") if root else ():
+            node = node.children.setdefault(part, _Node())
+        node.root = root
+        self._directories.clear()
+
+    def match(self, path: str) -> Optional[str]:
+        """Returns the root of the package holding a file.
+
+        Args:
+            path (str): File, relative to the top of the work tree
+
+        Returns:
+            Optional[str]: Deepest package root above the file, None if no
+            package holds it
+        """
+        directory = path.rpartition("/")[0]
+        # Commits mostly touch files of the same few directories
+        if directory in self._directories:
+            return self._directories[directory]
+        node: Optional[_Node] = self._trie
+        root = self._trie.root
+        for part in directory.split("/") if directory else ():
+            node = node.children.get(part)
+            if node is None:
+                break
+            if node.root is not None:
+                root = node.root
+        self._directories[directory] = root
+        return root
+
+
+class PackageHistory(NamedTuple):
+    """The commits of a package since its previous release, and their type."""
+
+    root: str
+    scan: CommitScan
+    classification: Classification
+
+
+def iter_changes(
+    git: Git, *revisions: str
+) -> Iterator[Tuple[str, Tuple[str, ...], str, List[str]]]:
+    """Stream commits with the paths they changed, children before parents.
+
+    Merges list no paths, like `git log` shows no diff for them by default.
+    Renames are listed as their old and new paths.
+
+    Args:
+        git (Git): Repository to read
+        *revisions (str): Commits to read, like the arguments of `git log`
+
+    Yields:
+        Tuple[str, Tuple[str, ...], str, List[str]]: Sha, parents, message and
+        changed paths of every commit
+    """
+    records = git.stream(
+        "log",
+        "-z",
+        "--topo-order",
+        "--no-renames",
+        "--name-only",
+        f"--format={CHANGES_FORMAT}",
+        *revisions,
+    )
+    commit = None
+    with closing(records):
+        for record in records:
+            if record.startswith(RECORD_SEPARATOR):
+                if commit is not None:
+                    yield commit
+                sha, parents, message = (
+                    record[1:].decode("utf-8", "replace").split(FIELD_SEPARATOR, 2)
+                )
+                commit = (sha, tuple(parents.split()), message, [])
+            elif record and commit is not None:
+                # The paths are separated from the message by a newline
+                if not commit[3]:
+                    record = record[1:] if record.startswith(b"\n") else record
+                commit[3].append(record.decode("utf-8", "replace"))
+    if commit is not None:
+        yield commit
+
+
+def _exclusions(git: Git, starts: Set[str]) -> List[str]:
+    """Returns commits whose ancestors are before the release of every package."""
+    if len(starts) == 1:
+        return [f"^{start}" for start in starts]
+    result = git.run("merge-base", "--octopus", *sorted(starts))
+    base = result.stdout.strip()
+    return [f"^{base}"] if result.returncode == 0 and base else []
+
+
+def scan_packages(
+    git: Git,
+    starts: Dict[str, Optional[str]],
+    head: str,
+    classifier: Optional[CommitClassifier] = None,
+) -> Dict[str, PackageHistory]:
+    """Read and classify the commits of every package in one pass.
+
+    Args:
+        git (Git): Repository to read
+        starts (Dict[str, Optional[str]]): Sha of the previous release of
+          every package root, None for packages never released, which get
+          every commit that touched them
+        head (str): Sha of the last commit to include, usually `HEAD`
+        classifier (CommitClassifier, optional): Rules the commits are
+          classified with, defaults to keywords and conventional commits
+
+    Returns:
+        Dict[str, PackageHistory]: History of every package root
+    """
+    classifier = classifier or DEFAULT_CLASSIFIER
+    trie = PackageTrie(starts)
+    released = {start for start in starts.values() if start is not None}
+    # Ancestors of every release found so far. In topological order, commits
+    # come after their children, so ancestors are known by the time they come
+    before: Dict[str, Set[str]] = {start: {start} for start in released}
+    commits: Dict[str, List[ScannedCommit]] = {root: [] for root in starts}
+    decisive: Dict[str, Optional[ScannedCommit]] = {root: None for root in starts}
+    exclusions = _exclusions(git, released) if len(released) == len(starts) else []
+    count = 0
+    for sha, parents, message, paths in iter_changes(git, head, *exclusions):
+        count += 1
+        for ancestors in before.values():
+            if sha in ancestors:
+                ancestors.update(parents)
+        roots = {root for root in map(trie.match, paths) if root is not None}
+        if not roots:
+            continue
+        change_type = classifier.classify_message(message)
+        scanned = ScannedCommit(
+            sha, [line for line in message.splitlines() if line.strip()], change_type
+        )
+        for root in roots:
+            start = starts[root]
+            if start is not None and sha in before[start]:
+                continue
+            commits[root].append(scanned)
+            current = decisive[root]
+            if change_type is not None and (
+                current is None
+                or CHANGE_TYPES.index(change_type)
+                > CHANGE_TYPES.index(current.change_type)
+            ):
+                decisive[root] = scanned
+    logger.debug("Scanned {} commits for {} packages", count, len(starts))
+    histories = {}
+    for root, start in starts.items():
+        commit = decisive[root]
+        classification = (
+            classifier.classify(commit.lines)
+            if commit is not None
+            else Classification(classifier.default, None)
+        )
+        scan = CommitScan(start or "", head, commits[root])
+        histories[root] = PackageHistory(root, scan, classification)
+    return histories
@@ -0,0 +1,741 @@
+"""Reading refs and commits of a git repository in-process, without git.
+
+Resolving a release tag and reading the commits since it otherwise takes
+several git processes. The reader here covers what that needs, in pure
+Python:
+
+- refs, loose or from `packed-refs`, whose parsed contents are cached for as
+  long as the file doesn't change, and symbolic refs like `HEAD`;
+- loose objects, and objects of pack files, found through the `.idx` of the
+  packs and rebuilt from their delta chains;
+- `objects/info/alternates`, and the `shallow` file of shallow clones.
+
+Commits are walked in the order of `git log`, newest first, using the same
+rules as git to decide which commits are part of a range.
+
+Anything else, e.g. SHA-256 repositories, linked worktrees or revision
+expressions like `HEAD~2`, raises `UnsupportedRepository`, and callers fall
+back to git.
+"""
+import heapq
+import os
+import re
+import zlib
+from collections import OrderedDict, deque
+from pathlib import Path
+from threading import Lock
+from typing import Deque, Dict, Iterator, List, NamedTuple, Optional, Set, Tuple
+
+from molting.git import find_git_directory
+
+OBJECT_TYPES = {1: "commit", 2: "tree", 3: "blob", 4: "tag"}
+OFS_DELTA = 6
+REF_DELTA = 7
+DELTA_CACHE_SIZE = 256
+SCAN_NAMES = 64
+# Sides of a commit while walking a range, see `GitReader._walk`
+LEFT = 1
+RIGHT = 2
+STALE = 4
+
+RE_SHA = re.compile(r"^[0-9a-f]{40}$")
+# Revision expressions only git understands, and abbreviated object names
+RE_EXPRESSION = re.compile(r"[~^:@{}\\\s]|^[0-9a-f]{4,39}$")
+RE_PARENT = re.compile(rb"^parent ([0-9a-f]{40})$", re.MULTILINE)
+
+
+class UnsupportedRepository(Exception):
+    """The repository, or the request, is beyond what the reader handles."""
+
+
+class RawCommit(NamedTuple):
+    """The fields of a commit needed to walk the history."""
+
+    sha: str
+    parents: Tuple[str, ...]
+    time: int
+    message: str
+
+
+def parse_commit(sha: str, data: bytes) -> RawCommit:
+    """Parse the raw contents of a commit object.
+
+    Args:
+        sha (str): Name of the commit
+        data (bytes): Contents of the object
+
+    Returns:
+        RawCommit: The commit
+    """
+    end = data.find(b"\n\n")
+    if end == -1:
+        end = len(data)
+    headers = data[:end]
+    parents = tuple(parent.decode("ascii") for parent in RE_PARENT.findall(headers))
+    # Continuation lines of multi-line headers, e.g. signatures, start with a
+    # space, so they never match
+    start = headers.rfind(b"\ncommitter ")
+    line_end = headers.find(b"\n", start + 1)
+    committer = headers[start : line_end if line_end != -1 else end]
+    time = int(committer.rsplit(b" ", 2)[1]) if start != -1 else 0
+    return RawCommit(sha, parents, time, data[end + 2 :].decode("utf-8", "replace"))
+
+
+def apply_delta(base: bytes, delta: bytes) -> bytes:
+    """Rebuild an object from the object its delta is based on.
+
+    Args:
+        base (bytes): Contents of the base object
+        delta (bytes): Instructions copying ranges of the base, or inserting
+          new data
+
+    Returns:
+        bytes: Contents of the object
+    """
+    position = 0
+    # Sizes of the base and of the result
+    for _ in range(2):
+        while delta[position] & 0x80:
+            position += 1
+        position += 1
+    result = bytearray()
+    length = len(delta)
+    while position < length:
+        opcode = delta[position]
+        position += 1
+        if opcode & 0x80:
+            offset = size = 0
+            for bit in range(4):
+                if opcode & (1 << bit):
+                    offset |= delta[position] << (8 * bit)
+                    position += 1
+            for bit in range(3):
+                if opcode & (0x10 << bit):
+                    size |= delta[position] << (8 * bit)
+                    position += 1
+            result += base[offset : offset + (size or 0x10000)]
+        elif opcode:
+            result += delta[position : position + opcode]
+            position += opcode
+        else:
+            raise UnsupportedRepository("Invalid delta instruction")
+    return bytes(result)
+
+
+class PackIndex:
+    """The sorted object names of a pack, and their offsets in it.
+
+    Only the version 2 format of `.idx` files, the default since git 1.5.2,
+    is supported.
+
+    Args:
+        path (Path): `.idx` file
+    """
+
+    def __init__(self, path: Path) -> None:
+        """Initialize PackIndex."""
+        import struct
+
+        data = path.read_bytes()
+        if data[:4] != b"\xfftOc" or data[4:8] != b"\0\0\0\2":
+            raise UnsupportedRepository(f"Unsupported pack index {path}")
+        self.data = data
+        self.fanout = struct.unpack(">256I", data[8:1032])
+        count = self.fanout[255]
+        self.count = count
+        self._names = 1032
+        self._offsets = self._names + 24 * count
+        self._large_offsets = self._offsets + 4 * count
+
+    def find(self, sha: bytes) -> Optional[int]:
+        """Returns the offset of an object in the pack, or None if it isn't in it.
+
+        Args:
+            sha (bytes): Binary name of the object
+        """
+        data = self.data
+        names = self._names
+        first = sha[0]
+        low = self.fanout[first - 1] if first else 0
+        high = self.fanout[first]
+        while high - low > SCAN_NAMES:
+            middle = (low + high) // 2
+            start = names + 20 * middle
+            name = data[start : start + 20]
+            if name < sha:
+                low = middle + 1
+            elif name > sha:
+                high = middle
+            else:
+                return self._offset(middle)
+        # Scanning the last few names in C beats bisecting them in Python, as
+        # long as matches across two names are skipped
+        end = names + 20 * high
+        position = data.find(sha, names + 20 * low, end)
+        while position != -1 and (position - names) % 20:
+            position = data.find(sha, position + 1, end)
+        return self._offset((position - names) // 20) if position != -1 else None
+
+    def _offset(self, position: int) -> int:
+        data = self.data
+        start = self._offsets + 4 * position
+        offset = int.from_bytes(data[start : start + 4], "big")
+        if offset & 0x80000000:
+            start = self._large_offsets + 8 * (offset & 0x7FFFFFFF)
+            offset = int.from_bytes(data[start : start + 8], "big")
+        return offset
+
+
+class Pack:
+    """A pack file, read through a memory map.
+
+    Args:
+        index_path (Path): `.idx` file of the pack
+        store (ObjectStore): Store resolving the bases of `REF_DELTA` objects,
+          which may be in another pack
+    """
+
+    def __init__(self, index_path: Path, store: "ObjectStore") -> None:
+        """Initialize Pack."""
+        import mmap
+
+        self.index = PackIndex(index_path)
+        self.store = store
+        with index_path.with_suffix(".pack").open("rb") as pack:
+            self.data = mmap.mmap(pack.fileno(), 0, access=mmap.ACCESS_READ)
+        self._bases: "OrderedDict[int, Tuple[str, bytes]]" = OrderedDict()
+        self._lock = Lock()
+
+    def _inflate(self, position: int, size: int) -> bytes:
+        decompressor = zlib.decompressobj()
+        # Compressed data is rarely much larger than the data itself
+        chunk = max(size + 64, 512)
+        result = decompressor.decompress(self.data[position : position + chunk])
+        while not decompressor.eof:
+            position += chunk
+            more = self.data[position : position + chunk]
+            if not more:
+                raise UnsupportedRepository("Truncated pack")
+            result += decompressor.decompress(more)
+        return result
+
+    def _entry(self, offset: int) -> Tuple[int, object, bytes]:
+        """Returns the type of an entry, its base for deltas, and its data."""
+        data = self.data
+        position = offset
+        byte = data[position]
+        position += 1
+        kind = (byte >> 4) & 7
+        size = byte & 0x0F
+        shift = 4
+        while byte & 0x80:
+            byte = data[position]
+            position += 1
+            size |= (byte & 0x7F) << shift
+            shift += 7
+        base: object = None
+        if kind == OFS_DELTA:
+            byte = data[position]
+            position += 1
+            distance = byte & 0x7F
+            while byte & 0x80:
+                byte = data[position]
+                position += 1
+                distance = ((distance + 1) << 7) | (byte & 0x7F)
+            base = offset - distance
+        elif kind == REF_DELTA:
+            base = data[position : position + 20].hex()
+            position += 20
+        return kind, base, self._inflate(position, size)
+
+    def read(self, offset: int) -> Tuple[str, bytes]:
+        """Returns the type and contents of the object at an offset.
+
+        Args:
+            offset (int): Offset of the object in the pack
+        """
+        # Reads of the cache don't need the lock, only its updates
+        cached = self._bases.get(offset)
+        if cached is not None:
+            return cached
+        deltas = []
+        kind, base, data = self._entry(offset)
+        while kind in (OFS_DELTA, REF_DELTA):
+            deltas.append(data)
+            if kind == REF_DELTA:
+                object_type, data = self.store.read(base)
+                break
+            cached = self._bases.get(base)
+            if cached is not None:
+                object_type, data = cached
+                break
+            kind, base, data = self._entry(base)
+        else:
+            object_type = OBJECT_TYPES[kind]
+        for delta in reversed(deltas):
+            data = apply_delta(data, delta)
+        if deltas:
+            # The bases of deltas tend to be the bases of other deltas too
+            with self._lock:
+                self._bases[offset] = (object_type, data)
+                while len(self._bases) > DELTA_CACHE_SIZE:
+                    self._bases.popitem(last=False)
+        return object_type, data
+
+    def close(self) -> None:
+        """Unmap the pack."""
+        self.data.close()
+
+
+class ObjectStore:
+    """The loose and packed objects of a repository, and of its alternates.
+
+    Args:
+        directory (Path): `objects` directory
+    """
+
+    def __init__(self, directory: Path) -> None:
+        """Initialize ObjectStore."""
+        self.directory = directory
+        self._loose = str(directory)
+        self._packs: Dict[Path, Pack] = {}
+        self._alternates: Optional[List[ObjectStore]] = None
+        self._lock = Lock()
+
+    def _refresh_packs(self) -> bool:
+        """Open the packs added since the last lookup, e.g. by a fetch or gc."""
+        with self._lock:
+            added = False
+            for path in sorted((self.directory / "pack").glob("pack-*.idx")):
+                if path not in self._packs and path.with_suffix(".pack").exists():
+                    self._packs[path] = Pack(path, self)
+                    added = True
+            return added
+
+    @property
+    def alternates(self) -> List["ObjectStore"]:
+        """Stores of the repositories this one borrows objects from."""
+        if self._alternates is None:
+            stores = []
+            try:
+                lines = (self.directory / "info" / "alternates").read_text()
+            except FileNotFoundError:
+                lines = ""
+            for line in lines.splitlines():
+                if line.strip() and not line.startswith("#"):
+                    stores.append(ObjectStore(self.directory / line.strip()))
+            self._alternates = stores
+        return self._alternates
+
+    def _read_here(self, sha: str, binary: bytes) -> Optional[Tuple[str, bytes]]:
+        # Like git, packs first: they hold most objects of any large repository
+        for pack in list(self._packs.values()):
+            offset = pack.index.find(binary)
+            if offset is not None:
+                return pack.read(offset)
+        try:
+            with open(os.path.join(self._loose, sha[:2], sha[2:]), "rb") as loose:
+                compressed = loose.read()
+        except FileNotFoundError:
+            return None
+        header, _, data = zlib.decompress(compressed).partition(b"\0")
+        return header.split(b" ")[0].decode("ascii"), data
+
+    def read(self, sha: str) -> Tuple[str, bytes]:
+        """Returns the type and contents of an object.
+
+        Args:
+            sha (str): Name of the object
+
+        Raises:
+            KeyError: The object doesn't exist.
+        """
+        binary = bytes.fromhex(sha)
+        found = self._read_here(sha, binary)
+        if found is None and self._refresh_packs():
+            found = self._read_here(sha, binary)
+        for alternate in self.alternates:
+            if found is not None:
+                break
+            try:
+                found = alternate.read(sha)
+            except KeyError:
+                pass
+        if found is None:
+            raise KeyError(sha)
+        return found
+
+    def close(self) -> None:
+        """Unmap the packs."""
+        with self._lock:
+            packs = list(self._packs.values())
+            self._packs.clear()
+        for pack in packs:
+            pack.close()
+        for alternate in self._alternates or ():
+            alternate.close()
+
+
+class RefIndex:
+    """The refs of a repository, loose or packed.
+
+    Packed refs are parsed once, and again only when `packed-refs` changes.
+    Loose refs, which take precedence, are read on every lookup.
+
+    Args:
+        git_directory (Path): `.git` directory
+    """
+
+    def __init__(self, git_directory: Path) -> None:
+        """Initialize RefIndex."""
+        self.git_directory = git_directory
+        self._packed: Optional[Tuple[object, Dict[str, str], Dict[str, str]]] = None
+        self._lock = Lock()
+
+    def packed(self) -> Tuple[Dict[str, str], Dict[str, str]]:
+        """Returns the packed refs, and the commits their annotated tags peel to."""
+        path = self.git_directory / "packed-refs"
+        try:
+            stat_result = path.stat()
+            stat = (stat_result.st_mtime_ns, stat_result.st_size)
+        except FileNotFoundError:
+            stat = None
+        with self._lock:
+            if self._packed is None or self._packed[0] != stat:
+                refs: Dict[str, str] = {}
+                peeled: Dict[str, str] = {}
+                last = None
+                lines = path.read_text().splitlines() if stat is not None else []
+                for line in lines:
+                    if line.startswith("#") or not line:
+                        continue
+                    if line.startswith("^"):
+                        if last is not None:
+                            peeled[last] = line[1:]
+                        continue
+                    sha, _, last = line.partition(" ")
+                    refs[last] = sha
+                self._packed = (stat, refs, peeled)
+            return self._packed[1], self._packed[2]
+
+    def read(self, name: str) -> Optional[str]:
+        """Returns the sha a ref points to, following symbolic refs.
+
+        Args:
+            name (str): Full name of the ref, e.g. `HEAD` or `refs/tags/v1.0.0`
+        """
+        for _ in range(5):
+            try:
+                value = (self.git_directory / name).read_text().strip()
+            except (FileNotFoundError, IsADirectoryError, NotADirectoryError):
+                return self.packed()[0].get(name)
+            if not value.startswith("ref: "):
+                return value
+            name = value[5:]
+        raise UnsupportedRepository(f"Too many levels of symbolic refs in {name}")
+
+
+def _release(
+    pending: Deque[RawCommit], flags: Dict[str, int], time: float
+) -> Iterator[RawCommit]:
+    """Yields the found commits newer than a time, unless they are left out."""
+    while pending and pending[0].time > time:
+        commit = pending.popleft()
+        if flags[commit.sha] in (LEFT, RIGHT):
+            yield commit
+
+
+class GitReader:
+    """A git repository, read in-process.
+
+    Args:
+        git_directory (Path): `.git` directory of the main work tree
+    """
+
+    def __init__(self, git_directory: Path) -> None:
+        """Initialize GitReader."""
+        self.git_directory = git_directory
+        self.refs = RefIndex(git_directory)
+        self.objects = ObjectStore(git_directory / "objects")
+        self._commits: Dict[str, RawCommit] = {}
+        self._shallow: Optional[Tuple[object, Set[str]]] = None
+
+    @classmethod
+    def open(cls, directory: Optional[Path] = None) -> "GitReader":
+        """Open the repository of a work tree.
+
+        Args:
+            directory (Path, optional): Directory in the work tree, defaults
+              to the current working directory
+
+        Raises:
+            UnsupportedRepository: The repository can't be read in-process.
+
+        Returns:
+            GitReader: The repository
+        """
+        git_directory = find_git_directory(
+            Path(directory) if directory is not None else Path.cwd()
+        )
+        if git_directory is None:
+            raise UnsupportedRepository("Not the main work tree of a repository")
+        try:
+            config = (git_directory / "config").read_text().lower()
+        except FileNotFoundError:
+            config = ""
+        if "objectformat" in config or "refstorage" in config:
+            raise UnsupportedRepository("Unsupported repository format")
+        return cls(git_directory)
+
+    def resolve(self, name: str) -> Optional[str]:
+        """Returns the sha of a ref or object name, None if it doesn't exist.
+
+        Names are looked up like git does, e.g. `v1.0.0` is found as
+        `refs/tags/v1.0.0`. A `^{commit}` suffix peels tags to their commit.
+
+        Args:
+            name (str): Full sha, ref or short ref name
+
+        Raises:
+            UnsupportedRepository: The name is an expression only git
+              understands.
+        """
+        peel = name.endswith("^{commit}")
+        if peel:
+            name = name[: -len("^{commit}")]
+        if RE_EXPRESSION.search(name):
+            raise UnsupportedRepository(f"Can't resolve {name!r} in-process")
+        sha = name if RE_SHA.match(name) else self._read_ref(name)
+        if sha is None:
+            return None
+        try:
+            object_type, data = self.objects.read(sha)
+        except KeyError:
+            return None
+        while peel and object_type == "tag":
+            sha = data[7:47].decode("ascii")
+            object_type, data = self.objects.read(sha)
+        if peel and object_type != "commit":
+            return None
+        return sha
+
+    def _read_ref(self, name: str) -> Optional[str]:
+        """Returns the sha of a short ref name, in git's order of precedence."""
+        for candidate in (
+            name,
+            f"refs/{name}",
+            f"refs/tags/{name}",
+            f"refs/heads/{name}",
+            f"refs/remotes/{name}",
+            f"refs/remotes/{name}/HEAD",
+        ):
+            if "/" in candidate or candidate.isupper():
+                sha = self.refs.read(candidate)
+                if sha is not None:
+                    return sha
+        return None
+
+    @property
+    def shallow(self) -> Set[str]:
+        """Commits whose parents are missing from a shallow clone.
+
+        Read again when the `shallow` file changed, e.g. after a fetch
+        deepened the history, forgetting the parents cached for its commits.
+        """
+        path = self.git_directory / "shallow"
+        try:
+            stat_result = path.stat()
+            stat: object = (stat_result.st_mtime_ns, stat_result.st_size)
+        except FileNotFoundError:
+            stat = None
+        if self._shallow is None or self._shallow[0] != stat:
+            for sha in self._shallow[1] if self._shallow is not None else ():
+                self._commits.pop(sha, None)
+            shas = set(path.read_text().split()) if stat is not None else set()
+            self._shallow = (stat, shas)
+        return self._shallow[1]
+
+    def read_commit(self, sha: str) -> RawCommit:
+        """Returns a commit, parsed once and then cached.
+
+        Args:
+            sha (str): Name of the commit
+
+        Raises:
+            UnsupportedRepository: The commit is missing, or isn't a commit.
+        """
+        commit = self._commits.get(sha)
+        if commit is None:
+            try:
+                object_type, data = self.objects.read(sha)
+            except KeyError:
+                raise UnsupportedRepository(f"Missing object {sha}") from None
+            if object_type != "commit":
+                raise UnsupportedRepository(f"{sha} is a {object_type}")
+            commit = parse_commit(sha, data)
+            # Checked once per walk, rather than for every commit
+            if self._shallow is not None and sha in self._shallow[1]:
+                commit = commit._replace(parents=())
+            self._commits[sha] = commit
+        return commit
+
+    def merge_bases(self, one: str, two: str) -> List[str]:
+        """Returns the best common ancestors of two commits.
+
+        Ancestors of other common ancestors may be included, which doesn't
+        change the range they delimit.
+
+        Args:
+            one (str): Sha of a commit
+            two (str): Sha of another commit
+        """
+        flags: Dict[str, int] = {one: LEFT}
+        flags[two] = flags.get(two, 0) | RIGHT
+        queue: List[Tuple[int, int, str]] = []
+        counter = 0
+        for sha in dict.fromkeys((one, two)):
+            heapq.heappush(queue, (-self.read_commit(sha).time, counter, sha))
+            counter += 1
+        bases: List[str] = []
+        while any(not flags[sha] & STALE for _, _, sha in queue):
+            _, _, sha = heapq.heappop(queue)
+            commit_flags = flags[sha] & (LEFT | RIGHT | STALE)
+            if commit_flags == LEFT | RIGHT:
+                if sha not in bases:
+                    bases.append(sha)
+                commit_flags |= STALE
+            for parent in self.read_commit(sha).parents:
+                if flags.get(parent, 0) & commit_flags == commit_flags:
+                    continue
+                flags[parent] = flags.get(parent, 0) | commit_flags
+                heapq.heappush(queue, (-self.read_commit(parent).time, counter, parent))
+                counter += 1
+        return bases
+
+    def _walk(self, starts: Dict[str, int]) -> Iterator[RawCommit]:
+        """Yields the commits reachable from exactly one side, newest first.
+
+        Flags of the start commits say which side they are on, `LEFT` or
+        `RIGHT`, or `STALE` for commits whose history is left out. Commits
+        reached from both sides become stale too, like their ancestors.
+
+        A commit is only yielded once no commit left to read is newer, so
+        its flags can't change anymore, as long as commits are never older
+        than their parents.
+        """
+        flags = dict(starts)
+        queue: List[Tuple[int, int, str]] = []
+        counter = 0
+        for sha in starts:
+            heapq.heappush(queue, (-self.read_commit(sha).time, counter, sha))
+            counter += 1
+        pending: Deque[RawCommit] = deque()
+        found: Set[str] = set()
+        while queue and (
+            any(not flags[sha] & STALE for _, _, sha in queue)
+            or (pending and -queue[0][0] >= pending[-1].time)
+        ):
+            _, _, sha = heapq.heappop(queue)
+            commit = self.read_commit(sha)
+            yield from _release(pending, flags, commit.time)
+            commit_flags = flags[sha]
+            if commit_flags & (LEFT | RIGHT) == LEFT | RIGHT:
+                commit_flags |= STALE
+                flags[sha] = commit_flags
+            elif not commit_flags & STALE and sha not in found:
+                found.add(sha)
+                pending.append(commit)
+            for parent in commit.parents:
+                if flags.get(parent, 0) & commit_flags == commit_flags:
+                    continue
+                flags[parent] = flags.get(parent, 0) | commit_flags
+                heapq.heappush(queue, (-self.read_commit(parent).time, counter, parent))
+                counter += 1
+        yield from _release(pending, flags, float("-inf"))
+
+    def walk(self, include: List[str], exclude: List[str]) -> Iterator[RawCommit]:
+        """Yields the commits reachable from some commits but not from others.
+
+        Commits are in the order of `git log`: newest first, by commit date.
+        They are yielded as they are found, so a caller that stops early
+        doesn't read the rest of the history.
+
+        Args:
+            include (List[str]): Shas of the commits to start from
+            exclude (List[str]): Shas of the commits whose history is left out
+        """
+        starts = dict.fromkeys(include, LEFT)
+        for sha in exclude:
+            starts[sha] = starts.get(sha, 0) | STALE
+        return self._walk(starts)
+
+    def read_range(self, start: str, end: str = "HEAD") -> Iterator[RawCommit]:
+        """Read the commits of `start...end`, like `git log start...end`.
+
+        Both ends are resolved right away, and the commits are then yielded
+        as they are found, without waiting for the common ancestors of the
+        ends.
+
+        Args:
+            start (str): Ref or sha of one end of the range, usually a release
+            end (str): Ref or sha of the other end
+
+        Raises:
+            UnsupportedRepository: An end of the range doesn't exist, or the
+              repository can't be read in-process. Objects that can't be read
+              while walking raise it during the iteration.
+
+        Returns:
+            Iterator[RawCommit]: Commits reachable from either end but not
+            both, newest first
+        """
+        one, two = self._resolve_commits(start, end)
+        starts = {one: LEFT}
+        starts[two] = starts.get(two, 0) | RIGHT
+        return self._walk(starts)
+
+    def is_ancestor(self, ancestor: str, descendant: str) -> bool:
+        """Whether a commit is reachable from another one, like `Git.is_ancestor`.
+
+        Args:
+            ancestor (str): Ref or sha of the commit that may be reachable
+            descendant (str): Ref or sha of the commit to start from
+
+        Raises:
+            UnsupportedRepository: A commit doesn't exist, or the repository
+              can't be read in-process.
+        """
+        shas = self._resolve_commits(ancestor, descendant)
+        return shas[0] in self.merge_bases(*shas)
+
+    def _resolve_commits(self, *names: str) -> List[str]:
+        """Returns the commits of refs or shas, before walking from them."""
+        self.shallow
+        shas = []
+        for name in names:
+            sha = self.resolve(f"{name}^{{commit}}")
+            if sha is None:
+                raise UnsupportedRepository(f"Unknown revision {name!r}")
+            shas.append(sha)
+        return shas
+
+    def root_commit(self, end: str = "HEAD") -> Optional[str]:
+        """Returns the newest commit without parents reachable from a commit.
+
+        Like the first line of `git rev-list --max-parents=0`.
+
+        Args:
+            end (str): Ref or sha to start from
+        """
+        self.shallow
+        sha = self.resolve(f"{end}^{{commit}}")
+        if sha is None:
+            return None
+        for commit in self.walk([sha], []):
+            if not commit.parents:
+                return commit.sha
+        return None
+
+    def close(self) -> None:
+        """Unmap the packs."""
+        self.objects.close()
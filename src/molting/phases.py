@@ -0,0 +1,85 @@
+"""Phases of a bump, run as a dependency graph on a thread pool.
+
+Reading the git history, scanning the changelog and finding the version files
+don't depend on each other, so they overlap instead of waiting for each other:
+git runs in its own process, and file reads release the GIL. Each phase waits
+only for the phases it requires, like the steps of the publishing stage.
+"""
+from typing import Any, Callable, Dict, NamedTuple, Optional, Sequence, Tuple
+
+from molting import trace
+from molting.log import logger
+
+
+class Phase(NamedTuple):
+    """A unit of work of a bump, and the phases whose results it needs.
+
+    The function is called with the values returned by the required phases,
+    by name.
+    """
+
+    name: str
+    function: Callable[[Dict[str, Any]], Any]
+    requires: Tuple[str, ...] = ()
+
+
+def _run_phase(
+    phase: Phase, result: Callable[[str], Any], details: Dict[str, Any]
+) -> Any:
+    # Re-raises the error of a failed requirement
+    inputs = {name: result(name) for name in phase.requires}
+    logger.debug("Running phase {!r}", phase.name)
+    with trace.span(phase.name, **details):
+        return phase.function(inputs)
+
+
+def run_phases(
+    phases: Sequence[Phase], max_workers: Optional[int] = None, **details: Any
+) -> Dict[str, Any]:
+    """Run phases concurrently, each as soon as the phases it requires are done.
+
+    Phases must be listed after the phases they require, so that a phase is
+    never started before its requirements, whatever the number of workers.
+    With a single worker the phases run one after the other, in order, in the
+    calling thread.
+
+    Args:
+        phases (Sequence[Phase]): Phases to run
+        max_workers (int, optional): Maximum number of phases run at once
+        **details (Any): Details added to the trace span of every phase
+
+    Raises:
+        ValueError: A phase requires a phase that isn't listed before it.
+        Exception: The first phase to fail raised it. Phases that haven't
+          started yet are cancelled.
+
+    Returns:
+        Dict[str, Any]: Value returned by each phase, by name
+    """
+    from concurrent.futures import ThreadPoolExecutor
+
+    seen = set()
+    for phase in phases:
+        missing = set(phase.requires) - seen
+        if missing:
+            raise ValueError(f"Phase {phase.name!r} requires unknown phases {missing}")
+        seen.add(phase.name)
+    if max_workers == 1:
+        results: Dict[str, Any] = {}
+        for phase in phases:
+            results[phase.name] = _run_phase(phase, results.__getitem__, details)
+        return results
+    futures: Dict[str, Any] = {}
+    with ThreadPoolExecutor(
+        max_workers=max_workers, thread_name_prefix="molting-phase"
+    ) as executor:
+        for phase in phases:
+            futures[phase.name] = executor.submit(
+                _run_phase, phase, lambda name: futures[name].result(), details
+            )
+        try:
+            return {name: future.result() for name, future in futures.items()}
+        except BaseException:
+            for future in futures.values():
+                future.cancel()
+            raise
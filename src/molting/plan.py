@@ -0,0 +1,212 @@
+"""Bump plans: the decisions of a bump, saved to be applied later.
+
+A plan holds everything the analysis of a bump decided: the versions, the
+release notes, the edits to every file and the git and GitHub commands that
+release them. It can be saved as JSON by one job, e.g. a dry-run preview, and
+applied by another without reading the git history again.
+
+Every planned file records the SHA-256 of the contents its edits were made
+against. Applying a plan to files that changed since refuses to write
+anything.
+"""
+import os
+from pathlib import Path
+from typing import Any, Dict, List, NamedTuple, Optional
+
+from molting.files import Edit, WritePlan, file_sha256
+from molting.publish import Step
+
+PLAN_FORMAT = 1
+
+
+class PlannedFile(NamedTuple):
+    """Edits to a file, and the hash of the contents they apply to."""
+
+    path: str
+    sha256: str
+    edits: List[Edit]
+
+
+def _step_to_dict(step: Step) -> Dict[str, Any]:
+    return {
+        "name": step.name,
+        "command": step.command,
+        "requires": list(step.requires),
+        "timeout": step.timeout,
+        "input": step.input,
+    }
+
+
+def _step_from_dict(data: Dict[str, Any]) -> Step:
+    return Step(
+        data["name"],
+        data["command"],
+        tuple(data["requires"]),
+        data["timeout"],
+        data.get("input"),
+    )
+
+
+class BumpPlan(NamedTuple):
+    """A bump of a project, decided but not carried out.
+
+    File paths are relative to the project directory, so that the plan can be
+    applied to another checkout of the same commit.
+    """
+
+    project_directory: Path
+    old_version: str
+    version: str
+    tag: str
+    notes: str
+    files: List[PlannedFile]
+    commit_steps: List[Step]
+    push_steps: List[Step]
+
+    @classmethod
+    def from_write_plan(
+        cls,
+        project_directory: Path,
+        write_plan: WritePlan,
+        **fields: Any,
+    ) -> "BumpPlan":
+        """Build a plan from the changes staged by a bump.
+
+        Args:
+            project_directory (Path): Directory of the project
+            write_plan (WritePlan): Staged file changes, not yet written
+            **fields (Any): The other fields of the plan
+
+        Returns:
+            BumpPlan: The plan
+        """
+        root = Path(project_directory).resolve()
+        files = [
+            PlannedFile(
+                Path(os.path.relpath(path.resolve(), root)).as_posix(),
+                file_sha256(path),
+                write_plan.edits(path),
+            )
+            for path in sorted(write_plan.paths)
+        ]
+        return cls(Path(project_directory), files=files, **fields)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Describe the plan, e.g. to save it as JSON.
+
+        Returns:
+            Dict[str, Any]: The plan, with the replacement text of every edit
+            decoded as UTF-8
+        """
+        return {
+            "format": PLAN_FORMAT,
+            "project_directory": str(self.project_directory),
+            "old_version": self.old_version,
+            "version": self.version,
+            "tag": self.tag,
+            "notes": self.notes,
+            "files": [
+                {
+                    "path": planned.path,
+                    "sha256": planned.sha256,
+                    "edits": [
+                        {"start": start, "end": end, "text": text.decode("utf-8")}
+                        for start, end, text in planned.edits
+                    ],
+                }
+                for planned in self.files
+            ],
+            "git": {
+                "commit": [_step_to_dict(step) for step in self.commit_steps],
+                "push": [_step_to_dict(step) for step in self.push_steps],
+            },
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "BumpPlan":
+        """Rebuild a plan described by `to_dict`.
+
+        Args:
+            data (Dict[str, Any]): Description of the plan
+
+        Raises:
+            ValueError: The description isn't a plan this version understands.
+
+        Returns:
+            BumpPlan: The plan
+        """
+        if data.get("format") != PLAN_FORMAT:
+            raise ValueError(f"Unsupported plan format {data.get('format')!r}")
+        files = [
+            PlannedFile(
+                planned["path"],
+                planned["sha256"],
+                [
+                    (edit["start"], edit["end"], edit["text"].encode("utf-8"))
+                    for edit in planned["edits"]
+                ],
+            )
+            for planned in data["files"]
+        ]
+        return cls(
+            Path(data["project_directory"]),
+            data["old_version"],
+            data["version"],
+            data["tag"],
+            data["notes"],
+            files,
+            [_step_from_dict(step) for step in data["git"]["commit"]],
+            [_step_from_dict(step) for step in data["git"]["push"]],
+        )
+
+    def save(self, path: Path) -> None:
+        """Save the plan as JSON.
+
+        Args:
+            path (Path): File to write
+        """
+        import json
+
+        Path(path).write_text(f"{json.dumps(self.to_dict(), indent=2)}\n")
+
+    @classmethod
+    def load(cls, path: Path) -> "BumpPlan":
+        """Load a plan saved with `save`.
+
+        Args:
+            path (Path): Saved plan
+
+        Returns:
+            BumpPlan: The plan
+        """
+        import json
+
+        return cls.from_dict(json.loads(Path(path).read_text()))
+
+    def stage(self, project_directory: Optional[Path] = None) -> WritePlan:
+        """Stage the file edits of the plan, checking the files are unchanged.
+
+        Args:
+            project_directory (Path, optional): Checkout to apply the plan
+              to, defaults to the directory the plan was made in
+
+        Raises:
+            ValueError: A file changed since the plan was made.
+
+        Returns:
+            WritePlan: The staged edits, ready to be applied
+        """
+        directory = Path(
+            project_directory
+            if project_directory is not None
+            else self.project_directory
+        )
+        write_plan = WritePlan()
+        for planned in self.files:
+            path = directory / planned.path
+            # Staged first, so that changes made after hashing are caught by
+            # the modification time check of `WritePlan.apply`
+            write_plan.stage_ordered(path, planned.edits)
+            if file_sha256(path) != planned.sha256:
+                raise ValueError(f"{path} changed since the plan was made")
+        return write_plan
@@ -0,0 +1,191 @@
+"""Unified diffs of the changes staged in a write plan.
+
+Diffs are built from the staged byte range edits, so only the lines around
+each edit are decoded and compared, however large the file is. The lines of
+the diff are generated one hunk at a time.
+"""
+import os
+from difflib import SequenceMatcher
+from pathlib import Path
+from typing import BinaryIO, Iterator, List, Optional, Sequence, Tuple
+
+from molting.files import Edit, WritePlan
+
+CONTEXT_LINES = 3
+CHUNK_SIZE = 8192
+
+
+def _find_newline_before(handle: BinaryIO, offset: int, count: int) -> int:
+    """Returns the start of the line `count - 1` lines above the one at `offset`."""
+    position = offset
+    while position > 0:
+        read_size = min(CHUNK_SIZE, position)
+        position -= read_size
+        handle.seek(position)
+        chunk = handle.read(read_size)
+        index = len(chunk)
+        while True:
+            index = chunk.rfind(b"\n", 0, index)
+            if index < 0:
+                break
+            count -= 1
+            if count == 0:
+                return position + index + 1
+    return 0
+
+
+def _find_newline_after(handle: BinaryIO, offset: int, count: int, size: int) -> int:
+    """Returns the end of the line `count - 1` lines below the one at `offset`."""
+    position = offset
+    while position < size:
+        handle.seek(position)
+        chunk = handle.read(CHUNK_SIZE)
+        index = -1
+        while True:
+            index = chunk.find(b"\n", index + 1)
+            if index < 0:
+                break
+            count -= 1
+            if count == 0:
+                return position + index + 1
+        position += len(chunk)
+    return size
+
+
+def _count_newlines(handle: BinaryIO, start: int, end: int) -> int:
+    handle.seek(start)
+    count = 0
+    remaining = end - start
+    while remaining > 0:
+        chunk = handle.read(min(CHUNK_SIZE, remaining))
+        if not chunk:
+            break
+        count += chunk.count(b"\n")
+        remaining -= len(chunk)
+    return count
+
+
+def _windows(
+    handle: BinaryIO, edits: Sequence[Edit], size: int
+) -> List[Tuple[int, int, List[Edit]]]:
+    """Group edits into byte ranges covering them and their context lines."""
+    windows: List[Tuple[int, int, List[Edit]]] = []
+    for edit in edits:
+        start, end, _ = edit
+        window_start = _find_newline_before(handle, start, CONTEXT_LINES + 1)
+        window_end = _find_newline_after(handle, end, CONTEXT_LINES + 1, size)
+        if windows and window_start <= windows[-1][1]:
+            previous_start, previous_end, previous_edits = windows[-1]
+            windows[-1] = (
+                previous_start,
+                max(previous_end, window_end),
+                [*previous_edits, edit],
+            )
+        else:
+            windows.append((window_start, window_end, [edit]))
+    return windows
+
+
+def _range(start: int, length: int) -> str:
+    """Format a hunk range the way `diff -u` does, from a 0-based start."""
+    if length == 1:
+        return f"{start + 1}"
+    if length == 0:
+        return f"{start},0"
+    return f"{start + 1},{length}"
+
+
+def _diff_lines(lines: List[str], prefix: str) -> Iterator[str]:
+    for line in lines:
+        if line.endswith("\n"):
+            yield f"{prefix}{line}"
+        else:
+            yield f"{prefix}{line}\n"
+            yield "\\ No newline at end of file\n"
+
+
+def _hunks(
+    old_lines: List[str], new_lines: List[str], old_base: int, new_base: int
+) -> Iterator[str]:
+    """Generate the hunks comparing two runs of lines starting at the given lines."""
+    matcher = SequenceMatcher(None, old_lines, new_lines, autojunk=False)
+    for group in matcher.get_grouped_opcodes(CONTEXT_LINES):
+        old_start, old_end = group[0][1], group[-1][2]
+        new_start, new_end = group[0][3], group[-1][4]
+        old_range = _range(old_base + old_start, old_end - old_start)
+        new_range = _range(new_base + new_start, new_end - new_start)
+        yield f"@@ -{old_range} +{new_range} @@\n"
+        for tag, i1, i2, j1, j2 in group:
+            if tag == "equal":
+                yield from _diff_lines(old_lines[i1:i2], " ")
+            else:
+                yield from _diff_lines(old_lines[i1:i2], "-")
+                yield from _diff_lines(new_lines[j1:j2], "+")
+
+
+def _apply(window: bytes, window_start: int, edits: Sequence[Edit]) -> bytes:
+    parts = []
+    offset = 0
+    for start, end, replacement in edits:
+        parts.append(window[offset : start - window_start])
+        parts.append(replacement)
+        offset = end - window_start
+    parts.append(window[offset:])
+    return b"".join(parts)
+
+
+def diff_file(
+    path: Path, edits: Sequence[Edit], label: Optional[str] = None
+) -> Iterator[str]:
+    """Generate a unified diff of byte range edits to a file.
+
+    Args:
+        path (Path): Edited file
+        edits (Sequence[Edit]): Non-overlapping edits, in the order applied
+        label (str, optional): Name of the file in the diff headers, defaults
+          to `path`
+
+    Yields:
+        str: Lines of the diff, each ending with a newline
+    """
+    label = label or str(path)
+    with open(path, "rb") as handle:
+        size = os.fstat(handle.fileno()).st_size
+        line_number = 0
+        line_delta = 0
+        position = 0
+        header = False
+        for window_start, window_end, window_edits in _windows(handle, edits, size):
+            line_number += _count_newlines(handle, position, window_start)
+            position = window_start
+            handle.seek(window_start)
+            old = handle.read(window_end - window_start)
+            new = _apply(old, window_start, window_edits)
+            old_lines = old.decode("utf-8").splitlines(keepends=True)
+            new_lines = new.decode("utf-8").splitlines(keepends=True)
+            for line in _hunks(
+                old_lines, new_lines, line_number, line_number + line_delta
+            ):
+                if not header:
+                    yield f"--- a/{label}\n"
+                    yield f"+++ b/{label}\n"
+                    header = True
+                yield line
+            line_delta += len(new_lines) - len(old_lines)
+
+
+def diff_plan(write_plan: WritePlan, root: Optional[Path] = None) -> Iterator[str]:
+    """Generate a unified diff of every file staged in a write plan.
+
+    Args:
+        write_plan (WritePlan): Staged changes
+        root (Path, optional): Directory the file names in the diff are
+          relative to, defaults to the current working directory
+
+    Yields:
+        str: Lines of the diff, each ending with a newline
+    """
+    root = Path(root) if root is not None else Path.cwd()
+    for path in sorted(write_plan.paths):
+        label = Path(os.path.relpath(path.resolve(), root.resolve())).as_posix()
+        yield from diff_file(path, write_plan.edits(path), label)
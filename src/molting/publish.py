@@ -0,0 +1,247 @@
+"""Publishing stage: commit, tag, push and release as a dependency graph.
+
+Each step waits only for the steps it depends on, so independent steps (e.g.
+the GitHub releases of several projects) run concurrently. The branch and all
+new tags are sent in a single atomic push.
+
+GitHub releases are created through the API over pooled connections when a
+token is configured, see `molting.github`, and with the GitHub CLI otherwise.
+"""
+import time
+from pathlib import Path
+from subprocess import CalledProcessError, TimeoutExpired
+from typing import TYPE_CHECKING, Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+from molting import trace
+from molting.git import Git
+from molting.github import get_client, is_release_step
+from molting.log import logger
+
+if TYPE_CHECKING:  # pragma: no cover
+    import asyncio
+
+    from molting.github import GitHubClient
+
+LOCAL_TIMEOUT = 60.0
+NETWORK_TIMEOUT = 300.0
+
+
+class Step(NamedTuple):
+    """A command of the publishing stage, and the text sent to its stdin."""
+
+    name: str
+    command: List[str]
+    requires: Tuple[str, ...] = ()
+    timeout: float = LOCAL_TIMEOUT
+    input: Optional[str] = None
+
+
+def commit_steps(
+    tags: Sequence[str], message: str, paths: Sequence[str] = (".",)
+) -> List[Step]:
+    """Build the local steps committing the release and tagging it.
+
+    Args:
+        tags (Sequence[str]): Tags to create
+        message (str): Commit message
+        paths (Sequence[str]): Paths to add to the commit
+
+    Returns:
+        List[Step]: Steps of the publishing stage
+    """
+    steps = [
+        Step("add", ["git", "add", "--", *paths]),
+        Step("commit", ["git", "commit", "-m", message], ("add",)),
+    ]
+    steps.extend(Step(f"tag {tag}", ["git", "tag", tag], ("commit",)) for tag in tags)
+    return steps
+
+
+def push_steps(
+    releases: Sequence[Tuple[str, str]],
+    remote: str = "origin",
+    requires: Tuple[str, ...] = (),
+) -> List[Step]:
+    """Build the steps pushing the release and creating the GitHub releases.
+
+    Args:
+        releases (Sequence[Tuple[str, str]]): Tag name and release notes of
+          every release
+        remote (str): Remote to push to
+        requires (Tuple[str, ...]): Names of the steps the push waits for
+
+    Returns:
+        List[Step]: Steps of the publishing stage
+    """
+    refs = [f"refs/tags/{tag}" for tag, _ in releases]
+    steps = [
+        Step(
+            "push",
+            ["git", "push", "--atomic", remote, "HEAD", *refs],
+            requires,
+            NETWORK_TIMEOUT,
+        )
+    ]
+    steps.extend(github_release_step(tag, notes, ("push",)) for tag, notes in releases)
+    return steps
+
+
+def github_release_step(tag: str, notes: str, requires: Tuple[str, ...] = ()) -> Step:
+    """Build the step creating a GitHub release for a tag.
+
+    The command runs the GitHub CLI, with the notes sent to its stdin rather
+    than as an argument, which long notes could exceed the length limit of.
+    When a GitHub token is configured, the release is created through the
+    API instead. When the step depends on the push, the release is only
+    created if the tag already exists on GitHub.
+
+    Args:
+        tag (str): Tag to release
+        notes (str): Release notes
+        requires (Tuple[str, ...]): Names of the steps to wait for
+
+    Returns:
+        Step: Release step
+    """
+    command = ["gh", "release", "create", tag, "--title", tag, "--notes-file", "-"]
+    if requires:
+        command.append("--verify-tag")
+    return Step(f"release {tag}", command, requires, NETWORK_TIMEOUT, notes)
+
+
+async def _run_release(
+    step: Step, github: "GitHubClient", directory: Optional[Path], track: int
+) -> None:
+    import asyncio
+
+    start = time.perf_counter()
+    # The client blocks, and its connection pool is shared between threads
+    release = asyncio.get_running_loop().run_in_executor(
+        None, github.run_release_step, step, directory
+    )
+    try:
+        await asyncio.wait_for(release, step.timeout)
+    except asyncio.TimeoutError:
+        trace.record(step.name, "http", start, time.perf_counter(), track, timeout=True)
+        raise TimeoutExpired(step.command, step.timeout) from None
+    trace.record(step.name, "http", start, time.perf_counter(), track)
+
+
+async def _kill(process: "asyncio.subprocess.Process") -> None:
+    if process.returncode is None:
+        process.kill()
+    await process.wait()
+
+
+async def _run_step(
+    step: Step,
+    tasks: Dict[str, "asyncio.Task"],
+    directory: Optional[Path],
+    git: Optional[Git],
+    github: Optional["GitHubClient"],
+    track: int,
+) -> None:
+    import asyncio
+    from asyncio.subprocess import PIPE
+
+    for requirement in step.requires:
+        await tasks[requirement]
+    logger.debug("Running step {!r}", step.name)
+    if github is not None and is_release_step(step):
+        await _run_release(step, github, directory, track)
+        return
+    if git is not None and step.command[0] == "git":
+        git.record_spawn(step.command)
+    start = time.perf_counter()
+    process = await asyncio.create_subprocess_exec(
+        *step.command, cwd=directory, stdin=PIPE if step.input is not None else None
+    )
+    data = step.input.encode("utf-8") if step.input is not None else None
+    try:
+        await asyncio.wait_for(process.communicate(data), step.timeout)
+        returncode = process.returncode
+    except asyncio.CancelledError:
+        # Another step failed, and the command would outlive the publishing
+        await _kill(process)
+        raise
+    except asyncio.TimeoutError:
+        await _kill(process)
+        trace.record(
+            step.name, "subprocess", start, time.perf_counter(), track, timeout=True
+        )
+        raise TimeoutExpired(step.command, step.timeout) from None
+    # Concurrent steps are drawn on separate tracks
+    trace.record(
+        step.name,
+        "subprocess",
+        start,
+        time.perf_counter(),
+        track,
+        command=step.command,
+        exit_code=returncode,
+    )
+    if returncode:
+        raise CalledProcessError(returncode, step.command)
+
+
+async def _run_steps(
+    steps: Sequence[Step],
+    directory: Optional[Path],
+    git: Optional[Git],
+    github: Optional["GitHubClient"],
+) -> None:
+    import asyncio
+
+    tasks: Dict[str, "asyncio.Task"] = {}
+    for track, step in enumerate(steps, start=1):
+        tasks[step.name] = asyncio.ensure_future(
+            _run_step(step, tasks, directory, git, github, track)
+        )
+    try:
+        await asyncio.gather(*tasks.values())
+    finally:
+        for task in tasks.values():
+            task.cancel()
+        await asyncio.gather(*tasks.values(), return_exceptions=True)
+
+
+def publish(
+    steps: Sequence[Step],
+    directory: Optional[Path] = None,
+    dry_run: bool = True,
+    git: Optional[Git] = None,
+    github: Optional["GitHubClient"] = None,
+) -> None:
+    """Run the steps of the publishing stage.
+
+    Args:
+        steps (Sequence[Step]): Steps to run
+        directory (Path, optional): Directory to run the commands in
+        dry_run (bool, optional): Only log the commands instead of running them
+        git (Git, optional): Repository whose process count includes the git
+          steps
+        github (GitHubClient, optional): Client creating the GitHub releases,
+          defaults to the one configured by the environment. Releases are
+          created with the GitHub CLI if there is none.
+
+    Raises:
+        ValueError: A step depends on a step that doesn't exist.
+        CalledProcessError: A step failed. Steps depending on it are not run.
+        TimeoutExpired: A step didn't finish in time.
+        GitHubError: A GitHub release couldn't be created through the API.
+    """
+    names = {step.name for step in steps}
+    for step in steps:
+        missing = set(step.requires) - names
+        if missing:
+            raise ValueError(f"Step {step.name!r} requires unknown steps {missing}")
+    if dry_run:
+        for step in steps:
+            logger.debug(" ".join(step.command))
+        return
+    if github is None and any(is_release_step(step) for step in steps):
+        github = get_client()
+    # asyncio is slow to import, and only needed to actually run the steps
+    import asyncio
+
+    asyncio.run(_run_steps(steps, directory, git, github))
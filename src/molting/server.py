@@ -0,0 +1,315 @@
+"""A long-running molting service, keeping per-repository caches warm.
+
+`molting serve` listens on a Unix socket. Every connection sends a single
+JSON request on one line, and receives a single JSON response line:
+
+- `{"command": "ping"}`
+- `{"command": "plan", "project_directory": "...", "version_part": null}`
+  stages the changes of a bump and returns them, without writing anything
+- `{"command": "bump", "project_directory": "...", "version_part": null}`
+  bumps, commits, tags, pushes and releases the project
+
+`version_targets` can be given as with `--version-target`. Responses are
+`{"ok": true, "result": {...}}`, or `{"ok": false, "error": "..."}`.
+
+Each project is kept between requests, with its parsed files, release tags,
+commit messages and git processes. Requests are served concurrently, except
+for requests for the same git repository, which wait for each other.
+"""
+import json
+import os
+import signal
+import socket
+import socketserver
+import sys
+import tempfile
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, Iterator, Optional, Sequence
+
+import molting
+from molting.log import logger
+from molting.main import Project, bump_project, plan_project
+from molting.preview import diff_plan
+
+# The temporary directory is shared by every user, so sockets there are kept
+# in a directory of their own that only the user can enter
+PRIVATE_SOCKET_DIRECTORY = Path(tempfile.gettempdir()) / f"molting-{os.getuid()}"
+DEFAULT_SOCKET = (
+    Path(os.environ["XDG_RUNTIME_DIR"]) / "molting.sock"
+    if os.environ.get("XDG_RUNTIME_DIR")
+    else PRIVATE_SOCKET_DIRECTORY / "molting.sock"
+)
+
+
+class ServiceError(RuntimeError):
+    """A request to the molting service failed."""
+
+
+class ProjectRegistry:
+    """Projects served so far, and a lock per git repository."""
+
+    def __init__(self) -> None:
+        """Initialize ProjectRegistry."""
+        self._projects: Dict[Path, Project] = {}
+        self._locks: Dict[Path, threading.Lock] = {}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        """Number of projects kept."""
+        return len(self._projects)
+
+    def get(self, directory: Path) -> Optional[Project]:
+        """Returns the kept project of a directory, if there is one."""
+        return self._projects.get(Path(directory).resolve())
+
+    @contextmanager
+    def checkout(
+        self,
+        directory: Path,
+        dry_run: bool,
+        version_targets: Optional[Sequence[Path]] = None,
+        searched_directories: Sequence[str] = (),
+    ) -> Iterator[Project]:
+        """Use the project of a directory, creating it on first use.
+
+        Waits until no other request uses a project of the same repository.
+
+        Args:
+            directory (Path): Project directory
+            dry_run (bool): Whether the request may only log commands
+            version_targets (Sequence[Path], optional): Version files of the
+              project
+            searched_directories (Sequence[str], optional): Skipped directory
+              names searched for `__init__.py` files anyway
+
+        Yields:
+            Project: The kept project
+        """
+        directory = Path(directory).resolve()
+        with self._lock:
+            project = self._projects.get(directory)
+            if project is None:
+                project = Project(directory, dry_run)
+                self._projects[directory] = project
+            repository = project.git.git_directory or directory
+            lock = self._locks.setdefault(repository.resolve(), threading.Lock())
+        with lock:
+            project.dry_run = dry_run
+            project.version_targets = (
+                [Path(target) for target in version_targets]
+                if version_targets
+                else None
+            )
+            project.searched_directories = frozenset(searched_directories)
+            yield project
+
+    def close(self) -> None:
+        """Stop the git processes of every project."""
+        with self._lock:
+            for project in self._projects.values():
+                project.git.close()
+            self._projects.clear()
+
+
+class MoltingService:
+    """Handles the requests sent to `molting serve`."""
+
+    def __init__(self) -> None:
+        """Initialize MoltingService."""
+        self.registry = ProjectRegistry()
+
+    def handle(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        """Run a request.
+
+        Args:
+            request (Dict[str, Any]): Decoded request
+
+        Raises:
+            ValueError: The command is unknown.
+
+        Returns:
+            Dict[str, Any]: Result of the request
+        """
+        command = request.get("command")
+        if command == "ping":
+            return {"version": molting.__version__, "projects": len(self.registry)}
+        if command not in ("plan", "bump"):
+            raise ValueError(f"Unknown command {command!r}")
+        dry_run = command == "plan" or request.get("dry_run", False)
+        with self.registry.checkout(
+            request["project_directory"],
+            dry_run,
+            request.get("version_targets"),
+            request.get("searched_directories", ()),
+        ) as project:
+            version_part = request.get("version_part")
+            if dry_run:
+                result, write_plan = plan_project(project, version_part)
+                diff = "".join(diff_plan(write_plan, project.project_directory))
+                plan = write_plan.to_dict()
+            else:
+                result = bump_project(project, version_part)
+                diff = None
+                plan = None
+        return {
+            "project_directory": str(project.project_directory),
+            "old_version": result.old_version,
+            "version": result.version,
+            "tag": project.tag_name(result.version),
+            "notes": result.notes,
+            "seconds": result.seconds,
+            "diff": diff,
+            "plan": plan,
+        }
+
+    def close(self) -> None:
+        """Release the kept projects."""
+        self.registry.close()
+
+
+class RequestHandler(socketserver.StreamRequestHandler):
+    """Reads one JSON request line, and writes one JSON response line."""
+
+    server: "MoltingServer"
+
+    def handle(self) -> None:
+        """Answer a request."""
+        line = self.rfile.readline()
+        try:
+            request = json.loads(line)
+            logger.info("Handling {!r}", request.get("command"))
+            response = {"ok": True, "result": self.server.service.handle(request)}
+        except Exception as error:
+            logger.opt(exception=True).error("Request failed: {}", error)
+            response = {"ok": False, "error": f"{type(error).__name__}: {error}"}
+        self.wfile.write(f"{json.dumps(response)}\n".encode("utf-8"))
+
+
+class MoltingServer(socketserver.ThreadingUnixStreamServer):
+    """Serves requests on a Unix socket, each in its own thread.
+
+    Args:
+        socket_path (Path): Socket to listen on
+        service (MoltingService): Handler of the requests
+    """
+
+    daemon_threads = True
+
+    def __init__(self, socket_path: Path, service: MoltingService) -> None:
+        """Initialize MoltingServer."""
+        self.service = service
+        super().__init__(str(socket_path), RequestHandler)
+
+    def server_bind(self) -> None:
+        """Create the socket, so that only the user running the service can connect.
+
+        The permissions are set as the socket is created, rather than after,
+        when others could already have connected.
+        """
+        umask = os.umask(0o077)
+        try:
+            super().server_bind()
+        finally:
+            os.umask(umask)
+
+
+def _check_owner(path: Path) -> None:
+    """Refuse a file or directory created by another user.
+
+    Raises:
+        ServiceError: The path belongs to another user, or is a private socket
+          directory that other users can access.
+    """
+    stat_result = path.lstat()
+    if stat_result.st_uid != os.getuid():
+        raise ServiceError(f"{path} belongs to another user")
+    if path == PRIVATE_SOCKET_DIRECTORY and stat_result.st_mode & 0o077:
+        raise ServiceError(f"{path} is accessible to other users")
+
+
+def _prepare_socket_directory(socket_path: Path) -> None:
+    """Create the private directory of the default socket, if needed."""
+    directory = socket_path.parent
+    if directory == PRIVATE_SOCKET_DIRECTORY:
+        try:
+            directory.mkdir(mode=0o700)
+        except FileExistsError:
+            pass
+        _check_owner(directory)
+
+
+def send_request(
+    payload: Dict[str, Any],
+    socket_path: Path = DEFAULT_SOCKET,
+    timeout: Optional[float] = None,
+) -> Dict[str, Any]:
+    """Send a request to a running `molting serve`.
+
+    Args:
+        payload (Dict[str, Any]): Request, see the module documentation
+        socket_path (Path): Socket the service listens on
+        timeout (float, optional): Seconds to wait for the response
+
+    Raises:
+        ServiceError: The request failed.
+
+    Returns:
+        Dict[str, Any]: Result of the request
+    """
+    socket_path = Path(socket_path)
+    if socket_path.parent == PRIVATE_SOCKET_DIRECTORY:
+        _check_owner(socket_path.parent)
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as client:
+        client.settimeout(timeout)
+        client.connect(str(socket_path))
+        client.sendall(f"{json.dumps(payload)}\n".encode("utf-8"))
+        with client.makefile("rb") as stream:
+            line = stream.readline()
+    if not line:
+        raise ServiceError("The service closed the connection without a response")
+    response = json.loads(line)
+    if not response["ok"]:
+        raise ServiceError(response["error"])
+    return response["result"]
+
+
+def _remove_stale_socket(socket_path: Path) -> None:
+    if not os.path.lexists(socket_path):
+        return
+    _check_owner(socket_path)
+    try:
+        send_request({"command": "ping"}, socket_path, timeout=5)
+    except (OSError, ServiceError):
+        socket_path.unlink()
+    else:
+        raise ServiceError(f"molting is already serving on {socket_path}")
+
+
+def serve(socket_path: Path = DEFAULT_SOCKET) -> None:
+    """Serve requests until interrupted.
+
+    Args:
+        socket_path (Path): Socket to listen on. A socket left behind by a
+          service that is no longer running is replaced.
+
+    Raises:
+        ServiceError: Another service is listening on the socket, or the
+          socket or its private directory belongs to another user.
+    """
+    socket_path = Path(socket_path)
+    _prepare_socket_directory(socket_path)
+    _remove_stale_socket(socket_path)
+    service = MoltingService()
+    if threading.current_thread() is threading.main_thread():
+        signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+    with MoltingServer(socket_path, service) as server:
+        logger.info("Listening on {}", socket_path)
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            service.close()
+            socket_path.unlink()
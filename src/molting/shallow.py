@@ -0,0 +1,113 @@
+"""Fetching just enough history of shallow clones to reach the last release.
+
+CI checkouts are often shallow clones of depth 1, without tags. The commits
+since the previous release are then missing, and the range of a bump would
+silently start at the oldest commit that was fetched. Instead of requiring a
+full clone, the history is deepened only until the release tag is an ancestor
+of `HEAD`:
+
+1. The tag is fetched on its own, at depth 1, if it isn't there yet.
+2. Everything committed since the tag is fetched with `--shallow-since`.
+3. If the tag still isn't reachable, e.g. because of commits dated before
+   it, the history is deepened by an exponentially growing number of
+   commits with `--deepen`.
+"""
+from typing import NamedTuple, Optional, Tuple
+
+from molting.git import Git
+from molting.log import logger
+
+DEFAULT_REMOTE = "origin"
+DEEPEN_START = 32
+MAX_DEEPEN_FETCHES = 16
+
+
+class Deepening(NamedTuple):
+    """What deepening a shallow clone up to a release fetched."""
+
+    tag: str
+    reached: bool
+    fetches: int
+    commits: int
+
+
+def _reached(git: Git, tag: str) -> bool:
+    commit = git.resolve(f"{tag}^{{commit}}")
+    return commit is not None and git.is_ancestor(commit, "HEAD")
+
+
+def _count_commits(git: Git) -> int:
+    result = git.run("rev-list", "--count", "HEAD")
+    return int(result.stdout) if result.returncode == 0 else 0
+
+
+def _fetch(git: Git, remote: str, option: str, *refspecs: str) -> bool:
+    result = git.run("fetch", "--quiet", "--no-tags", option, remote, *refspecs)
+    if result.returncode:
+        logger.warning("Couldn't fetch from {!r}: {}", remote, result.stderr.strip())
+    return result.returncode == 0
+
+
+def _deepen(git: Git, tag: str, remote: str) -> Tuple[bool, int]:
+    """Fetch until the tag is reachable.
+
+    Returns:
+        Tuple[bool, int]: Whether the tag is reachable, and the number of fetches
+    """
+    fetches = 0
+    if git.resolve(f"{tag}^{{commit}}") is None:
+        # Only the tag: its ancestors are fetched from `HEAD`'s side
+        fetches += 1
+        if not _fetch(git, remote, "--depth=1", f"+refs/tags/{tag}:refs/tags/{tag}"):
+            return False, fetches
+    date = git.run("show", "--no-patch", "--format=%ct", f"{tag}^{{commit}}")
+    if date.returncode == 0:
+        fetches += 1
+        if _fetch(git, remote, f"--shallow-since={date.stdout.strip()}") and _reached(
+            git, tag
+        ):
+            return True, fetches
+    depth = DEEPEN_START
+    while git.is_shallow and fetches < MAX_DEEPEN_FETCHES:
+        fetches += 1
+        if not _fetch(git, remote, f"--deepen={depth}"):
+            break
+        if _reached(git, tag):
+            return True, fetches
+        depth *= 2
+    return _reached(git, tag), fetches
+
+
+def deepen_history(
+    git: Git, tag: str, remote: str = DEFAULT_REMOTE
+) -> Optional[Deepening]:
+    """Fetch the history of a shallow clone until a release tag is reachable.
+
+    Args:
+        git (Git): Repository to deepen
+        tag (str): Tag of the release the bump starts from
+        remote (str): Remote to fetch from
+
+    Returns:
+        Optional[Deepening]: What was fetched, None if the repository isn't a
+        shallow clone or already reaches the tag
+    """
+    if not git.is_shallow or _reached(git, tag):
+        return None
+    logger.info("Fetching the history of the shallow clone up to {!r}", tag)
+    commits = _count_commits(git)
+    reached, fetches = _deepen(git, tag, remote)
+    fetched = _count_commits(git) - commits
+    if reached:
+        logger.info(
+            "Fetched {} commits in {} fetches to reach {!r}", fetched, fetches, tag
+        )
+    else:
+        logger.warning(
+            "Fetched {} commits in {} fetches without reaching {!r}, "
+            "the commits since the release may be incomplete",
+            fetched,
+            fetches,
+            tag,
+        )
+    return Deepening(tag, reached, fetches, fetched)
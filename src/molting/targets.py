@@ -0,0 +1,231 @@
+"""Discovery and rewriting of the files holding a project's version."""
+import os
+from pathlib import Path
+from threading import Lock
+from typing import (
+    Callable,
+    Dict,
+    FrozenSet,
+    Iterator,
+    List,
+    Optional,
+    Sequence,
+    Tuple,
+)
+
+from molting.files import Edit, file_lock, splice_file, write_file
+from molting.log import logger
+from molting.manifests import format_for
+
+MANIFEST_FORMAT = 1
+
+# Directories that don't hold the version of the project itself, unless a
+# project searches them explicitly
+PRUNED_DIRECTORIES = frozenset(
+    {
+        "__pycache__",
+        "_vendor",
+        "vendor",
+        "vendored",
+        "_generated",
+        "generated",
+        "node_modules",
+        "build",
+        "dist",
+    }
+)
+
+
+def discover_init_files(
+    root: Path, pruned: FrozenSet[str] = PRUNED_DIRECTORIES
+) -> Iterator[Path]:
+    """Find the `__init__.py` files below a directory.
+
+    Hidden directories, symbolic links to directories and directories named in
+    `pruned` are not descended into.
+
+    Args:
+        root (Path): Directory to search
+        pruned (FrozenSet[str]): Names of directories to skip
+
+    Yields:
+        Path: Every `__init__.py` found
+    """
+    stack = [str(root)]
+    while stack:
+        directory = stack.pop()
+        try:
+            entries = os.scandir(directory)
+        except (FileNotFoundError, NotADirectoryError):
+            continue
+        with entries:
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    if entry.name not in pruned and not entry.name.startswith("."):
+                        stack.append(entry.path)
+                elif entry.name == "__init__.py":
+                    yield Path(entry.path)
+
+
+class VersionTargetIndex:
+    """Index of the files that hold a version string.
+
+    Files are Python modules with a `__version__` string, unless they are
+    named like one of the manifests of `manifests.VERSION_FORMATS`, e.g.
+    `package.json` or `VERSION`.
+
+    Whether a file holds a version string is remembered together with its
+    modification time and size, so unchanged files without a version string
+    are never read again. With a `manifest_path`, what is remembered is saved
+    for later runs too.
+
+    Args:
+        targets (Sequence[Path]): Files, or directories searched for
+          `__init__.py` files
+        pruned (FrozenSet[str]): Names of directories to skip while searching
+        manifest_path (Path, optional): File to save the manifest to, e.g. in
+          the git directory
+    """
+
+    targets: List[Path]
+    pruned: FrozenSet[str]
+    manifest_path: Optional[Path]
+
+    def __init__(
+        self,
+        targets: Sequence[Path],
+        pruned: FrozenSet[str] = PRUNED_DIRECTORIES,
+        manifest_path: Optional[Path] = None,
+    ) -> None:
+        """Initialize VersionTargetIndex."""
+        self.targets = [Path(target) for target in targets]
+        self.pruned = pruned
+        self.manifest_path = manifest_path
+        self._manifest: Dict[Path, Tuple[int, int, bool]] = {}
+        self._manifest_loaded = manifest_path is None
+        self._manifest_changed = False
+        self._lock = Lock()
+
+    def _load_manifest(self) -> Dict[str, List]:
+        """Returns the saved manifest, by path."""
+        import json
+
+        try:
+            data = json.loads(self.manifest_path.read_text())
+        except (OSError, ValueError):
+            return {}
+        if not isinstance(data, dict) or data.get("format") != MANIFEST_FORMAT:
+            return {}
+        return data["files"]
+
+    def save_manifest(self) -> None:
+        """Save the manifest for later runs, if it changed since it was loaded."""
+        import json
+
+        path = self.manifest_path
+        with self._lock:
+            if path is None or not self._manifest_changed:
+                return
+            files = {str(name): list(entry) for name, entry in self._manifest.items()}
+            self._manifest_changed = False
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            # Other projects of the repository save to the same file
+            with file_lock(path):
+                saved = self._load_manifest()
+                saved.update(files)
+                data = {"format": MANIFEST_FORMAT, "files": saved}
+                write_file(path, json.dumps(data, separators=(",", ":")).encode())
+        except OSError as error:
+            # The manifest only saves time, a bump never fails because of it
+            logger.warning("Couldn't save the version files to {}: {}", path, error)
+
+    def candidates(self) -> Iterator[Path]:
+        """Yields every file that may hold a version string."""
+        for target in self.targets:
+            if target.is_dir():
+                yield from discover_init_files(target, self.pruned)
+            elif target.exists():
+                yield target
+
+    def _holds_version(self, path: Path) -> bool:
+        stat_result = path.stat()
+        stat = (stat_result.st_mtime_ns, stat_result.st_size)
+        with self._lock:
+            if not self._manifest_loaded:
+                self._manifest_loaded = True
+                for name, entry in self._load_manifest().items():
+                    self._manifest.setdefault(Path(name), tuple(entry))
+            cached = self._manifest.get(path)
+        if cached is not None and tuple(cached[:2]) == stat:
+            return cached[2]
+        holds_version = bool(format_for(path).locate(path.read_bytes()))
+        with self._lock:
+            self._manifest[path] = (*stat, holds_version)
+            self._manifest_changed = True
+        return holds_version
+
+    def version_files(self) -> List[Path]:
+        """Returns the files that currently hold a version string."""
+        files = [path for path in self.candidates() if self._holds_version(path)]
+        self.save_manifest()
+        return files
+
+    def _rewrite(
+        self,
+        path: Path,
+        version_number: str,
+        dry_run: bool,
+        splice: Callable[[Path, Sequence[Edit]], None],
+    ) -> bool:
+        with file_lock(path):
+            version_format = format_for(path)
+            versions = version_format.locate(path.read_bytes())
+            edits = version_format.edits(versions, version_number)
+            if not edits:
+                logger.debug("{} is already at {!r}", path, version_number)
+                return False
+            logger.debug("Writing {} changes", path)
+            if not dry_run:
+                splice(path, edits)
+                with self._lock:
+                    self._manifest.pop(path, None)
+            return True
+
+    def rewrite(
+        self,
+        version_number: str,
+        dry_run: bool = True,
+        max_workers: Optional[int] = None,
+        splice: Callable[[Path, Sequence[Edit]], None] = splice_file,
+    ) -> List[Path]:
+        """Replace the version in every file holding a version string.
+
+        Only the bytes of the versions are patched, concurrently for several
+        files. Files already at the new version are left untouched.
+
+        Args:
+            version_number (str): New version number
+            dry_run (bool, optional): Don't write the files
+            max_workers (int, optional): Maximum number of files handled at
+              once, 1 to handle them one after the other in the calling thread
+            splice (Callable[[Path, Sequence[Edit]], None], optional): Applies
+              byte range edits to a file, e.g. to stage them in a write plan
+
+        Returns:
+            List[Path]: Files that were (or would be, in dry-run mode) changed
+        """
+        from concurrent.futures import ThreadPoolExecutor
+
+        files = self.version_files()
+        logger.debug("Found {} files holding a version string", len(files))
+
+        def rewrite_file(path: Path) -> bool:
+            return self._rewrite(path, version_number, dry_run, splice)
+
+        if max_workers == 1 or len(files) < 2:
+            changed = list(map(rewrite_file, files))
+        else:
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                changed = list(executor.map(rewrite_file, files))
+        return [path for path, was_changed in zip(files, changed) if was_changed]
@@ -0,0 +1,198 @@
+"""Timing spans for the phases of a release and the processes they start.
+
+Spans are only measured while tracing is enabled, e.g. with `--trace-file`.
+Each finished span is written as one line of a Chrome trace file: a JSON array
+of complete (`"ph": "X"`) events, one per line. The closing bracket is written
+when tracing stops, so the file is then valid JSON. The format allows it to
+be missing, so the file can also be loaded into `chrome://tracing` or
+Perfetto while molting is still running.
+"""
+import os
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import IO, Any, Dict, Iterator, Optional, Tuple
+
+try:
+    import resource
+except ImportError:  # pragma: no cover - Windows
+    resource = None
+
+PROC_IO = Path("/proc/self/io")
+
+
+def _io_counters() -> Optional[Tuple[int, int]]:
+    """Bytes read and written by this process so far, where the OS reports it."""
+    try:
+        text = PROC_IO.read_text()
+    except OSError:
+        return None
+    counters = dict(line.split(": ") for line in text.splitlines())
+    return int(counters["rchar"]), int(counters["wchar"])
+
+
+def _child_cpu_time() -> float:
+    """CPU time used by finished child processes so far, in seconds."""
+    if resource is None:
+        return 0.0
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return usage.ru_utime + usage.ru_stime
+
+
+class Tracer:
+    """Writes finished spans to a Chrome trace file.
+
+    Args:
+        stream (IO[str]): Text stream to write the events to
+    """
+
+    stream: IO[str]
+
+    def __init__(self, stream: IO[str]) -> None:
+        """Initialize Tracer."""
+        self.stream = stream
+        self.origin = time.perf_counter()
+        self._lock = threading.Lock()
+        self._separator = "\n"
+        self.stream.write("[")
+        self.stream.flush()
+
+    def emit(
+        self,
+        name: str,
+        category: str,
+        start: float,
+        end: float,
+        args: Dict[str, Any],
+        thread_id: Optional[int] = None,
+    ) -> None:
+        """Write a complete event.
+
+        Args:
+            name (str): Name of the span
+            category (str): Category of the span, e.g. `phase` or `subprocess`
+            start (float): `time.perf_counter()` when the span started
+            end (float): `time.perf_counter()` when the span ended
+            args (Dict[str, Any]): Details shown with the span
+            thread_id (int, optional): Track the span is drawn on, defaults to
+              the current thread
+        """
+        import json
+
+        event = {
+            "name": name,
+            "cat": category,
+            "ph": "X",
+            "ts": round((start - self.origin) * 1e6, 3),
+            "dur": round((end - start) * 1e6, 3),
+            "pid": os.getpid(),
+            "tid": thread_id if thread_id is not None else threading.get_ident(),
+            "args": args,
+        }
+        line = json.dumps(event, default=str)
+        with self._lock:
+            self.stream.write(f"{self._separator}{line}")
+            self.stream.flush()
+            self._separator = ",\n"
+
+    def close(self) -> None:
+        """Close the JSON array, then the stream."""
+        with self._lock:
+            self.stream.write("\n]\n")
+            self.stream.close()
+
+
+_tracer: Optional[Tracer] = None
+
+
+def enable(path: Path) -> Tracer:
+    """Start writing spans to a trace file, replacing any previous tracer.
+
+    Args:
+        path (Path): File to write, overwritten if it exists
+
+    Returns:
+        Tracer: The active tracer
+    """
+    global _tracer
+    disable()
+    _tracer = Tracer(Path(path).open("w"))
+    return _tracer
+
+
+def disable() -> None:
+    """Stop tracing and close the trace file."""
+    global _tracer
+    tracer, _tracer = _tracer, None
+    if tracer is not None:
+        tracer.close()
+
+
+def is_enabled() -> bool:
+    """Whether spans are currently recorded."""
+    return _tracer is not None
+
+
+def record(
+    name: str,
+    category: str,
+    start: float,
+    end: float,
+    thread_id: Optional[int] = None,
+    **args: Any,
+) -> None:
+    """Record a span that was timed by the caller, if tracing is enabled.
+
+    Args:
+        name (str): Name of the span
+        category (str): Category of the span
+        start (float): `time.perf_counter()` when the span started
+        end (float): `time.perf_counter()` when the span ended
+        thread_id (int, optional): Track the span is drawn on
+        **args (Any): Details shown with the span
+    """
+    tracer = _tracer
+    if tracer is not None:
+        tracer.emit(name, category, start, end, args, thread_id)
+
+
+@contextmanager
+def span(name: str, category: str = "phase", **args: Any) -> Iterator[Dict[str, Any]]:
+    """Measure a block of code.
+
+    Records wall time, the CPU time of the current thread and of finished
+    child processes, and the bytes read and written by the process. Does
+    nothing but yield while tracing is disabled.
+
+    Args:
+        name (str): Name of the span
+        category (str): Category of the span, e.g. `phase` or `subprocess`
+        **args (Any): Details shown with the span
+
+    Yields:
+        Dict[str, Any]: The details of the span, which the block can add to,
+        e.g. the exit code of a process
+    """
+    tracer = _tracer
+    if tracer is None:
+        yield args
+        return
+    io_before = _io_counters()
+    child_cpu_before = _child_cpu_time()
+    cpu_before = time.thread_time()
+    start = time.perf_counter()
+    try:
+        yield args
+    except BaseException as error:
+        args["error"] = type(error).__name__
+        raise
+    finally:
+        end = time.perf_counter()
+        args["cpu_ms"] = round((time.thread_time() - cpu_before) * 1e3, 3)
+        args["child_cpu_ms"] = round((_child_cpu_time() - child_cpu_before) * 1e3, 3)
+        io_after = _io_counters()
+        if io_before is not None and io_after is not None:
+            args["read_bytes"] = io_after[0] - io_before[0]
+            args["written_bytes"] = io_after[1] - io_before[1]
+        tracer.emit(name, category, start, end, args)
@@ -0,0 +1,235 @@
+"""Semantic version numbers."""
+import re
+from bisect import bisect_right
+from functools import lru_cache, total_ordering
+from typing import Iterable, List, Optional, Tuple
+
+from molting.git import Git
+
+# From the least to the most significant
+VERSION_PARTS = ("patch", "minor", "major")
+# Prereleases may also be spelled like PEP 440 ones, e.g. `1.1.0rc1`
+RE_VERSION = re.compile(
+    r"^v?(?P<major>\d+)\.(?P<minor>\d+)(?:\.(?P<patch>\d+))?"
+    r"(?:(?:-|(?=[A-Za-z]))(?P<prerelease>[0-9A-Za-z.-]+))?"
+    r"(?:\+(?P<build>[0-9A-Za-z.-]+))?$"
+)
+
+
+def _prerelease_key(prerelease: Tuple[str, ...]) -> Tuple:
+    """Sort key for prerelease identifiers, following the SemVer precedence rules.
+
+    Releases sort after all of their prereleases, numeric identifiers sort
+    numerically and before alphanumeric ones.
+    """
+    if not prerelease:
+        return ((1,),)
+    return tuple(
+        (0, int(part), "") if part.isdigit() else (0, float("inf"), part)
+        for part in prerelease
+    )
+
+
+@total_ordering
+class Version:
+    """An immutable semantic version number.
+
+    Build metadata is kept, but ignored when comparing versions.
+
+    Args:
+        major (int): Major version
+        minor (int): Minor version
+        patch (int): Patch version
+        prerelease (Tuple[str, ...]): Dot-separated prerelease identifiers
+        build (Tuple[str, ...]): Dot-separated build metadata identifiers
+    """
+
+    __slots__ = ("major", "minor", "patch", "prerelease", "build", "_key")
+
+    major: int
+    minor: int
+    patch: int
+    prerelease: Tuple[str, ...]
+    build: Tuple[str, ...]
+
+    def __init__(
+        self,
+        major: int,
+        minor: int,
+        patch: int = 0,
+        prerelease: Tuple[str, ...] = (),
+        build: Tuple[str, ...] = (),
+    ) -> None:
+        """Initialize Version."""
+        for name, value in (
+            ("major", major),
+            ("minor", minor),
+            ("patch", patch),
+            ("prerelease", tuple(prerelease)),
+            ("build", tuple(build)),
+        ):
+            object.__setattr__(self, name, value)
+        object.__setattr__(
+            self, "_key", (major, minor, patch, _prerelease_key(self.prerelease))
+        )
+
+    def __setattr__(self, name, value):
+        """Versions are immutable."""
+        raise AttributeError(f"{type(self).__name__} is immutable")
+
+    @classmethod
+    def parse(cls, text: str) -> "Version":
+        """Parse a version string, e.g. `1.2.3`, `v1.2` or `1.0.0-rc.1+abc`.
+
+        Parsed versions are cached, so parsing the same string again is cheap.
+
+        Args:
+            text (str): Version string, optionally prefixed with `v`
+
+        Raises:
+            ValueError: The string isn't a valid version.
+
+        Returns:
+            Version: Parsed version
+        """
+        return _parse(text)
+
+    def bump(self, version_part: str) -> "Version":
+        """Returns the next version according to SemVer type.
+
+        Prerelease identifiers and build metadata are dropped. A prerelease
+        that already is of the bumped part is released as is, e.g. both
+        `1.1.0-rc.1` and `1.1.0rc1` become `1.1.0` after a minor change, but
+        `1.1.1-rc.1` becomes `1.2.0`.
+
+        Args:
+            version_part (str): SemVer version part, one of `patch`, `minor` or
+              `major`
+
+        Raises:
+            ValueError: The version part is unknown.
+
+        Returns:
+            Version: New version
+        """
+        if version_part not in VERSION_PARTS:
+            raise ValueError(f"Unknown version part {version_part!r}")
+        if self.prerelease:
+            # `1.0.0-rc.1` is the prerelease of a major change, and so on
+            level = 0 if self.patch else 1 if self.minor else 2
+            if VERSION_PARTS.index(version_part) <= level:
+                return Version(self.major, self.minor, self.patch)
+        if version_part == "patch":
+            return Version(self.major, self.minor, self.patch + 1)
+        if version_part == "minor":
+            return Version(self.major, self.minor + 1, 0)
+        return Version(self.major + 1, 0, 0)
+
+    def __str__(self) -> str:
+        """Format the version, always including the patch version."""
+        text = f"{self.major}.{self.minor}.{self.patch}"
+        if self.prerelease:
+            text = f"{text}-{'.'.join(self.prerelease)}"
+        if self.build:
+            text = f"{text}+{'.'.join(self.build)}"
+        return text
+
+    def __repr__(self) -> str:
+        """Represent the version as the call parsing it."""
+        return f"Version.parse({str(self)!r})"
+
+    def __eq__(self, other) -> bool:
+        """Versions are equal when they have the same precedence."""
+        if not isinstance(other, Version):
+            return NotImplemented
+        return self._key == other._key
+
+    def __lt__(self, other) -> bool:
+        """Compare versions by SemVer precedence."""
+        if not isinstance(other, Version):
+            return NotImplemented
+        return self._key < other._key
+
+    def __hash__(self) -> int:
+        """Hash consistently with equality."""
+        return hash(self._key)
+
+
+@lru_cache(maxsize=4096)
+def _parse(text: str) -> Version:
+    match = RE_VERSION.match(text)
+    if match is None:
+        raise ValueError(f"Invalid version {text!r}")
+    prerelease = match.group("prerelease")
+    build = match.group("build")
+    return Version(
+        int(match.group("major")),
+        int(match.group("minor")),
+        int(match.group("patch") or 0),
+        tuple(prerelease.split(".")) if prerelease else (),
+        tuple(build.split(".")) if build else (),
+    )
+
+
+class TagIndex:
+    """Release tags of a repository, sorted by version.
+
+    Tags that don't hold a valid version are ignored.
+
+    Args:
+        tags (Iterable[str]): Tag names, e.g. every `v*` tag of a repository
+        prefix (str): Text in front of the `v` of each tag, e.g. `name-` for
+          tags like `name-v1.2.3`
+    """
+
+    prefix: str
+    versions: List[Version]
+    tags: List[str]
+
+    def __init__(self, tags: Iterable[str], prefix: str = "") -> None:
+        """Initialize TagIndex."""
+        self.prefix = prefix
+        parsed = []
+        for tag in tags:
+            if not tag.startswith(f"{prefix}v"):
+                continue
+            try:
+                parsed.append((Version.parse(tag[len(prefix) :]), tag))
+            except ValueError:
+                continue
+        parsed.sort(key=lambda item: item[0])
+        self.versions = [version for version, _ in parsed]
+        self.tags = [tag for _, tag in parsed]
+
+    @classmethod
+    def from_git(cls, git: Git, prefix: str = "") -> "TagIndex":
+        """Read and sort every release tag of a repository.
+
+        Args:
+            git (Git): Repository to read the tags of
+            prefix (str): Text in front of the `v` of each tag
+
+        Returns:
+            TagIndex: Sorted release tags
+        """
+        return cls(git.tags(f"{prefix}v*"), prefix)
+
+    def __len__(self) -> int:
+        """Number of release tags."""
+        return len(self.tags)
+
+    def latest(self) -> Optional[str]:
+        """Returns the tag of the highest version, if there is one."""
+        return self.tags[-1] if self.tags else None
+
+    def previous_release(self, version: Version) -> Optional[str]:
+        """Returns the tag of the highest version not above `version`.
+
+        Args:
+            version (Version): Version being released from
+
+        Returns:
+            Optional[str]: Tag name, or None if every tag is above `version`
+        """
+        index = bisect_right(self.versions, version)
+        return self.tags[index - 1] if index else None
@@ -0,0 +1,205 @@
+import json
+import os
+import subprocess
+import textwrap
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from molting.publish import commit_steps, push_steps
+
+
+def git(directory, *args):
+    return subprocess.run(
+        ["git", *args], cwd=directory, check=True, capture_output=True, text=True
+    ).stdout.strip()
+
+
+def commit(directory, message):
+    git(directory, "commit", "--allow-empty", "-q", "-m", message)
+    return git(directory, "rev-parse", "HEAD")
+
+
+def release_steps(releases, message):
+    tags = [tag for tag, _ in releases]
+    return [
+        *commit_steps(tags, message),
+        *push_steps(releases, requires=tuple(f"tag {tag}" for tag in tags)),
+    ]
+
+
+def make_project(directory, name, version, notes="- Some changes\n"):
+    (directory / "src" / name).mkdir(parents=True)
+    (directory / "src" / name / "__init__.py").write_text(f'__version__ = "{version}"')
+    (directory / "pyproject.toml").write_text(
+        textwrap.dedent(
+            f"""\
+            name = "{name}"
+            version = "{version}"
+            repository = "https://example.com"
+            """
+        )
+    )
+    (directory / "CHANGELOG.md").write_text(f"## [Unreleased]\n\n{notes}")
+
+
+@pytest.fixture(autouse=True)
+def github_environment(monkeypatch):
+    """Never reach GitHub from the tests, whatever the environment."""
+    for name in (
+        "GITHUB_TOKEN",
+        "GH_TOKEN",
+        "GITHUB_API_URL",
+        "GITHUB_REPOSITORY",
+        "MOLTING_GITHUB_CLIENT",
+    ):
+        monkeypatch.delenv(name, raising=False)
+
+
+@pytest.fixture
+def git_repository(tmp_path, monkeypatch):
+    """A git repository with a tagged release followed by two more commits."""
+    monkeypatch.setenv("GIT_AUTHOR_NAME", "Molting")
+    monkeypatch.setenv("GIT_AUTHOR_EMAIL", "molting@example.com")
+    monkeypatch.setenv("GIT_COMMITTER_NAME", "Molting")
+    monkeypatch.setenv("GIT_COMMITTER_EMAIL", "molting@example.com")
+    repository = tmp_path / "repository"
+    repository.mkdir()
+    git(repository, "init", "-q", "-b", "main")
+    commit(repository, "Initial commit")
+    commit(repository, "Add the first feature")
+    git(repository, "tag", "v0.1.0")
+    commit(repository, "Fix a bug\n\nWith a longer description.")
+    commit(repository, "Improve the docs")
+    return repository
+
+
+@pytest.fixture
+def remote_repository(git_repository, tmp_path):
+    """A bare repository that `git_repository` pushes to as `origin`."""
+    remote = tmp_path / "remote.git"
+    git(tmp_path, "init", "-q", "--bare", str(remote))
+    git(git_repository, "remote", "add", "origin", str(remote))
+    git(git_repository, "push", "-q", "origin", "main", "--tags")
+    return remote
+
+
+@pytest.fixture
+def stub_gh(tmp_path, monkeypatch):
+    """A fake GitHub CLI that records its arguments, one call per line.
+
+    Notes passed with `--notes-file -` are appended to `gh-notes.txt`.
+    """
+    bin_directory = tmp_path / "bin"
+    bin_directory.mkdir()
+    calls = tmp_path / "gh-calls.txt"
+    notes = tmp_path / "gh-notes.txt"
+    gh = bin_directory / "gh"
+    gh.write_text(
+        f'#!/bin/sh\necho "$@" >> {calls}\n'
+        f'case "$*" in *"--notes-file -"*) cat >> {notes} ;; esac\n'
+    )
+    gh.chmod(0o755)
+    monkeypatch.setenv("PATH", f"{bin_directory}{os.pathsep}{os.environ['PATH']}")
+    return calls
+
+
+class FakeGitHub(ThreadingHTTPServer):
+    """A local stand-in for the releases endpoints of the GitHub API.
+
+    Tags exist if they were pushed to the bare repository. Responses listed
+    in `failures` are sent instead of handling the next requests.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, repository):
+        """Listen on a free local port."""
+        super().__init__(("127.0.0.1", 0), FakeGitHubHandler)
+        self.repository = repository
+        self.releases = []
+        self.requests = []
+        self.connections = 0
+        self.failures = []
+
+    @property
+    def url(self):
+        """Root URL of the API, like the one of GitHub Enterprise servers."""
+        return f"http://127.0.0.1:{self.server_address[1]}/api/v3"
+
+
+class FakeGitHubHandler(BaseHTTPRequestHandler):
+    """Requests of a keep-alive connection to `FakeGitHub`."""
+
+    protocol_version = "HTTP/1.1"
+
+    def setup(self):
+        """Count the connection."""
+        super().setup()
+        self.server.connections += 1
+
+    def log_message(self, format, *args):
+        """Keep the output of the tests quiet."""
+
+    def respond(self, status, data, headers=()):
+        """Send a JSON response."""
+        body = json.dumps(data).encode()
+        self.send_response(status)
+        for name, value in headers:
+            self.send_header(name, value)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def handle_request(self):
+        """Answer a request like GitHub would."""
+        length = int(self.headers.get("Content-Length") or 0)
+        data = json.loads(self.rfile.read(length)) if length else None
+        self.server.requests.append((self.command, self.path, data))
+        if self.headers["Authorization"] != "Bearer secret":
+            return self.respond(401, {"message": "Bad credentials"})
+        if self.server.failures:
+            return self.respond(*self.server.failures.pop(0))
+        parts = self.path.split("/")
+        if self.path.startswith("/api/v3/repos/lucasmelin/project/git/ref/tags/"):
+            tag = parts[-1]
+            exists = subprocess.run(
+                ["git", "rev-parse", "--verify", "-q", f"refs/tags/{tag}"],
+                cwd=self.server.repository,
+                capture_output=True,
+            )
+            if exists.returncode:
+                return self.respond(404, {"message": "Not Found"})
+            return self.respond(200, {"ref": f"refs/tags/{tag}"})
+        if self.path == "/api/v3/repos/lucasmelin/project/releases":
+            if any(r["tag_name"] == data["tag_name"] for r in self.server.releases):
+                return self.respond(
+                    422, {"errors": [{"code": "already_exists", "field": "tag_name"}]}
+                )
+            self.server.releases.append(data)
+            return self.respond(201, data)
+        if self.path.startswith("/api/v3/repos/lucasmelin/project/releases/tags/"):
+            for release in self.server.releases:
+                if release["tag_name"] == parts[-1]:
+                    return self.respond(200, release)
+        return self.respond(404, {"message": "Not Found"})
+
+    do_GET = do_POST = handle_request
+
+
+@pytest.fixture
+def fake_github(remote_repository, monkeypatch):
+    """A fake GitHub API, configured as the one to create releases with."""
+    server = FakeGitHub(remote_repository)
+    thread = threading.Thread(
+        target=server.serve_forever, kwargs={"poll_interval": 0.01}, daemon=True
+    )
+    thread.start()
+    monkeypatch.setenv("GITHUB_TOKEN", "secret")
+    monkeypatch.setenv("GITHUB_API_URL", server.url)
+    monkeypatch.setenv("GITHUB_REPOSITORY", "lucasmelin/project")
+    yield server
+    server.shutdown()
+    server.server_close()
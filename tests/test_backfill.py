@@ -0,0 +1,109 @@
+import pytest
+
+from conftest import commit, git
+from molting.backfill import read_releases
+from molting.git import Git
+from molting.main import Project, backfill, cli
+from molting.version import TagIndex
+
+REPOSITORY = "https://github.com/example/example/"
+
+
+@pytest.fixture
+def tagged_repository(git_repository):
+    """Releases on a linear history, and a branch merged after two releases."""
+    (git_repository / "pyproject.toml").write_text(
+        f'name = "example"\nversion = "0.3.0"\nrepository = "{REPOSITORY}"\n'
+    )
+    git(git_repository, "add", "-A")
+    commit(git_repository, "Add pyproject.toml")
+    git(git_repository, "tag", "v0.2.0")
+    git(git_repository, "checkout", "-q", "-b", "branch", "v0.1.0")
+    commit(git_repository, "Work on a branch")
+    git(git_repository, "checkout", "-q", "main")
+    commit(git_repository, "Prepare the release")
+    git(git_repository, "tag", "v0.10.0")
+    git(git_repository, "merge", "-q", "--no-ff", "-m", "Merge branch", "branch")
+    commit(git_repository, "Start the next release")
+    return git_repository
+
+
+def test_read_releases(tagged_repository):
+    with Git(tagged_repository) as repository:
+        history = read_releases(repository, TagIndex.from_git(repository))
+    assert [(release.tag, release.lines) for release in history.releases] == [
+        ("v0.10.0", ["Prepare the release"]),
+        (
+            "v0.2.0",
+            [
+                "Add pyproject.toml",
+                "Improve the docs",
+                "Fix a bug",
+                "With a longer description.",
+            ],
+        ),
+        ("v0.1.0", ["Add the first feature", "Initial commit"]),
+    ]
+    # Forked before v0.1.0 was released, merged after v0.10.0
+    assert history.unreleased == [
+        "Start the next release",
+        "Merge branch",
+        "Work on a branch",
+    ]
+
+
+def test_backfill(tagged_repository, mocker):
+    (tagged_repository / "CHANGELOG.md").write_text("# Changelog\n\nIntro.\n")
+    spawn = mocker.spy(Git, "record_spawn")
+    text = backfill(tagged_repository, dry_run=False)
+    date = git(tagged_repository, "log", "-1", "--format=%cs", "v0.10.0")
+    assert text.startswith(
+        "# Changelog\n\nIntro.\n\n## [Unreleased]\n\n"
+        " - Start the next release\n - Merge branch\n - Work on a branch\n\n"
+        f"## [0.10.0] - {date}\n\n - Prepare the release\n\n## [0.2.0] - "
+    )
+    assert text.endswith(
+        "\n\n\n"
+        f"[Unreleased]: {REPOSITORY}compare/v0.10.0...HEAD\n"
+        f"[0.10.0]: {REPOSITORY}compare/v0.2.0...v0.10.0\n"
+        f"[0.2.0]: {REPOSITORY}compare/v0.1.0...v0.2.0\n"
+    )
+    assert (tagged_repository / "CHANGELOG.md").read_text() == text
+    logs = [call.args[1] for call in spawn.call_args_list if "log" in call.args[1]]
+    assert len(logs) == 1
+
+
+def test_backfill_keeps_unreleased_notes(tagged_repository):
+    (tagged_repository / "CHANGELOG.md").write_text(
+        "## [Unreleased]\n\n - Written by hand\n"
+    )
+    text = backfill(tagged_repository)
+    assert text.startswith("## [Unreleased]\n\n - Written by hand\n\n## [0.10.0]")
+    assert "Start the next release" not in text
+    assert (tagged_repository / "CHANGELOG.md").read_text() == (
+        "## [Unreleased]\n\n - Written by hand\n"
+    )
+
+
+@pytest.mark.parametrize(
+    "changelog",
+    [
+        "## [Unreleased]\n\n## [0.1.0] - 2022-01-01\n",
+        f"## [Unreleased]\n\n[Unreleased]: {REPOSITORY}compare/v0.1.0...HEAD\n",
+    ],
+)
+def test_backfill_refuses_released_changelog(tagged_repository, changelog):
+    (tagged_repository / "CHANGELOG.md").write_text(changelog)
+    with pytest.raises(ValueError, match="already has releases"):
+        Project(tagged_repository, dry_run=True).backfill_changelog()
+
+
+def test_cli_backfill(tagged_repository, capsys):
+    cli(["backfill", "--dry-run", "-d", str(tagged_repository)])
+    output = capsys.readouterr().out
+    assert output.startswith("# Changelog\n\n## [Unreleased]\n\n")
+    assert not (tagged_repository / "CHANGELOG.md").exists()
+    git(tagged_repository, "tag", "-d", "v0.1.0", "v0.2.0", "v0.10.0")
+    with pytest.raises(SystemExit):
+        cli(["backfill", "-d", str(tagged_repository)])
+    assert "No v* release tags" in capsys.readouterr().err
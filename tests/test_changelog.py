@@ -0,0 +1,227 @@
+import textwrap
+
+import pytest
+
+from molting import changelog as changelog_module
+from molting.changelog import Changelog
+from molting.main import cli
+
+CHANGELOG = textwrap.dedent(
+    """\
+    # Changelog
+
+    ## [Unreleased]
+
+    - Here are some changes
+    [link]: https://example.com
+
+    ## [0.1.0] - 2022-03-01
+
+    - Older changes
+
+    [Unreleased]: https://example.com/compare/v0.1.0...HEAD
+    [0.1.0]: https://example.com/compare/v0.0.1...v0.1.0
+    """
+)
+
+
+def test_scan_stops_at_first_release(tmp_path):
+    path = tmp_path / "CHANGELOG.md"
+    path.write_text(CHANGELOG)
+    layout = Changelog(path).scan()
+    assert layout.title == "Unreleased"
+    assert layout.notes == ["- Here are some changes"]
+    assert CHANGELOG.encode()[layout.head_end :].startswith(b"## [0.1.0]")
+    assert CHANGELOG.encode()[: layout.title_end].endswith(b"## [Unreleased]")
+
+
+@pytest.mark.parametrize("chunk_size", [1, 7, 8192])
+def test_scan_finds_title_link_across_chunks(tmp_path, monkeypatch, chunk_size):
+    monkeypatch.setattr(changelog_module, "FOOTER_CHUNK_SIZE", chunk_size)
+    path = tmp_path / "CHANGELOG.md"
+    path.write_text(CHANGELOG)
+    start, end = Changelog(path).scan().title_link
+    assert CHANGELOG.encode()[start:end] == (
+        b"[Unreleased]: https://example.com/compare/v0.1.0...HEAD"
+    )
+
+
+def test_scan_ignores_links_outside_footer(tmp_path):
+    path = tmp_path / "CHANGELOG.md"
+    path.write_text("## [Unreleased]\n\n[Unreleased]: https://example.com\n\nText\n")
+    assert Changelog(path).scan().title_link is None
+
+
+def test_scan_without_title(tmp_path):
+    path = tmp_path / "CHANGELOG.md"
+    path.write_text("## [0.1.0]\n\n- Changes\n")
+    layout = Changelog(path).scan()
+    assert layout.title is None
+    with pytest.raises(ValueError, match="Could not find an unreleased changes"):
+        Changelog.insert_after_title(layout, "- Notes")
+
+
+def test_scan_ignores_headings_in_code_blocks(tmp_path):
+    path = tmp_path / "CHANGELOG.md"
+    path.write_text(
+        "# Changelog\n\n```text\n## [version] - YYYY-MM-DD\n```\n\n"
+        "## [Latest Changes]\n\n- Changes\n\n## [0.1.0] - 2022-03-01\n"
+    )
+    layout = Changelog(path).scan()
+    assert layout.title == "Latest Changes"
+    assert layout.notes == ["- Changes"]
+
+
+HISTORY = textwrap.dedent(
+    """\
+    # Changelog
+
+    ## [Unreleased]
+
+    - Upcoming
+
+    ## [2.0.0] - 2023-01-10
+
+    - Dropped the old API
+
+    ## [1.1.0] - 2022-06-01
+
+    - Added a flag
+
+    ```
+    ## [9.9.9] - 2022-01-01
+    ```
+
+    ## [1.0.0] - 2021-03-01
+
+    - First release
+
+    [Unreleased]: https://example.com/compare/v2.0.0...HEAD
+    [2.0.0]: https://example.com/compare/v1.1.0...v2.0.0
+    [1.1.0]: https://example.com/compare/v1.0.0...v1.1.0
+    [1.0.0]: https://example.com/releases/v1.0.0
+    """
+)
+
+
+@pytest.fixture
+def history(tmp_path):
+    path = tmp_path / "CHANGELOG.md"
+    path.write_text(HISTORY)
+    return Changelog(path)
+
+
+def test_index(history):
+    index = history.index()
+    assert [(s.title, s.year) for s in index.sections] == [
+        ("Unreleased", None),
+        ("2.0.0", 2023),
+        ("1.1.0", 2022),
+        ("1.0.0", 2021),
+    ]
+    assert sorted(index.links) == ["1.0.0", "1.1.0", "2.0.0", "Unreleased"]
+    assert index.find("v2.0.0") == index.sections[1]
+    assert index.find("3.0.0") is None
+
+
+def test_release_notes(history):
+    assert history.release_notes("2.0.0") == "- Dropped the old API"
+    assert history.release_notes("v1.1.0") == (
+        "- Added a flag\n\n```\n## [9.9.9] - 2022-01-01\n```"
+    )
+    assert history.release_notes("1.0.0") == "- First release"
+    assert history.release_notes("Unreleased") == "- Upcoming"
+    assert history.release_notes("9.9.9") is None
+
+
+def test_index_is_cached(history, mocker):
+    index = history.index()
+    assert history.index_path.parent.joinpath(".gitignore").read_text() == "*\n"
+    index_lines = mocker.spy(changelog_module, "_index_lines")
+    assert history.index() == index
+    index_lines.assert_not_called()
+    history.path.write_text(HISTORY.replace("First release", "First"))
+    assert history.release_notes("1.0.0") == "- First"
+    index_lines.assert_called_once()
+
+
+def test_archive(history):
+    moved = history.archive(2023)
+    assert moved == {
+        history.archive_path(2022): ["1.1.0"],
+        history.archive_path(2021): ["1.0.0"],
+    }
+    text = history.path.read_text()
+    assert text == textwrap.dedent(
+        """\
+        # Changelog
+
+        ## [Unreleased]
+
+        - Upcoming
+
+        ## [2.0.0] - 2023-01-10
+
+        - Dropped the old API
+
+        [Unreleased]: https://example.com/compare/v2.0.0...HEAD
+        [2.0.0]: https://example.com/compare/v1.1.0...v2.0.0
+        """
+    )
+    assert history.archive_path(2021).read_text() == textwrap.dedent(
+        """\
+        # Changelog 2021
+
+        ## [1.0.0] - 2021-03-01
+
+        - First release
+
+        [1.0.0]: https://example.com/releases/v1.0.0
+        """
+    )
+    assert history.archives == [history.archive_path(2022), history.archive_path(2021)]
+    # Archived releases are still found
+    assert history.release_notes("1.1.0").startswith("- Added a flag")
+    assert history.release_notes("1.0.0") == "- First release"
+
+
+def test_archive_into_existing_archive(history):
+    history.archive_path(2021).write_text(
+        "# Changelog 2021\n\n## [0.9.0] - 2021-01-01\n\n- Beta\n"
+    )
+    history.archive(2022)
+    assert history.archive_path(2021).read_text() == textwrap.dedent(
+        """\
+        # Changelog 2021
+
+        ## [1.0.0] - 2021-03-01
+
+        - First release
+
+        ## [0.9.0] - 2021-01-01
+
+        - Beta
+
+        [1.0.0]: https://example.com/releases/v1.0.0
+        """
+    )
+
+
+def test_archive_dry_run(history):
+    assert history.archive(2023, dry_run=True) == {
+        history.archive_path(2022): ["1.1.0"],
+        history.archive_path(2021): ["1.0.0"],
+    }
+    assert history.path.read_text() == HISTORY
+    assert history.archives == []
+
+
+def test_cli_notes(tmp_path, capsys):
+    (tmp_path / "CHANGELOG.md").write_text(
+        "## [Unreleased]\n\n## [0.2.0] - 2022-03-17\n\n- Some changes\n"
+    )
+    cli(["notes", "0.2.0", "-d", str(tmp_path)])
+    assert capsys.readouterr().out == "- Some changes\n"
+    with pytest.raises(SystemExit):
+        cli(["notes", "0.3.0", "-d", str(tmp_path)])
+    assert "No release '0.3.0'" in capsys.readouterr().err
@@ -0,0 +1,55 @@
+import pytest
+
+from molting.classify import Classification, CommitClassifier, Rule
+
+
+@pytest.mark.parametrize(
+    "message,change_type",
+    [
+        ("Fix a bug", None),
+        ("Update the changelog", None),
+        ("Changelog tweaks", None),
+        ("Add a new feature", "minor"),
+        ("Improved the docs", "minor"),
+        ("feat: add parsing", "minor"),
+        ("feat(parser): add parsing", "minor"),
+        ("feat!: drop python 3.7", "major"),
+        ("fix(api)!: rename argument", "major"),
+        ("Fix a bug\n\nBREAKING CHANGE: the API changed", "major"),
+        ("This is a breaking change", "major"),
+    ],
+)
+def test_classify_message(message, change_type):
+    assert CommitClassifier().classify_message(message) == change_type
+
+
+def test_classify_reports_deciding_commit():
+    messages = ["Fix a bug", "feat: one", "feat: two", "Fix another bug"]
+    assert CommitClassifier().classify(messages) == Classification("minor", "feat: one")
+
+
+def test_classify_stops_at_first_major_change():
+    def messages():
+        yield "feat!: breaking"
+        raise AssertionError("Read past the first major change")
+
+    assert CommitClassifier().classify(messages()) == Classification(
+        "major", "feat!: breaking"
+    )
+
+
+def test_classify_default():
+    assert CommitClassifier().classify(["Fix a bug"]) == Classification("patch", None)
+
+
+def test_custom_rules():
+    classifier = CommitClassifier([Rule("minor", r"^\[new\]")], default="patch")
+    assert classifier.classify(["Fix", "[new] Thing"]).change_type == "minor"
+    assert classifier.classify(["Breaking change"]).change_type == "patch"
+    assert CommitClassifier([]).classify(["feat: x"]).change_type == "patch"
+
+
+def test_hints_skip_messages():
+    classifier = CommitClassifier([Rule("minor", r"\w+", ("new",))])
+    assert classifier.classify_message("Fix a bug") is None
+    assert classifier.classify_message("A NEW thing") == "minor"
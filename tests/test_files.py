@@ -0,0 +1,139 @@
+import pytest
+
+from molting import files
+from molting.files import WritePlan, splice_file
+
+
+def test_splice_file(tmp_path, monkeypatch):
+    monkeypatch.setattr("molting.files.COPY_CHUNK_SIZE", 2)
+    path = tmp_path / "file.txt"
+    path.write_text("0123456789")
+    splice_file(path, [(8, 10, b"XY"), (2, 2, b"-"), (4, 6, b"")])
+    assert path.read_text() == "01-2367XY"
+    assert list(tmp_path.iterdir()) == [path]
+
+
+def test_splice_file_overlapping_edits(tmp_path):
+    path = tmp_path / "file.txt"
+    path.write_text("0123456789")
+    with pytest.raises(ValueError, match="Overlapping edits"):
+        splice_file(path, [(2, 5, b""), (4, 6, b"")])
+    assert path.read_text() == "0123456789"
+    assert list(tmp_path.iterdir()) == [path]
+
+
+def test_write_plan_merges_edits(tmp_path, mocker):
+    path = tmp_path / "CHANGELOG.md"
+    path.write_text("## [Unreleased]\n\n- Changes\n")
+    plan = WritePlan()
+    plan.stage(path, [(15, 15, b"\n\n- Notes")])
+    plan.stage(path, [(15, 15, b"\n\n## [0.2.0]"), (26, 26, b"\n[link]")])
+    splice = mocker.spy(files, "splice_file")
+    plan.apply()
+    plan.commit()
+    assert splice.call_count == 1
+    assert path.read_text() == (
+        "## [Unreleased]\n\n## [0.2.0]\n\n- Notes\n\n- Changes\n[link]\n"
+    )
+    assert list(tmp_path.iterdir()) == [path]
+
+
+def test_write_plan_stage_ordered(tmp_path):
+    path = tmp_path / "file.txt"
+    path.write_text("ab")
+    plan = WritePlan()
+    plan.stage(path, [(1, 1, b"first"), (0, 0, b"<")])
+    plan.stage(path, [(1, 1, b"second")])
+    ordered = plan.edits(path)
+    assert ordered == [(0, 0, b"<"), (1, 1, b"second"), (1, 1, b"first")]
+    restaged = WritePlan()
+    restaged.stage_ordered(path, ordered)
+    assert restaged.edits(path) == ordered
+
+
+def test_write_plan_merges_paths_of_the_same_file(tmp_path):
+    (tmp_path / "project").mkdir()
+    path = tmp_path / "common.py"
+    path.write_text('__version__ = "0.1.0"')
+    plan = WritePlan()
+    plan.stage(tmp_path / "project" / ".." / "common.py", [(15, 20, b"0.10.0")])
+    plan.stage(path, [(15, 20, b"0.10.0")])
+    assert plan.paths == [path]
+    assert path in plan
+    assert plan.edits(tmp_path / "project" / ".." / "common.py") == [
+        (15, 20, b"0.10.0")
+    ]
+    with pytest.raises(ValueError, match="Overlapping edits"):
+        plan.stage(path, [(15, 20, b"0.1.1")])
+    with pytest.raises(ValueError, match="Overlapping edits"):
+        plan.stage(path, [(16, 16, b"inside")])
+    plan.stage(path, [(15, 15, b"before"), (20, 20, b"after")])
+    plan.apply()
+    plan.commit()
+    assert path.read_text() == '__version__ = "before0.10.0after"'
+
+
+def test_write_plan_rollback(tmp_path):
+    first = tmp_path / "first.txt"
+    second = tmp_path / "second.txt"
+    first.write_text("first")
+    second.write_text("second")
+    plan = WritePlan()
+    plan.write(first, "FIRST")
+    plan.write(second, "SECOND")
+    plan.apply()
+    assert first.read_text() == "FIRST"
+    plan.rollback()
+    assert first.read_text() == "first"
+    assert second.read_text() == "second"
+    assert sorted(tmp_path.iterdir()) == [first, second]
+
+
+def test_write_plan_rolls_back_failed_apply(tmp_path, mocker):
+    first = tmp_path / "first.txt"
+    second = tmp_path / "second.txt"
+    first.write_text("first")
+    second.write_text("second")
+    plan = WritePlan()
+    plan.write(first, "FIRST")
+    plan.write(second, "SECOND")
+
+    def splice_first(path, edits, backup):
+        if path != first:
+            raise OSError("disk full")
+        splice_file(path, edits, backup)
+
+    mocker.patch.object(files, "splice_file", side_effect=splice_first)
+    with pytest.raises(OSError, match="disk full"):
+        plan.apply()
+    assert first.read_text() == "first"
+    assert second.read_text() == "second"
+
+
+def test_write_plan_refuses_changed_files(tmp_path):
+    path = tmp_path / "file.txt"
+    path.write_text("original")
+    plan = WritePlan()
+    plan.write(path, "planned")
+    path.write_text("changed elsewhere")
+    with pytest.raises(ValueError, match="changed since its edits were staged"):
+        plan.apply()
+    assert path.read_text() == "changed elsewhere"
+
+
+def test_write_plan_to_dict(tmp_path):
+    path = tmp_path / "file.txt"
+    path.write_text("0123456789")
+    write_plan = WritePlan()
+    write_plan.stage(path, [(2, 4, b"ab")])
+    stat_result = path.stat()
+    assert write_plan.to_dict() == {
+        "files": [
+            {
+                "path": str(path),
+                "mtime_ns": stat_result.st_mtime_ns,
+                "size": 10,
+                "edits": [{"start": 2, "end": 4, "text": "ab"}],
+            }
+        ]
+    }
@@ -0,0 +1,93 @@
+from subprocess import CalledProcessError
+
+import pytest
+
+import molting.git
+from conftest import git
+from molting.git import Git
+from molting.main import get_commit_messages
+
+
+def test_resolve(git_repository):
+    with Git(git_repository) as repository:
+        assert repository.resolve("HEAD") == git(git_repository, "rev-parse", "HEAD")
+        assert repository.resolve("v0.1.0") == git(
+            git_repository, "rev-parse", "v0.1.0"
+        )
+        assert repository.resolve("v9.9.9") is None
+        assert repository.spawn_count == 1
+
+
+def test_read_object(git_repository):
+    with Git(git_repository) as repository:
+        object_type, contents = repository.read_object("HEAD")
+        assert object_type == "commit"
+        assert contents.endswith(b"\n\nImprove the docs\n")
+        assert repository.read_object("v9.9.9") == (None, None)
+        assert repository.spawn_count == 1
+
+
+def test_resolve_outside_repository(tmp_path):
+    with Git(tmp_path) as repository:
+        assert repository.resolve("HEAD") is None
+
+
+@pytest.mark.parametrize("read_objects,spawn_count", [(True, 0), (False, 2)])
+def test_get_commit_messages(git_repository, read_objects, spawn_count):
+    with Git(git_repository, read_objects=read_objects) as repository:
+        messages = get_commit_messages("v0.1.0", git=repository)
+        assert messages == [
+            "Improve the docs",
+            "Fix a bug",
+            "With a longer description.",
+        ]
+        assert repository.spawn_count == spawn_count
+
+
+def test_get_commit_messages_without_tag(git_repository):
+    with Git(git_repository) as repository:
+        messages = get_commit_messages("v9.9.9", git=repository)
+    assert messages[-1] == "Add the first feature"
+
+
+def test_stream(git_repository):
+    with Git(git_repository) as repository:
+        records = list(repository.stream("log", "-z", "--format=%s"))
+        assert [record.lstrip(b"\n") for record in records] == [
+            b"Improve the docs",
+            b"Fix a bug",
+            b"Add the first feature",
+            b"Initial commit",
+        ]
+
+
+def test_stream_stops_process_when_closed(git_repository, mocker):
+    popen = mocker.spy(molting.git, "Popen")
+    with Git(git_repository) as repository:
+        records = repository.stream("log", "--format=%s", separator=b"\n")
+        assert next(records) == b"Improve the docs"
+        records.close()
+        process = popen.spy_return
+        assert process.returncode is not None
+        assert process.stdout.closed
+
+
+def test_stream_failure(git_repository):
+    with Git(git_repository) as repository:
+        with pytest.raises(CalledProcessError):
+            list(repository.stream("log", "v9.9.9"))
+        assert list(repository.stream("log", "v9.9.9", check=False)) == []
+
+
+def test_git_directory(git_repository, tmp_path):
+    subdirectory = git_repository / "src"
+    subdirectory.mkdir()
+    with Git(subdirectory) as repository:
+        assert repository.git_directory == git_repository / ".git"
+        assert repository.spawn_count == 0
+    worktree = tmp_path / "worktree"
+    git(git_repository, "worktree", "add", "-q", str(worktree))
+    with Git(worktree) as repository:
+        # Linked worktrees share the git directory of the main one
+        assert repository.git_directory.resolve() == git_repository / ".git"
+        assert not repository.is_shallow
@@ -0,0 +1,123 @@
+import pytest
+
+from conftest import git, release_steps
+from molting.github import GitHubClient, GitHubError, get_client, repository_from_url
+from molting.publish import github_release_step, publish
+
+
+@pytest.fixture
+def client(fake_github):
+    client = GitHubClient("secret", fake_github.url, backoff=0)
+    yield client
+    client.close()
+
+
+def test_create_releases_over_pooled_connections(client, fake_github):
+    for number in range(5):
+        client.create_release("lucasmelin/project", f"v0.{number}.0", f"- {number}")
+    assert [release["body"] for release in fake_github.releases] == [
+        "- 0",
+        "- 1",
+        "- 2",
+        "- 3",
+        "- 4",
+    ]
+    assert client.pool.opened == fake_github.connections == 1
+
+
+def test_long_notes_are_sent_in_the_body(client, fake_github):
+    notes = "- A change\n" * 100_000
+    client.create_release("lucasmelin/project", "v0.2.0", notes)
+    assert fake_github.releases[0]["body"] == notes
+
+
+def test_retries_server_errors(client, fake_github):
+    fake_github.failures = [
+        (503, {"message": "Unavailable"}),
+        (429, {"message": "Slow down"}, [("Retry-After", "0")]),
+    ]
+    client.create_release("lucasmelin/project", "v0.2.0", "- Notes")
+    assert [request[0] for request in fake_github.requests] == ["POST"] * 3
+    assert len(fake_github.releases) == 1
+
+
+def test_retried_release_already_created(client, fake_github):
+    client.create_release("lucasmelin/project", "v0.2.0", "- Notes")
+    # As if the first attempt was created, but its response lost
+    fake_github.failures = [(502, {"message": "Bad gateway"})]
+    fake_github.releases[0]["html_url"] = "https://github.com/releases/v0.2.0"
+    release = client.create_release("lucasmelin/project", "v0.2.0", "- Notes")
+    assert release["html_url"] == "https://github.com/releases/v0.2.0"
+
+
+def test_gives_up_after_retries(client, fake_github):
+    fake_github.failures = [(500, {"message": "Oops"})] * 4
+    with pytest.raises(GitHubError, match=r"failed \(500\)") as error:
+        client.create_release("lucasmelin/project", "v0.2.0", "- Notes")
+    assert error.value.status == 500
+    assert len(fake_github.requests) == client.retries + 1
+
+
+def test_client_errors_are_not_retried(fake_github):
+    client = GitHubClient("wrong", fake_github.url, backoff=0)
+    with pytest.raises(GitHubError, match="Bad credentials"):
+        client.create_release("lucasmelin/project", "v0.2.0", "- Notes")
+    assert len(fake_github.requests) == 1
+
+
+def test_verify_tag(client):
+    with pytest.raises(GitHubError, match="isn't on GitHub"):
+        client.create_release("lucasmelin/project", "v9.9.9", "", verify_tag=True)
+    client.create_release("lucasmelin/project", "v0.1.0", "", verify_tag=True)
+
+
+def test_publish_releases_through_the_api(
+    git_repository, remote_repository, fake_github, stub_gh
+):
+    (git_repository / "VERSION").write_text("0.2.0")
+    steps = release_steps(
+        [("first-v0.2.0", "- First"), ("second-v1.0.0", "- Second")], "Bump versions"
+    )
+    publish(steps, git_repository, dry_run=False)
+    assert sorted(release["tag_name"] for release in fake_github.releases) == [
+        "first-v0.2.0",
+        "second-v1.0.0",
+    ]
+    assert not stub_gh.exists()
+    # The client, and its connections, are shared by the next releases
+    assert get_client() is get_client()
+    opened = get_client().pool.opened
+    publish([github_release_step("v0.1.0", "- Notes")], git_repository, False)
+    assert get_client().pool.opened == opened
+
+
+def test_gh_when_configured(git_repository, fake_github, stub_gh, monkeypatch):
+    monkeypatch.setenv("MOLTING_GITHUB_CLIENT", "gh")
+    assert get_client() is None
+    publish([github_release_step("v0.1.0", "- Notes")], git_repository, False)
+    assert fake_github.requests == []
+    assert stub_gh.read_text().startswith("release create v0.1.0")
+
+
+@pytest.mark.parametrize(
+    "url,repository",
+    [
+        ("git@github.com:lucasmelin/molting.git", "lucasmelin/molting"),
+        ("https://github.com/lucasmelin/molting", "lucasmelin/molting"),
+        ("https://github.com/lucasmelin/molting.git", "lucasmelin/molting"),
+        ("ssh://git@github.com/lucasmelin/molting.git", "lucasmelin/molting"),
+        ("/tmp/remote.git", None),
+    ],
+)
+def test_repository_from_url(url, repository):
+    assert repository_from_url(url) == repository
+
+
+def test_repository_from_remote(client, git_repository, monkeypatch):
+    monkeypatch.delenv("GITHUB_REPOSITORY")
+    with pytest.raises(GitHubError, match="isn't a GitHub repository"):
+        client.get_repository(git_repository)
+    git_url = "git@github.com:lucasmelin/molting.git"
+    git(git_repository, "remote", "set-url", "origin", git_url)
+    other = GitHubClient("secret", client.api_url)
+    assert other.get_repository(git_repository) == "lucasmelin/molting"
@@ -0,0 +1,176 @@
+import json
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from conftest import commit, git
+from molting.classify import CommitClassifier, Rule
+from molting.git import Git
+from molting.history import CommitScanCache, iter_commits
+from molting.main import Project, get_commit_messages, guess_change_type
+
+
+@pytest.fixture(params=[True, False], ids=["in-process", "git"])
+def scans(git_repository, request):
+    with Git(git_repository, read_objects=request.param) as repository:
+        yield CommitScanCache(repository)
+
+
+def scan_head(scans):
+    return scans.scan(scans.git.resolve("v0.1.0"), scans.git.resolve("HEAD"))
+
+
+def test_scan_is_saved_in_git_directory(scans, git_repository):
+    scan = scan_head(scans)
+    assert scan.messages == get_commit_messages("v0.1.0", git=scans.git)
+    saved = json.loads(
+        (git_repository / ".git" / "molting" / "commit-scan.json").read_text()
+    )
+    (entry,) = saved["scans"]
+    assert entry["head"] == git(git_repository, "rev-parse", "HEAD")
+    assert len(entry["commits"]) == 2
+    assert git(git_repository, "status", "--porcelain") == ""
+
+
+def test_scan_reuses_saved_scan(scans, mocker):
+    scan = scan_head(scans)
+    read = mocker.spy(scans, "_iter_messages")
+    assert scan_head(scans) == scan
+    read.assert_not_called()
+
+
+def test_scan_reads_only_new_commits(scans, git_repository, mocker):
+    first = scan_head(scans)
+    commit(git_repository, "feat: Add a feature")
+    read = mocker.spy(scans, "_iter_messages")
+    scan = scan_head(scans)
+    read.assert_called_once_with(first.head, scan.head)
+    assert scan.messages == ["feat: Add a feature", *first.messages]
+    assert scans.classify(scan).change_type == "minor"
+
+
+def test_scans_from_several_releases_are_kept(scans, git_repository, monkeypatch):
+    monkeypatch.setattr("molting.history.MAX_SAVED_SCANS", 2)
+    head = scans.git.resolve("HEAD")
+    starts = [git(git_repository, "rev-parse", f"HEAD~{n}") for n in (1, 2, 3)]
+    with ThreadPoolExecutor(2) as executor:
+        list(executor.map(lambda start: scans.scan(start, head), starts[:2]))
+    assert {scans.load(start).start for start in starts[:2]} == set(starts[:2])
+    scans.scan(starts[2], head)
+    # The least recently saved scan is evicted
+    kept = [scans.load(start) is not None for start in starts]
+    assert kept.count(True) == 2 and kept[2]
+    assert list((git_repository / ".git" / "molting").iterdir()) == [scans.path]
+
+
+def test_scan_rebuilds_after_history_rewrite(scans, git_repository):
+    scan_head(scans)
+    git(git_repository, "reset", "-q", "--hard", "HEAD~1")
+    commit(git_repository, "Fix another bug")
+    scan = scan_head(scans)
+    assert scan.messages == [
+        "Fix another bug",
+        "Fix a bug",
+        "With a longer description.",
+    ]
+    assert scan.messages == get_commit_messages("v0.1.0", git=scans.git)
+
+
+def test_scan_rebuilds_for_other_classifier(scans, mocker):
+    scan_head(scans)
+    other = CommitClassifier([Rule("major", r"docs")])
+    other_scans = CommitScanCache(scans.git, other)
+    read = mocker.spy(other_scans, "_iter_messages")
+    scan = other_scans.scan(scans.git.resolve("v0.1.0"), scans.git.resolve("HEAD"))
+    assert read.called
+    assert other_scans.classify(scan) == ("major", "Improve the docs")
+
+
+def test_scan_ignores_corrupt_cache(scans, git_repository):
+    path = git_repository / ".git" / "molting" / "commit-scan.json"
+    path.parent.mkdir()
+    path.write_text("{not json")
+    assert scan_head(scans).messages == get_commit_messages("v0.1.0", git=scans.git)
+
+
+@pytest.mark.parametrize(
+    "messages",
+    [
+        ["Fix a bug", "Improve the docs", "feat!: Drop Python 3.6"],
+        ["Fix a bug", "Fix another bug"],
+        ["Change the defaults\n\nBREAKING CHANGE: it breaks", "feat: Add"],
+    ],
+)
+def test_classify_matches_guess_change_type(git_repository, messages):
+    for message in messages:
+        commit(git_repository, message)
+    project = Project(git_repository, dry_run=True)
+    lines = get_commit_messages("v0.1.0", git=project.git)
+    assert project.guess_change_type("v0.1.0") == guess_change_type(lines)
+    assert project.get_commit_messages("v0.1.0") == lines
+    project.git.close()
+
+
+def test_project_scan_starts_no_git(git_repository, mocker, monkeypatch):
+    monkeypatch.setenv("MOLTING_READ_OBJECTS", "1")
+    git(git_repository, "tag", "-a", "-m", "Release 0.1.1", "v0.1.1", "HEAD~1")
+    project = Project(git_repository, dry_run=True)
+    spawn = mocker.spy(Git, "record_spawn")
+    assert project.guess_change_type("v0.1.1") == "minor"
+    assert project.get_commit_messages("v0.1.1") == ["Improve the docs"]
+    spawn.assert_not_called()
+    project.git.close()
+
+
+def test_scan_falls_back_to_git_while_reading(git_repository, mocker):
+    from molting.objects import GitReader, UnsupportedRepository
+
+    read_range = GitReader.read_range
+
+    def give_up(self, start, end):
+        commits = read_range(self, start, end)
+        yield next(commits)
+        raise UnsupportedRepository("Unreadable object")
+
+    mocker.patch.object(GitReader, "read_range", give_up)
+    with Git(git_repository, read_objects=True) as repository:
+        scan = CommitScanCache(repository).scan(
+            repository.resolve("v0.1.0"), repository.resolve("HEAD")
+        )
+    assert scan.messages == [
+        "Improve the docs",
+        "Fix a bug",
+        "With a longer description.",
+    ]
+
+
+def test_iter_commits(git_repository):
+    commit(
+        git_repository,
+        "feat: Add a parser\nthat is fast\n\nIt parses.\n\n"
+        "Signed-off-by: Molting <m@example.com>",
+    )
+    with Git(git_repository) as repository:
+        newest, *others = iter_commits(repository, "v0.1.0..HEAD")
+    assert newest.sha == git(git_repository, "rev-parse", "HEAD")
+    assert newest.subject == "feat: Add a parser that is fast"
+    assert newest.body == "It parses.\n\nSigned-off-by: Molting <m@example.com>"
+    assert newest.trailers == (("Signed-off-by", "Molting <m@example.com>"),)
+    assert [other.subject for other in others] == ["Improve the docs", "Fix a bug"]
+    assert others[1].body == "With a longer description."
+    assert others[1].trailers == ()
+
+
+def test_scan_stops_at_major_change(scans, git_repository):
+    commit(git_repository, "feat!: Drop the old API")
+    commit(git_repository, "Fix a typo")
+    partial = scans.scan(
+        scans.git.resolve("v0.1.0"), scans.git.resolve("HEAD"), complete=False
+    )
+    assert not partial.complete
+    assert partial.messages == ["Fix a typo", "feat!: Drop the old API"]
+    assert scans.classify(partial) == ("major", "feat!: Drop the old API")
+    # A partial scan answers later classifications, but not message lists
+    assert scans.load(partial.start) == partial
+    assert scan_head(scans).messages == get_commit_messages("v0.1.0", git=scans.git)
+    assert scans.load(partial.start).complete
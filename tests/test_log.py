@@ -0,0 +1,43 @@
+import io
+import sys
+
+import pytest
+
+from molting import log
+from molting.log import logger
+
+
+@pytest.fixture
+def sink(monkeypatch):
+    monkeypatch.setattr(log, "_threshold", 0)
+    monkeypatch.setattr(log, "_sink", None)
+    monkeypatch.setattr(log, "_level", None)
+    stream = io.StringIO()
+    yield stream
+    loguru_logger = log._get_loguru()
+    loguru_logger.remove()
+    loguru_logger.add(sys.stderr)
+
+
+def fail():
+    raise AssertionError("Evaluated a filtered message")
+
+
+def test_messages_below_level_are_not_formatted(sink):
+    log.configure("warning", sink)
+    # Formatting a string with `:d` would raise
+    logger.debug("Found {:d}", "text")
+    logger.opt(lazy=True).info("Found {}", fail)
+    assert sink.getvalue() == ""
+    assert not log.is_enabled("INFO")
+    assert log.is_enabled("ERROR")
+
+
+def test_messages_at_level_are_emitted(sink):
+    log.configure("info", sink)
+    logger.info("Found {!r} in {}", "name", "pyproject.toml")
+    logger.opt(lazy=True).warning("Computed {}", lambda: 42)
+    lines = sink.getvalue().splitlines()
+    assert lines[0].endswith("Found 'name' in pyproject.toml")
+    assert "test_log:test_messages_at_level_are_emitted" in lines[0]
+    assert lines[1].endswith("Computed 42")
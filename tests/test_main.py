@@ -1,14 +1,22 @@
 import datetime
+import json
 import textwrap
+from pathlib import Path
+from subprocess import CalledProcessError
 
 import pytest
 
+from conftest import git, make_project
+from molting import files, main
 from molting.main import (
     Project,
+    bump,
+    bump_projects,
     combine_items,
     guess_change_type,
     increase_version_number,
 )
+from molting.targets import VersionTargetIndex
 
 
 @pytest.mark.parametrize(
@@ -242,6 +250,22 @@ def test_update_pyproject(tmp_path):
     assert pyproject.read_text() == f'version = "{expected_version}"'
 
 
+def test_update_pyproject_only_rewrites_project_version(tmp_path):
+    pyproject = tmp_path / "pyproject.toml"
+    text = textwrap.dedent(
+        """\
+        [tool.poetry]
+        version = "0.1.0"
+
+        [tool.poetry.dependencies]
+        coverage = {extras = ["toml"], version = "0.1.0"}
+        """
+    )
+    pyproject.write_text(text)
+    Project(tmp_path, dry_run=False).update_pyproject("0.2.0")
+    assert pyproject.read_text() == text.replace('"0.1.0"\n\n', '"0.2.0"\n\n')
+
+
 def test_update_pyproject_dry_run(tmp_path):
     old_version = "0.1.0"
     pyproject = tmp_path / "pyproject.toml"
@@ -324,3 +348,167 @@ def test_guess_change_type_major():
     messages = ["Add something new", "Fix a bug", "New feature", "Breaking change"]
     change_type = guess_change_type(messages)
     assert change_type == "major"
+
+
+def test_bump_projects(tmp_path, mocker):
+    mocker.patch("molting.main.get_commit_messages", return_value=["Fix a bug"])
+    publish_mock = mocker.patch("molting.main.publish")
+    make_project(tmp_path / "first", "first", "0.1.0")
+    make_project(tmp_path / "second", "second", "1.2.0")
+    results = bump_projects(
+        [tmp_path / "first", tmp_path / "second"], dry_run=False, max_workers=2
+    )
+    assert [(r.old_version, r.version) for r in results] == [
+        ("0.1.0", "0.1.1"),
+        ("1.2.0", "1.2.1"),
+    ]
+    assert 'version = "1.2.1"' in (tmp_path / "second" / "pyproject.toml").read_text()
+    init = tmp_path / "first" / "src" / "first" / "__init__.py"
+    assert init.read_text() == '__version__ = "0.1.1"'
+    commands = [
+        step.command for call in publish_mock.call_args_list for step in call.args[0]
+    ]
+    assert ["git", "tag", "first-v0.1.1"] in commands
+    assert ["git", "tag", "second-v1.2.1"] in commands
+    assert [command[:2] for command in commands].count(["git", "commit"]) == 1
+    assert [command[:2] for command in commands].count(["git", "push"]) == 1
+    assert [command[:2] for command in commands].count(["gh", "release"]) == 2
+
+
+def test_bump_projects_shares_the_jobs_budget(tmp_path, mocker):
+    mocker.patch("molting.main.get_commit_messages", return_value=["Fix a bug"])
+    mocker.patch("molting.main.publish")
+    run_phases = mocker.spy(main, "run_phases")
+    rewrite = mocker.spy(VersionTargetIndex, "rewrite")
+    for name in ("first", "second", "third"):
+        make_project(tmp_path / name, name, "0.1.0")
+    directories = [tmp_path / "first", tmp_path / "second"]
+    bump_projects(directories, dry_run=True, max_workers=2)
+    # Both projects are bumped at once, each with a single thread
+    assert [call.args[1] for call in run_phases.call_args_list] == [1, 1]
+    assert [call.kwargs["max_workers"] for call in rewrite.call_args_list] == [1, 1]
+    run_phases.reset_mock()
+    bump_projects([tmp_path / "third"], dry_run=True, max_workers=4)
+    assert [call.args[1] for call in run_phases.call_args_list] == [4]
+
+
+@pytest.mark.parametrize(
+    "versions,expected",
+    [(("0.1.0", "0.1.0"), "0.1.1"), (("0.9.9", "0.1.0"), None)],
+)
+def test_bump_projects_with_shared_version_target(tmp_path, mocker, versions, expected):
+    mocker.patch("molting.main.get_commit_messages", return_value=["Fix a bug"])
+    mocker.patch("molting.main.publish")
+    common = tmp_path / "common.py"
+    common.write_text('__version__ = "0.1.0"\nx = 1\n')
+    make_project(tmp_path / "first", "first", versions[0])
+    make_project(tmp_path / "second", "second", versions[1])
+    directories = [tmp_path / "first", tmp_path / "second"]
+    targets = [Path("../common.py")]
+    if expected is None:
+        # Bumped to 0.9.10 and 0.1.1, the shared file can't hold both
+        with pytest.raises(ValueError, match="Overlapping edits"):
+            bump_projects(directories, dry_run=False, version_targets=targets)
+        assert common.read_text() == '__version__ = "0.1.0"\nx = 1\n'
+        pyproject = (tmp_path / "first" / "pyproject.toml").read_text()
+        assert f'version = "{versions[0]}"' in pyproject
+    else:
+        bump_projects(directories, dry_run=False, version_targets=targets)
+        assert common.read_text() == f'__version__ = "{expected}"\nx = 1\n'
+
+
+def test_pyproject_document_is_cached(tmp_path, mocker):
+    pyproject = tmp_path / "pyproject.toml"
+    pyproject.write_text(
+        'name = "example"\nversion = "0.1.0"\nrepository = "https://example.com"\n'
+    )
+    project = Project(tmp_path, dry_run=False)
+    read_bytes = mocker.spy(Path, "read_bytes")
+    assert project.get_name() == "example"
+    assert project.get_version() == "0.1.0"
+    assert project.get_repository() == "https://example.com/"
+    assert read_bytes.call_count == 1
+
+
+def test_pyproject_document_reloads_after_changes(tmp_path):
+    pyproject = tmp_path / "pyproject.toml"
+    pyproject.write_text('version = "0.1.0"')
+    project = Project(tmp_path, dry_run=False)
+    assert project.get_version() == "0.1.0"
+    pyproject.write_text('version = "0.10.0"')
+    assert project.get_version() == "0.10.0"
+    project.update_pyproject("0.11.0")
+    assert project.get_version() == "0.11.0"
+
+
+def test_bump_writes_each_file_once(tmp_path, mocker):
+    mocker.patch("molting.main.get_commit_messages", return_value=["Fix a bug"])
+    mocker.patch("molting.main.publish")
+    splice = mocker.spy(files, "splice_file")
+    make_project(tmp_path, "project", "0.1.0")
+    bump(tmp_path, dry_run=False)
+    written = [call.args[0] for call in splice.call_args_list]
+    assert sorted(written) == sorted(
+        [
+            tmp_path / "CHANGELOG.md",
+            tmp_path / "pyproject.toml",
+            tmp_path / "src" / "project" / "__init__.py",
+        ]
+    )
+
+
+def test_bump_restores_files_when_commit_fails(tmp_path, mocker):
+    mocker.patch("molting.main.get_commit_messages", return_value=["Fix a bug"])
+    mocker.patch(
+        "molting.main.publish", side_effect=CalledProcessError(1, ["git", "commit"])
+    )
+    make_project(tmp_path, "project", "0.1.0")
+    originals = {path: path.read_text() for path in tmp_path.rglob("*.*")}
+    with pytest.raises(CalledProcessError):
+        bump(tmp_path, dry_run=False)
+    assert {path: path.read_text() for path in tmp_path.rglob("*.*")} == originals
+
+
+def test_bump_commits_only_project_files(git_repository, remote_repository, stub_gh):
+    make_project(git_repository, "project", "0.1.0")
+    git(git_repository, "add", ".")
+    git(git_repository, "commit", "-q", "-m", "Fix the packaging")
+    bump(git_repository, dry_run=False)
+    changed = git(git_repository, "show", "--name-only", "--format=", "HEAD")
+    assert changed.split() == [
+        "CHANGELOG.md",
+        "pyproject.toml",
+        "src/project/__init__.py",
+    ]
+    assert git(git_repository, "status", "--porcelain") == ""
+    assert git(remote_repository, "tag", "--list", "v0.2.0") == "v0.2.0"
+
+
+def test_get_previous_release(git_repository):
+    git(git_repository, "tag", "v0.0.1", "HEAD~2")
+    project = Project(git_repository, dry_run=True)
+    # pyproject.toml is ahead of the latest release
+    assert project.get_previous_release("0.3.0") == "v0.1.0"
+    assert project.get_previous_release("0.1.0") == "v0.1.0"
+    assert project.get_previous_release("0.0.5") == "v0.0.1"
+    assert project.get_previous_release("0.0.0") == "v0.0.0"
+    project.git.close()
+
+
+def test_bump_dry_run_prints_diff(tmp_path, mocker, capsys):
+    mocker.patch("molting.main.get_commit_messages", return_value=["Fix a bug"])
+    make_project(tmp_path, "project", "0.1.0")
+    originals = {path: path.read_text() for path in tmp_path.rglob("*.*")}
+    plan_file = tmp_path.parent / "plan.json"
+    mocker.patch("molting.preview.Path.cwd", return_value=tmp_path)
+    bump(tmp_path, dry_run=True, plan_file=plan_file)
+    assert {path: path.read_text() for path in tmp_path.rglob("*.*")} == originals
+    output = capsys.readouterr().out
+    assert '-version = "0.1.0"\n+version = "0.1.1"\n' in output
+    assert "+++ b/src/project/__init__.py\n" in output
+    plan = json.loads(plan_file.read_text())
+    assert sorted(Path(entry["path"]).name for entry in plan["files"]) == [
+        "CHANGELOG.md",
+        "__init__.py",
+        "pyproject.toml",
+    ]
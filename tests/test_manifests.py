@@ -0,0 +1,137 @@
+import textwrap
+
+import pytest
+
+from molting.manifests import (
+    INIT_FORMAT,
+    PYPROJECT_FORMAT,
+    VERSION_FORMATS,
+    locate_cargo_version,
+    locate_package_json_version,
+    locate_plain_version,
+    locate_pyproject_version,
+    locate_setup_cfg_version,
+)
+
+
+def versions(locate, text):
+    data = textwrap.dedent(text).encode("utf-8")
+    return [
+        (span.version, data[span.start : span.end].decode("utf-8"))
+        for span in locate(data)
+    ]
+
+
+def test_pyproject_poetry_table():
+    text = """\
+        [build-system]
+        version = "9.9.9"
+
+        [tool.poetry]
+        name = "ünïcode"
+        version_scheme = "semver"
+        version = "0.3.1"
+
+        [tool.poetry.dependencies]
+        coverage = {extras = ["toml"], version = "^6.3.2"}
+        """
+    assert versions(locate_pyproject_version, text) == [("0.3.1", "0.3.1")]
+
+
+def test_pyproject_project_and_poetry_tables():
+    text = """\
+        [project] # PEP 621
+        name = "example"
+        version = '1.0.0'
+        dependencies = ["requests"]
+
+        [project.optional-dependencies]
+        version = "2.0.0"
+
+        [tool.poetry]
+        version = "1.0.0"
+        """
+    assert versions(locate_pyproject_version, text) == [
+        ("1.0.0", "1.0.0"),
+        ("1.0.0", "1.0.0"),
+    ]
+
+
+@pytest.mark.parametrize(
+    "text,expected",
+    [
+        ('name = "example"\nversion = "0.1.0"\n', [("0.1.0", "0.1.0")]),
+        ('version = "0.1.0"\r\n[tool.black]\n', [("0.1.0", "0.1.0")]),
+        ('[tool.black]\nversion = "22.12"\n', []),
+        ('[project]\ndynamic = ["version"]\n', []),
+    ],
+)
+def test_pyproject_root_table(text, expected):
+    assert versions(locate_pyproject_version, text) == expected
+
+
+def test_cargo_package_table():
+    text = """\
+        [package]
+        name = "example"
+        version = "0.4.0"
+
+        [dependencies]
+        serde = { version = "1.0" }
+        """
+    assert versions(locate_cargo_version, text) == [("0.4.0", "0.4.0")]
+    assert versions(locate_cargo_version, "[package]\nversion.workspace = true\n") == []
+
+
+@pytest.mark.parametrize(
+    "text,expected",
+    [
+        ("[metadata]\nname = example\nversion = 1.2.3  \n", [("1.2.3", "1.2.3")]),
+        ("[metadata]\nversion: 1.2.3\n", [("1.2.3", "1.2.3")]),
+        ("[metadata]\nversion = attr: example.__version__\n", []),
+        ("[options]\nversion = 1.2.3\n", []),
+    ],
+)
+def test_setup_cfg_metadata_section(text, expected):
+    assert versions(locate_setup_cfg_version, text) == expected
+
+
+def test_package_json_top_level_version():
+    text = """\
+        {
+          "name": "version",
+          "engines": {"node": ">=16", "version": "0.0.1"},
+          "files": ["version", {"version": "9"}],
+          "description": "Sets \\"version\\": \\"0.0.2\\"",
+          "version" : "2.0.0-beta.1",
+          "dependencies": {"version": "^1.0.0"}
+        }
+        """
+    assert versions(locate_package_json_version, text) == [
+        ("2.0.0-beta.1", "2.0.0-beta.1")
+    ]
+    assert versions(locate_package_json_version, '{"version": 1}') == []
+    assert versions(locate_package_json_version, '{"name": "example"}') == []
+
+
+def test_plain_version_file():
+    assert versions(locate_plain_version, "  1.0.0\n") == [("1.0.0", "1.0.0")]
+    assert versions(locate_plain_version, "\n") == []
+    assert versions(locate_plain_version, "1.0.0\n2.0.0\n") == []
+
+
+def test_edits_patch_only_versions():
+    data = b'[tool.poetry]\nversion = "0.1.0"\n'
+    spans = PYPROJECT_FORMAT.locate(data)
+    assert PYPROJECT_FORMAT.edits(spans, "0.2.0") == [(25, 30, b"0.2.0")]
+    assert PYPROJECT_FORMAT.edits(spans, "0.1.0") == []
+    data = b"__version__ = '0.1.0'\n"
+    assert INIT_FORMAT.edits(INIT_FORMAT.locate(data), "0.2.0") == [
+        (0, 21, b'__version__ = "0.2.0"')
+    ]
+    assert sorted(VERSION_FORMATS) == [
+        "Cargo.toml",
+        "VERSION",
+        "package.json",
+        "setup.cfg",
+    ]
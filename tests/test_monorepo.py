@@ -0,0 +1,151 @@
+import pytest
+
+from conftest import git, make_project
+from molting.git import Git
+from molting.main import bump_projects
+from molting.monorepo import PackageTrie, iter_changes, scan_packages
+
+
+def change(directory, message, *paths):
+    for path in paths:
+        target = directory / path
+        target.parent.mkdir(parents=True, exist_ok=True)
+        target.write_text(f"{message}\n{target.read_text() if target.exists() else ''}")
+    git(directory, "add", "-A")
+    git(directory, "commit", "-q", "-m", message)
+    return git(directory, "rev-parse", "HEAD")
+
+
+@pytest.fixture
+def monorepo(git_repository):
+    """Packages `a`, `a/sub` and `b`, released from different commits."""
+    change(git_repository, "Add a", "packages/a/file")
+    change(git_repository, "Add sub", "packages/a/sub/file")
+    git(git_repository, "tag", "a-v0.1.0")
+    change(git_repository, "Add b", "packages/b/file", "README.md")
+    git(git_repository, "tag", "b-v0.1.0")
+    change(git_repository, "Fix a", "packages/a/file")
+    change(git_repository, "feat: Improve b", "packages/b/file")
+    git(git_repository, "checkout", "-q", "-b", "branch", "HEAD~1")
+    change(git_repository, "Breaking change to sub", "packages/a/sub/file")
+    git(git_repository, "checkout", "-q", "main")
+    git(git_repository, "merge", "-q", "--no-ff", "-m", "Merge branch", "branch")
+    git(git_repository, "mv", "packages/a/file", "packages/b/moved")
+    git(git_repository, "commit", "-q", "-m", "Move a file from a to b")
+    return git_repository
+
+
+def subjects(history):
+    return [commit.lines[0] for commit in history.scan.commits]
+
+
+def test_package_trie():
+    trie = PackageTrie(["packages/a", "packages/a/sub/", "packages/b"])
+    assert trie.match("packages/a/file") == "packages/a"
+    assert trie.match("packages/a/sub/deep/file") == "packages/a/sub"
+    assert trie.match("packages/a/subway/file") == "packages/a"
+    assert trie.match("packages/b") is None
+    assert trie.match("README.md") is None
+    trie.add("")
+    assert trie.match("README.md") == ""
+    assert trie.match("packages/c/file") == ""
+
+
+def test_iter_changes(monorepo):
+    with Git(monorepo) as repository:
+        changes = list(iter_changes(repository, "HEAD", "^HEAD~2"))
+    assert [(message, paths) for _, _, message, paths in changes] == [
+        ("Move a file from a to b\n", ["packages/a/file", "packages/b/moved"]),
+        ("Merge branch\n", []),
+        ("Breaking change to sub\n", ["packages/a/sub/file"]),
+    ]
+
+
+def test_scan_packages(monorepo):
+    with Git(monorepo) as repository:
+        starts = {
+            "packages/a": repository.resolve("a-v0.1.0"),
+            "packages/a/sub": repository.resolve("a-v0.1.0"),
+            "packages/b": repository.resolve("b-v0.1.0"),
+            "": None,
+        }
+        histories = scan_packages(repository, starts, repository.resolve("HEAD"))
+    assert subjects(histories["packages/a"]) == ["Move a file from a to b", "Fix a"]
+    assert histories["packages/a"].classification.change_type == "patch"
+    assert subjects(histories["packages/a/sub"]) == ["Breaking change to sub"]
+    assert histories["packages/a/sub"].classification.change_type == "major"
+    assert subjects(histories["packages/b"]) == [
+        "Move a file from a to b",
+        "feat: Improve b",
+    ]
+    assert histories["packages/b"].classification == (
+        "minor",
+        "feat: Improve b",
+    )
+    # Never released, so every commit touching it
+    assert subjects(histories[""]) == ["Add b"]
+
+
+@pytest.mark.parametrize(
+    "package,tag", [("packages/a", "a-v0.1.0"), ("packages/b", "b-v0.1.0")]
+)
+def test_scan_packages_matches_git_log(monorepo, package, tag):
+    with Git(monorepo) as repository:
+        start = repository.resolve(tag)
+        histories = scan_packages(
+            repository, {package: start}, repository.resolve("HEAD")
+        )
+    expected = git(
+        monorepo, "log", "--format=%H", "--no-renames", f"{tag}..HEAD", "--", package
+    )
+    assert [commit.sha for commit in histories[package].scan.commits] == (
+        expected.split()
+    )
+
+
+def test_bump_monorepo(monorepo, mocker):
+    publish = mocker.patch("molting.main.publish")
+    make_project(monorepo / "packages" / "a", "a", "0.1.0", notes="")
+    make_project(monorepo / "packages" / "b", "b", "0.1.0", notes="")
+    git(monorepo, "add", "-A")
+    git(monorepo, "commit", "-q", "-m", "chore: Add the package files")
+    spawn = mocker.spy(Git, "record_spawn")
+    results = bump_projects(
+        [monorepo / "packages" / "a", monorepo / "packages" / "b"],
+        dry_run=True,
+        monorepo=True,
+    )
+    # The breaking change to `packages/a/sub` belongs to `packages/a`
+    assert [(r.old_version, r.version) for r in results] == [
+        ("0.1.0", "1.0.0"),
+        ("0.1.0", "0.2.0"),
+    ]
+    assert "Breaking change to sub" in results[0].notes
+    assert "Improve b" not in results[0].notes
+    assert "feat: Improve b" in results[1].notes
+    assert "Fix a" not in results[1].notes
+    logs = [call.args[1] for call in spawn.call_args_list if "log" in call.args[1]]
+    assert len(logs) == 1
+    assert publish.called
+
+
+def test_bump_monorepo_with_annotated_tags(monorepo, mocker):
+    mocker.patch("molting.main.publish")
+    for tag in ("a-v0.1.0", "b-v0.1.0"):
+        git(monorepo, "tag", "-f", "-a", "-m", tag, tag, f"{tag}^{{}}")
+    make_project(monorepo / "packages" / "a", "a", "0.1.0", notes="")
+    make_project(monorepo / "packages" / "b", "b", "0.1.0", notes="")
+    # Never released
+    make_project(monorepo, "root", "0.1.0", notes="")
+    git(monorepo, "add", "-A")
+    git(monorepo, "commit", "-q", "-m", "chore: Add the package files")
+    results = bump_projects(
+        [monorepo / "packages" / "a", monorepo / "packages" / "b", monorepo],
+        dry_run=True,
+        monorepo=True,
+    )
+    assert "Fix a" in results[0].notes
+    assert "Add a" not in results[0].notes
+    assert "feat: Improve b" in results[1].notes
+    assert "Add b" not in results[1].notes
+    assert "Add b" in results[2].notes
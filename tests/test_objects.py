@@ -0,0 +1,207 @@
+import pytest
+
+import molting.objects
+from conftest import commit, git
+from molting.git import Git
+from molting.history import iter_commits
+from molting.main import get_commit_messages
+from molting.objects import GitReader, PackIndex, UnsupportedRepository, apply_delta
+
+DESCRIPTION = "\n".join(f"Line {number} of a long description" for number in range(200))
+
+
+def git_commits(directory, revision_range):
+    with Git(directory, read_objects=False) as repository:
+        return [
+            (commit.sha, commit.message)
+            for commit in iter_commits(repository, revision_range)
+        ]
+
+
+def reader_commits(directory, start, end="HEAD"):
+    reader = GitReader.open(directory)
+    try:
+        return [
+            (commit.sha, commit.message) for commit in reader.read_range(start, end)
+        ]
+    finally:
+        reader.close()
+
+
+@pytest.fixture
+def history(git_repository):
+    """Branches merged into each other, all committed in the same second."""
+    git(git_repository, "checkout", "-q", "-b", "feature", "v0.1.0")
+    commit(git_repository, "feat: Add a parser\n\nSigned-off-by: Molting <m@m.com>")
+    commit(git_repository, f"Make the parser faster\n\n{DESCRIPTION}")
+    git(git_repository, "checkout", "-q", "main")
+    commit(git_repository, f"Fix the docs\n\n{DESCRIPTION}")
+    git(git_repository, "merge", "-q", "--no-ff", "-m", "Merge feature", "feature")
+    git(git_repository, "tag", "-a", "-m", "Release 0.2.0", "v0.2.0", "feature")
+    commit(git_repository, "Fix a typo")
+    return git_repository
+
+
+@pytest.mark.parametrize(
+    "start,end",
+    [
+        ("v0.1.0", "HEAD"),
+        ("v0.2.0", "HEAD"),
+        ("v0.2.0", "main~2"),
+        ("feature", "main"),
+    ],
+)
+@pytest.mark.parametrize(
+    "repack",
+    [
+        [],
+        ["gc", "-q", "--aggressive"],
+        ["-c", "repack.useDeltaBaseOffset=false", "repack", "-q", "-adf"],
+    ],
+    ids=["loose", "packed", "ref-deltas"],
+)
+def test_read_range_matches_git(history, start, end, repack):
+    if repack:
+        git(history, *repack)
+    if end == "main~2":
+        end = git(history, "rev-parse", "main~2")
+    assert reader_commits(history, start, end) == git_commits(
+        history, f"{start}...{end}"
+    )
+
+
+@pytest.mark.parametrize("scan_names", [0, 64])
+def test_pack_index_find(history, monkeypatch, scan_names):
+    monkeypatch.setattr(molting.objects, "SCAN_NAMES", scan_names)
+    git(history, "gc", "-q")
+    (index,) = (history / ".git" / "objects" / "pack").glob("*.idx")
+    pack = PackIndex(index)
+    for line in git(history, "verify-pack", "-v", str(index)).splitlines():
+        sha, *fields = line.split()
+        if len(sha) == 40:
+            assert pack.find(bytes.fromhex(sha)) == int(fields[3])
+    assert pack.find(b"\xff" * 20) is None
+    assert pack.find(b"\0" * 20) is None
+
+
+def test_resolve(history):
+    git(history, "pack-refs", "--all")
+    commit(history, "Unpacked")
+    reader = GitReader.open(history)
+    assert reader.resolve("HEAD") == git(history, "rev-parse", "HEAD")
+    assert reader.resolve("main") == git(history, "rev-parse", "main")
+    assert reader.resolve("v0.2.0") == git(history, "rev-parse", "v0.2.0")
+    assert reader.resolve("v0.2.0^{commit}") == git(history, "rev-parse", "feature")
+    assert reader.resolve("refs/tags/v0.1.0") == git(history, "rev-parse", "v0.1.0")
+    assert reader.resolve("v9.9.9") is None
+    assert reader.resolve("0" * 40) is None
+    with pytest.raises(UnsupportedRepository):
+        reader.resolve("HEAD~1")
+    with pytest.raises(UnsupportedRepository):
+        reader.resolve("a1b2c3d")
+    reader.close()
+
+
+def test_refs_follow_packed_refs_changes(history):
+    reader = GitReader.open(history)
+    git(history, "pack-refs", "--all")
+    git(history, "tag", "-f", "v0.1.0", "HEAD")
+    git(history, "pack-refs", "--all")
+    assert reader.resolve("v0.1.0") == git(history, "rev-parse", "HEAD")
+    reader.close()
+
+
+def test_is_ancestor(history):
+    reader = GitReader.open(history)
+    assert reader.is_ancestor("v0.1.0", "HEAD")
+    assert reader.is_ancestor("v0.2.0", "main")
+    assert reader.is_ancestor("HEAD", "HEAD")
+    assert not reader.is_ancestor("main", "feature")
+    with pytest.raises(UnsupportedRepository):
+        reader.is_ancestor("v9.9.9", "HEAD")
+    reader.close()
+
+
+def test_root_commit(history):
+    reader = GitReader.open(history)
+    assert reader.root_commit() == git(history, "rev-list", "--max-parents=0", "HEAD")
+    reader.close()
+
+
+def test_read_range_reads_only_what_is_used(git_repository, monkeypatch, mocker):
+    for day in range(1, 21):
+        monkeypatch.setenv("GIT_COMMITTER_DATE", f"2030-01-{day:02} 12:00:00")
+        commit(git_repository, f"Change {day}")
+    reader = GitReader.open(git_repository)
+    read_commit = mocker.spy(reader, "read_commit")
+    commits = reader.read_range("v0.1.0")
+    assert next(commits).message == "Change 20\n"
+    # Only HEAD, the release and the parent of HEAD, out of 22 commits
+    assert len({call.args[0] for call in read_commit.call_args_list}) == 3
+    assert [commit.message for commit in commits][
+        -1
+    ] == "Fix a bug\n\nWith a longer description.\n"
+    reader.close()
+
+
+def test_reads_new_packs(history):
+    reader = GitReader.open(history)
+    assert reader.resolve("HEAD") is not None
+    commit(history, "After the reader opened the packs")
+    git(history, "gc", "-q")
+    assert reader_commits(history, "v0.2.0") == git_commits(history, "v0.2.0...HEAD")
+    assert next(reader.read_range("v0.2.0")).message == (
+        "After the reader opened the packs\n"
+    )
+    reader.close()
+
+
+def test_shallow_clone(history, remote_repository, tmp_path):
+    git(history, "push", "-q", "origin", "main", "--tags")
+    clone = tmp_path / "clone"
+    git(
+        tmp_path,
+        "clone",
+        "-q",
+        "--depth=2",
+        "-b",
+        "main",
+        remote_repository.as_uri(),
+        str(clone),
+    )
+    reader = GitReader.open(clone)
+    # The merge is a root of the shallow history
+    root = git(clone, "rev-list", "--max-parents=0", "HEAD")
+    assert reader.root_commit() == root
+    reader.close()
+    assert reader_commits(clone, root) == git_commits(clone, f"{root}...HEAD")
+
+
+def test_get_commit_messages_falls_back_to_git(history):
+    expected = get_commit_messages("v0.1.0~0", git=Git(history, read_objects=False))
+    with Git(history) as repository:
+        assert get_commit_messages("v0.1.0~0", git=repository) == expected
+        assert repository.spawn_count > 0
+
+
+def test_unsupported_repositories(git_repository, tmp_path):
+    worktree = tmp_path / "worktree"
+    git(git_repository, "worktree", "add", "-q", str(worktree))
+    with pytest.raises(UnsupportedRepository):
+        GitReader.open(worktree)
+    with Git(worktree) as repository:
+        assert repository.reader is None
+        assert get_commit_messages("v0.1.0", git=repository) == [
+            "Improve the docs",
+            "Fix a bug",
+            "With a longer description.",
+        ]
+
+
+def test_apply_delta():
+    base = b"0123456789" * 10
+    # Sizes, copy 10 bytes from offset 5, then insert "abc"
+    delta = bytes([100, 13, 0x91, 5, 10, 3]) + b"abc"
+    assert apply_delta(base, delta) == b"5678901234abc"
+    with pytest.raises(UnsupportedRepository):
+        apply_delta(base, bytes([100, 13, 0]))
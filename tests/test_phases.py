@@ -0,0 +1,71 @@
+import threading
+
+import pytest
+
+from molting.phases import Phase, run_phases
+
+
+def test_run_phases_passes_results():
+    results = run_phases(
+        [
+            Phase("version", lambda inputs: "1.2.3"),
+            Phase("name", lambda inputs: "molting"),
+            Phase(
+                "tag",
+                lambda inputs: f"{inputs['name']}-v{inputs['version']}",
+                ("version", "name"),
+            ),
+        ]
+    )
+    assert results == {"version": "1.2.3", "name": "molting", "tag": "molting-v1.2.3"}
+
+
+def test_run_phases_sequentially():
+    order = []
+    run_phases(
+        [
+            Phase(
+                name,
+                lambda inputs, name=name: order.append(
+                    (name, threading.current_thread())
+                ),
+            )
+            for name in "abc"
+        ],
+        max_workers=1,
+    )
+    # In the calling thread, without starting any
+    assert order == [(name, threading.current_thread()) for name in "abc"]
+
+
+def test_run_phases_concurrently():
+    # Both phases wait for each other, so they only finish if they overlap
+    barrier = threading.Barrier(2, timeout=10)
+    results = run_phases(
+        [
+            Phase("history", lambda inputs: barrier.wait()),
+            Phase("changelog", lambda inputs: barrier.wait()),
+        ]
+    )
+    assert sorted(results.values()) == [0, 1]
+
+
+def test_run_phases_unknown_requirement():
+    with pytest.raises(ValueError, match="requires unknown phases"):
+        run_phases([Phase("tag", lambda inputs: None, ("version",))])
+
+
+def test_run_phases_failure():
+    ran = []
+
+    def fail(inputs):
+        raise RuntimeError("No version")
+
+    with pytest.raises(RuntimeError, match="No version"):
+        run_phases(
+            [
+                Phase("version", fail),
+                Phase("tag", lambda inputs: ran.append("tag"), ("version",)),
+            ]
+        )
+    assert ran == []
@@ -0,0 +1,90 @@
+import json
+
+import pytest
+
+from conftest import commit, git, make_project
+from molting.main import apply, cli, plan
+from molting.plan import BumpPlan
+
+
+@pytest.fixture
+def project(git_repository, remote_repository):
+    make_project(git_repository, "project", "0.1.0")
+    git(git_repository, "add", ".")
+    commit(git_repository, "Fix the packaging")
+    git(git_repository, "push", "-q", "origin", "main")
+    return git_repository
+
+
+def test_plan(project):
+    bump_plan = plan(project)
+    assert (bump_plan.old_version, bump_plan.version) == ("0.1.0", "0.2.0")
+    assert bump_plan.tag == "v0.2.0"
+    assert bump_plan.notes == "- Some changes"
+    assert [planned.path for planned in bump_plan.files] == [
+        "CHANGELOG.md",
+        "pyproject.toml",
+        "src/project/__init__.py",
+    ]
+    assert [step.name for step in bump_plan.commit_steps] == [
+        "add",
+        "commit",
+        "tag v0.2.0",
+    ]
+    assert [step.name for step in bump_plan.push_steps] == ["push", "release v0.2.0"]
+    # Planning changes nothing
+    assert git(project, "status", "--porcelain") == ""
+
+
+def test_plan_round_trip(project, tmp_path):
+    bump_plan = plan(project)
+    bump_plan.save(tmp_path / "plan.json")
+    assert BumpPlan.load(tmp_path / "plan.json") == bump_plan
+    with pytest.raises(ValueError, match="Unsupported plan format"):
+        BumpPlan.from_dict({**bump_plan.to_dict(), "format": 99})
+
+
+def test_apply_in_other_checkout(project, remote_repository, tmp_path, stub_gh, mocker):
+    bump_plan = plan(project)
+    checkout = tmp_path / "checkout"
+    git(tmp_path, "clone", "-q", "-b", "main", str(remote_repository), str(checkout))
+    iter_commits = mocker.patch("molting.history.iter_commits")
+    apply(bump_plan, checkout)
+    iter_commits.assert_not_called()
+    assert 'version = "0.2.0"' in (checkout / "pyproject.toml").read_text()
+    assert git(checkout, "log", "-1", "--format=%s") == "Bump version to v0.2.0"
+    assert git(checkout, "status", "--porcelain") == ""
+    assert git(remote_repository, "tag", "--list", "v0.2.0") == "v0.2.0"
+    assert "release create v0.2.0" in stub_gh.read_text()
+
+
+def test_apply_keeps_changelog_order(project, tmp_path, stub_gh):
+    # Notes taken from the commits are inserted where the release heading is
+    (project / "CHANGELOG.md").write_text("## [Unreleased]\n")
+    git(project, "commit", "-q", "-am", "Empty the changelog")
+    plan(project).save(tmp_path / "plan.json")
+    apply(BumpPlan.load(tmp_path / "plan.json"))
+    changelog = (project / "CHANGELOG.md").read_text()
+    assert changelog.index("## [Unreleased]") < changelog.index("## [0.2.0]")
+    assert changelog.index("## [0.2.0]") < changelog.index("Empty the changelog")
+
+
+def test_apply_refuses_changed_files(project):
+    bump_plan = plan(project)
+    changelog = project / "CHANGELOG.md"
+    changelog.write_text(f"{changelog.read_text()}- Late changes\n")
+    pyproject = (project / "pyproject.toml").read_text()
+    with pytest.raises(ValueError, match="changed since the plan was made"):
+        apply(bump_plan)
+    assert (project / "pyproject.toml").read_text() == pyproject
+    assert git(project, "tag", "--list", "v0.2.0") == ""
+
+
+def test_cli_plan_and_apply(project, tmp_path, capsys):
+    plan_file = tmp_path / "plan.json"
+    cli(["plan", "patch", "-d", str(project), "-o", str(plan_file)])
+    assert json.loads(plan_file.read_text())["version"] == "0.1.1"
+    cli(["apply", str(plan_file), "--dry-run"])
+    output = capsys.readouterr().out
+    assert '-version = "0.1.0"\n+version = "0.1.1"\n' in output
+    assert git(project, "status", "--porcelain") == ""
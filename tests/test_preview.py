@@ -0,0 +1,84 @@
+import difflib
+
+import pytest
+
+from molting import preview
+from molting.files import WritePlan
+from molting.preview import diff_file, diff_plan
+
+TEXT = "".join(f"line {number}\n" for number in range(1, 41))
+
+
+def expected_diff(old, new, label):
+    return list(
+        difflib.unified_diff(
+            old.splitlines(keepends=True),
+            new.splitlines(keepends=True),
+            f"a/{label}",
+            f"b/{label}",
+            lineterm="\n",
+        )
+    )
+
+
+def offset(line):
+    return TEXT.index(f"line {line}\n")
+
+
+@pytest.mark.parametrize("chunk_size", [1, 5, 8192])
+def test_diff_file_matches_difflib(tmp_path, monkeypatch, chunk_size):
+    monkeypatch.setattr(preview, "CHUNK_SIZE", chunk_size)
+    path = tmp_path / "file.txt"
+    path.write_text(TEXT)
+    edits = [
+        # Insertion at the top
+        (0, 0, b"first\n"),
+        # Two nearby edits sharing a hunk
+        (offset(10), offset(11), b"ten\n"),
+        (offset(14), offset(14), b"thirteen and a half\n"),
+        # A separate hunk near the end, removing lines
+        (offset(35), offset(37), b""),
+    ]
+    new = TEXT
+    for start, end, replacement in reversed(edits):
+        new = new[:start] + replacement.decode() + new[end:]
+    assert list(diff_file(path, edits, "file.txt")) == expected_diff(
+        TEXT, new, "file.txt"
+    )
+
+
+def test_diff_file_without_changes(tmp_path):
+    path = tmp_path / "file.txt"
+    path.write_text(TEXT)
+    assert list(diff_file(path, [(0, 7, b"line 1\n")])) == []
+
+
+def test_diff_file_without_trailing_newline(tmp_path):
+    path = tmp_path / "file.txt"
+    path.write_text("one\ntwo")
+    assert list(diff_file(path, [(4, 7, b"three")], "file.txt")) == [
+        "--- a/file.txt\n",
+        "+++ b/file.txt\n",
+        "@@ -1,2 +1,2 @@\n",
+        " one\n",
+        "-two\n",
+        "\\ No newline at end of file\n",
+        "+three\n",
+        "\\ No newline at end of file\n",
+    ]
+
+
+def test_diff_plan(tmp_path):
+    (tmp_path / "b.txt").write_text("version = 1\n")
+    (tmp_path / "a.txt").write_text(TEXT)
+    write_plan = WritePlan()
+    write_plan.write(tmp_path / "b.txt", "version = 2\n")
+    write_plan.stage(tmp_path / "a.txt", [(0, 0, b"first\n")])
+    lines = list(diff_plan(write_plan, tmp_path))
+    assert [line for line in lines if line.startswith("+++")] == [
+        "+++ b/a.txt\n",
+        "+++ b/b.txt\n",
+    ]
+    assert "+version = 2\n" in lines
+    # Nothing is written
+    assert (tmp_path / "b.txt").read_text() == "version = 1\n"
@@ -0,0 +1,89 @@
+import os
+import sys
+from subprocess import CalledProcessError, TimeoutExpired
+
+import pytest
+
+from conftest import git, release_steps
+from molting.git import Git
+from molting.publish import Step, publish
+
+
+def test_release_steps(git_repository, remote_repository, stub_gh):
+    (git_repository / "VERSION").write_text("0.2.0")
+    steps = release_steps([("v0.2.0", "- Notes")], "Bump version to v0.2.0")
+    with Git(git_repository) as repository:
+        publish(steps, git_repository, dry_run=False, git=repository)
+        assert repository.spawn_count == 4
+    assert git(remote_repository, "log", "-1", "--format=%s", "main") == (
+        "Bump version to v0.2.0"
+    )
+    assert git(remote_repository, "rev-parse", "v0.2.0") == git(
+        git_repository, "rev-parse", "HEAD"
+    )
+    assert stub_gh.read_text() == (
+        "release create v0.2.0 --title v0.2.0 --notes-file - --verify-tag\n"
+    )
+    assert (stub_gh.parent / "gh-notes.txt").read_text() == "- Notes"
+
+
+def test_release_steps_for_several_tags(git_repository, remote_repository, stub_gh):
+    (git_repository / "VERSION").write_text("0.2.0")
+    steps = release_steps(
+        [("first-v0.2.0", "- First"), ("second-v1.0.0", "- Second")], "Bump versions"
+    )
+    publish(steps, git_repository, dry_run=False)
+    assert git(remote_repository, "tag", "--list").split() == [
+        "first-v0.2.0",
+        "second-v1.0.0",
+        "v0.1.0",
+    ]
+    assert sorted(stub_gh.read_text().splitlines()) == [
+        "release create first-v0.2.0 --title first-v0.2.0 --notes-file - "
+        "--verify-tag",
+        "release create second-v1.0.0 --title second-v1.0.0 --notes-file - "
+        "--verify-tag",
+    ]
+
+
+def test_failed_push_skips_release(git_repository, stub_gh):
+    (git_repository / "VERSION").write_text("0.2.0")
+    steps = release_steps([("v0.2.0", "- Notes")], "Bump version to v0.2.0")
+    with pytest.raises(CalledProcessError):
+        publish(steps, git_repository, dry_run=False)
+    assert git(git_repository, "rev-parse", "v0.2.0")
+    assert not stub_gh.exists()
+
+
+def test_step_timeout(tmp_path):
+    sleep = Step("sleep", [sys.executable, "-c", "import time; time.sleep(10)"])
+    with pytest.raises(TimeoutExpired):
+        publish([sleep._replace(timeout=0.1)], tmp_path, dry_run=False)
+
+
+def test_failed_step_stops_the_others(tmp_path):
+    sleep = Step(
+        "sleep",
+        [
+            sys.executable,
+            "-c",
+            "import os, time; open('pid', 'w').write(str(os.getpid())); "
+            "time.sleep(10)",
+        ],
+    )
+    fail = Step("fail", [sys.executable, "-c", "import time; time.sleep(0.5); 1 / 0"])
+    with pytest.raises(CalledProcessError):
+        publish([sleep, fail], tmp_path, dry_run=False)
+    with pytest.raises(ProcessLookupError):
+        os.kill(int((tmp_path / "pid").read_text()), 0)
+
+
+def test_unknown_requirement(tmp_path):
+    with pytest.raises(ValueError, match="requires unknown steps"):
+        publish([Step("push", ["true"], ("tag",))], tmp_path, dry_run=False)
+
+
+def test_dry_run(tmp_path, stub_gh):
+    steps = release_steps([("v0.2.0", "- Notes")], "Bump version to v0.2.0")
+    publish(steps, tmp_path, dry_run=True)
+    assert not stub_gh.exists()
@@ -0,0 +1,112 @@
+import json
+import os
+import stat
+import threading
+
+import pytest
+
+import molting
+from conftest import commit, git, make_project
+from molting import server
+from molting.main import cli
+from molting.server import MoltingServer, MoltingService, ServiceError, send_request
+
+
+@pytest.fixture
+def project(git_repository):
+    make_project(git_repository, "project", "0.1.0")
+    git(git_repository, "add", ".")
+    commit(git_repository, "Fix the packaging")
+    return git_repository
+
+
+@pytest.fixture
+def service(tmp_path):
+    socket_path = tmp_path / "molting.sock"
+    service = MoltingService()
+    server = MoltingServer(socket_path, service)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield service, socket_path
+    server.shutdown()
+    server.server_close()
+    service.close()
+
+
+def test_ping(service):
+    _, socket_path = service
+    result = send_request({"command": "ping"}, socket_path, timeout=10)
+    assert result == {"version": molting.__version__, "projects": 0}
+
+
+def test_unknown_command(service):
+    _, socket_path = service
+    with pytest.raises(ServiceError, match="Unknown command 'shed'"):
+        send_request({"command": "shed"}, socket_path, timeout=10)
+
+
+def test_plan_reuses_project(service, project):
+    service, socket_path = service
+    request = {"command": "plan", "project_directory": str(project)}
+    first = send_request(request, socket_path, timeout=30)
+    assert first["old_version"] == "0.1.0"
+    assert first["version"] == "0.2.0"
+    assert first["tag"] == "v0.2.0"
+    assert '-version = "0.1.0"\n+version = "0.2.0"\n' in first["diff"]
+    assert len(first["plan"]["files"]) == 3
+    git_processes = service.registry.get(project).git.spawn_count
+
+    second = send_request(request, socket_path, timeout=30)
+    assert second["diff"] == first["diff"]
+    # Tags, commit messages and parsed files all come from the warm caches
+    assert service.registry.get(project).git.spawn_count == git_processes
+    assert len(service.registry) == 1
+    # Nothing was written
+    assert git(project, "status", "--porcelain") == ""
+
+
+def test_cli_connect(service, project, tmp_path, capsys):
+    _, socket_path = service
+    plan_file = tmp_path / "plan.json"
+    cli(
+        [
+            "--connect",
+            "--socket",
+            str(socket_path),
+            "--dry-run",
+            "-d",
+            str(project),
+            "--plan-file",
+            str(plan_file),
+        ]
+    )
+    output = capsys.readouterr().out
+    assert "+++ b/src/project/__init__.py\n" in output
+    assert f"{project}: 0.1.0 -> 0.2.0" in output
+    assert len(json.loads(plan_file.read_text())["files"]) == 3
+
+
+def test_socket_is_private(service):
+    _, socket_path = service
+    assert stat.S_IMODE(socket_path.stat().st_mode) & 0o077 == 0
+
+
+def test_serve_refuses_socket_of_other_user(tmp_path, monkeypatch):
+    socket_path = tmp_path / "molting.sock"
+    socket_path.write_text("")
+    monkeypatch.setattr(server.os, "getuid", lambda: os.stat(tmp_path).st_uid + 1)
+    with pytest.raises(ServiceError, match="belongs to another user"):
+        server.serve(socket_path)
+    assert socket_path.exists()
+
+
+def test_private_socket_directory(tmp_path, monkeypatch):
+    directory = tmp_path / "molting-1000"
+    monkeypatch.setattr(server, "PRIVATE_SOCKET_DIRECTORY", directory)
+    server._prepare_socket_directory(directory / "molting.sock")
+    assert stat.S_IMODE(directory.stat().st_mode) == 0o700
+    directory.chmod(0o755)
+    with pytest.raises(ServiceError, match="accessible to other users"):
+        server._prepare_socket_directory(directory / "molting.sock")
+    with pytest.raises(ServiceError, match="accessible to other users"):
+        send_request({"command": "ping"}, directory / "molting.sock")
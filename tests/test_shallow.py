@@ -0,0 +1,86 @@
+import pytest
+
+from conftest import commit, git
+from molting import shallow
+from molting.git import Git
+from molting.main import Project, get_commit_messages
+from molting.shallow import deepen_history
+
+
+@pytest.fixture
+def clone(git_repository, remote_repository, tmp_path):
+    """A depth 1 clone without tags, like the checkouts of CI jobs."""
+
+    def make_clone():
+        git(git_repository, "push", "-q", "origin", "main", "--tags")
+        directory = tmp_path / "clone"
+        git(
+            tmp_path,
+            "clone",
+            "-q",
+            "--depth=1",
+            "-b",
+            "main",
+            "--no-tags",
+            remote_repository.as_uri(),
+            str(directory),
+        )
+        return directory
+
+    return make_clone
+
+
+def test_deepen_reaches_release(git_repository, clone):
+    for number in range(10):
+        commit(git_repository, f"Fix bug {number}")
+    directory = clone()
+    with Git(directory) as repository:
+        assert repository.is_shallow
+        deepening = deepen_history(repository, "v0.1.0")
+        # The tag, then `--shallow-since`, which also fetches the commits of
+        # the same second as the tag
+        assert deepening[:3] == ("v0.1.0", True, 2)
+        assert deepening.commits >= 11
+        assert get_commit_messages("v0.1.0", git=repository) == get_commit_messages(
+            "v0.1.0", git=Git(git_repository)
+        )
+        # Reached releases aren't fetched again
+        assert deepen_history(repository, "v0.1.0") is None
+    assert git(directory, "tag", "--list") == "v0.1.0"
+
+
+def test_deepen_backdated_history(git_repository, clone, monkeypatch):
+    monkeypatch.setattr(shallow, "DEEPEN_START", 2)
+    monkeypatch.setenv("GIT_COMMITTER_DATE", "2000-01-01T00:00:00")
+    for number in range(10):
+        commit(git_repository, f"Fix bug {number}")
+    monkeypatch.delenv("GIT_COMMITTER_DATE")
+    directory = clone()
+    with Git(directory) as repository:
+        deepening = deepen_history(repository, "v0.1.0")
+    # The tag, `--shallow-since`, then `--deepen` by 2, 4 and 8 commits
+    assert deepening == ("v0.1.0", True, 5, 13)
+
+
+def test_deepen_unknown_release(clone):
+    with Git(clone()) as repository:
+        assert deepen_history(repository, "v9.9.9") == ("v9.9.9", False, 1, 0)
+
+
+def test_deepen_full_clone(git_repository, remote_repository):
+    with Git(git_repository) as repository:
+        assert not repository.is_shallow
+        assert deepen_history(repository, "v0.1.0") is None
+
+
+def test_project_deepens_shallow_clone(git_repository, clone):
+    commit(git_repository, "feat: Add a feature")
+    project = Project(clone(), dry_run=True)
+    assert project.guess_change_type("v0.1.0") == "minor"
+    assert project.get_commit_messages("v0.1.0") == [
+        "feat: Add a feature",
+        "Improve the docs",
+        "Fix a bug",
+        "With a longer description.",
+    ]
+    project.git.close()
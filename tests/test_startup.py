@@ -0,0 +1,55 @@
+"""Startup time of the `molting` command.
+
+`import molting.main` must not import loguru, asyncio or the other modules
+that are only needed once a message is logged or a release is published,
+and must stay within IMPORT_TIME_BUDGET_US as measured by `python -X importtime`.
+
+Importing loguru eagerly put `import molting.main` at 110-130ms on a shared
+CI container; deferring it brought that down to 50-90ms. The budget leaves
+headroom for slower machines, while the list of deferred modules catches a
+heavy import sneaking back in.
+"""
+import subprocess
+import sys
+
+IMPORT_TIME_BUDGET_US = 150_000
+
+DEFERRED_MODULES = [
+    "argparse",
+    "asyncio",
+    "concurrent.futures",
+    "json",
+    "loguru",
+    "shutil",
+    "tempfile",
+]
+
+
+def test_heavy_modules_are_not_imported():
+    code = (
+        "import sys, molting.main; "
+        f"print(*[name for name in {DEFERRED_MODULES!r} if name in sys.modules])"
+    )
+    result = subprocess.run(
+        [sys.executable, "-c", code], capture_output=True, text=True, check=True
+    )
+    assert result.stdout.split() == []
+
+
+def import_time_us():
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import molting.main"],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    for line in result.stderr.splitlines():
+        _, cumulative, name = line.split("|")
+        if name.strip() == "molting.main":
+            return int(cumulative)
+    raise AssertionError("molting.main wasn't imported")
+
+
+def test_import_time_budget():
+    # The best of a few runs, as the first one may need to compile bytecode
+    assert min(import_time_us() for _ in range(3)) < IMPORT_TIME_BUDGET_US
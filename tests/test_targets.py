@@ -0,0 +1,140 @@
+from pathlib import Path
+
+from molting.main import Project
+from molting.targets import VersionTargetIndex, discover_init_files
+
+
+def make_tree(root, paths):
+    for path, text in paths.items():
+        (root / path).parent.mkdir(parents=True, exist_ok=True)
+        (root / path).write_text(text)
+
+
+def test_discover_init_files_prunes_directories(tmp_path):
+    make_tree(
+        tmp_path,
+        {
+            "pkg/__init__.py": "",
+            "pkg/sub/__init__.py": "",
+            "pkg/sub/module.py": "",
+            "pkg/_vendor/lib/__init__.py": "",
+            "pkg/__pycache__/__init__.py": "",
+            "pkg/.hidden/__init__.py": "",
+        },
+    )
+    found = sorted(p.relative_to(tmp_path) for p in discover_init_files(tmp_path))
+    assert found == [Path("pkg/__init__.py"), Path("pkg/sub/__init__.py")]
+
+
+def test_version_files_are_cached(tmp_path, mocker):
+    make_tree(
+        tmp_path,
+        {"pkg/__init__.py": '__version__ = "0.1.0"', "pkg/sub/__init__.py": ""},
+    )
+    index = VersionTargetIndex([tmp_path / "pkg"])
+    assert index.version_files() == [tmp_path / "pkg" / "__init__.py"]
+    read_bytes = mocker.spy(Path, "read_bytes")
+    assert index.version_files() == [tmp_path / "pkg" / "__init__.py"]
+    assert read_bytes.call_count == 0
+
+
+def test_version_files_are_saved(tmp_path, mocker):
+    make_tree(
+        tmp_path,
+        {"pkg/__init__.py": '__version__ = "0.1.0"', "pkg/sub/__init__.py": ""},
+    )
+    manifest_path = tmp_path / ".git" / "molting" / "version-files.json"
+    index = VersionTargetIndex([tmp_path / "pkg"], manifest_path=manifest_path)
+    assert index.version_files() == [tmp_path / "pkg" / "__init__.py"]
+    assert manifest_path.exists()
+    read_bytes = mocker.spy(Path, "read_bytes")
+    index = VersionTargetIndex([tmp_path / "pkg"], manifest_path=manifest_path)
+    assert index.version_files() == [tmp_path / "pkg" / "__init__.py"]
+    assert read_bytes.call_count == 0
+    (tmp_path / "pkg" / "sub" / "__init__.py").write_text('__version__ = "0.1.0"')
+    index = VersionTargetIndex([tmp_path / "pkg"], manifest_path=manifest_path)
+    assert len(index.version_files()) == 2
+    assert read_bytes.call_count == 1
+
+
+def test_project_searches_pruned_directories(git_repository):
+    make_tree(
+        git_repository,
+        {
+            "src/project/__init__.py": '__version__ = "0.1.0"',
+            "src/project/generated/__init__.py": '__version__ = "0.1.0"',
+        },
+    )
+    project = Project(git_repository, dry_run=False)
+    assert project.get_version_index("project").version_files() == [
+        git_repository / "src/project/__init__.py"
+    ]
+    project = Project(git_repository, dry_run=False, searched_directories=["generated"])
+    assert sorted(project.get_version_index("project").version_files()) == [
+        git_repository / "src/project/__init__.py",
+        git_repository / "src/project/generated/__init__.py",
+    ]
+    assert (git_repository / ".git/molting/version-files.json").exists()
+
+
+def test_rewrite_skips_unchanged_files(tmp_path):
+    make_tree(
+        tmp_path,
+        {
+            "pkg/__init__.py": '__version__ = "0.1.0"',
+            "pkg/sub/__init__.py": '__version__ = "0.2.0"',
+        },
+    )
+    unchanged = tmp_path / "pkg" / "sub" / "__init__.py"
+    mtime = unchanged.stat().st_mtime_ns
+    changed = VersionTargetIndex([tmp_path / "pkg"]).rewrite("0.2.0", dry_run=False)
+    assert changed == [tmp_path / "pkg" / "__init__.py"]
+    assert unchanged.stat().st_mtime_ns == mtime
+    assert (tmp_path / "pkg" / "__init__.py").read_text() == '__version__ = "0.2.0"'
+
+
+def test_update_init_with_version_targets(tmp_path):
+    make_tree(
+        tmp_path,
+        {
+            "src/project/__init__.py": '__version__ = "0.1.0"',
+            "src/project/_version.py": '__version__ = "0.1.0"',
+        },
+    )
+    project = Project(
+        tmp_path, dry_run=False, version_targets=[Path("src/project/_version.py")]
+    )
+    project.update_init("0.2.0", "project")
+    assert (tmp_path / "src/project/_version.py").read_text() == (
+        '__version__ = "0.2.0"'
+    )
+    assert (tmp_path / "src/project/__init__.py").read_text() == (
+        '__version__ = "0.1.0"'
+    )
+
+
+def test_rewrite_manifests(tmp_path):
+    make_tree(
+        tmp_path,
+        {
+            "package.json": (
+                '{\n  "version": "0.1.0",\n  "dependencies": {"a": "0.1.0"}\n}\n'
+            ),
+            "VERSION": "0.1.0\n",
+            "Cargo.toml": (
+                "[package]\nversion = '0.1.0'\n[dependencies]\nversion = '0.1.0'\n"
+            ),
+        },
+    )
+    index = VersionTargetIndex(
+        [tmp_path / "package.json", tmp_path / "VERSION", tmp_path / "Cargo.toml"]
+    )
+    assert len(index.version_files()) == 3
+    assert len(index.rewrite("0.2.0", dry_run=False)) == 3
+    assert (tmp_path / "package.json").read_text() == (
+        '{\n  "version": "0.2.0",\n  "dependencies": {"a": "0.1.0"}\n}\n'
+    )
+    assert (tmp_path / "VERSION").read_text() == "0.2.0\n"
+    assert (tmp_path / "Cargo.toml").read_text() == (
+        "[package]\nversion = '0.2.0'\n[dependencies]\nversion = '0.1.0'\n"
+    )
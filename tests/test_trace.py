@@ -0,0 +1,91 @@
+import json
+
+import pytest
+
+from molting import trace
+from molting.git import Git
+
+
+def read_events(path):
+    return json.loads(path.read_text())
+
+
+def read_events_so_far(path):
+    # Chrome and Perfetto accept a trace whose closing bracket is missing
+    return json.loads(f"{path.read_text()}]")
+
+
+@pytest.fixture
+def trace_file(tmp_path):
+    path = tmp_path / "trace.json"
+    trace.enable(path)
+    yield path
+    trace.disable()
+
+
+def test_span_disabled():
+    assert not trace.is_enabled()
+    with trace.span("phase", detail=1) as details:
+        details["extra"] = 2
+    assert details == {"detail": 1, "extra": 2}
+
+
+def test_span(trace_file):
+    with trace.span("outer", project="first") as details:
+        with trace.span("inner"):
+            trace_file.parent.joinpath("data").write_text("x" * 100)
+        details["result"] = "done"
+    trace.disable()
+    inner, outer = read_events(trace_file)
+    assert inner["name"] == "inner"
+    assert outer["name"] == "outer"
+    assert outer["ph"] == "X"
+    assert outer["cat"] == "phase"
+    assert outer["args"]["project"] == "first"
+    assert outer["args"]["result"] == "done"
+    assert outer["ts"] <= inner["ts"]
+    assert outer["dur"] >= inner["dur"]
+    assert outer["args"]["cpu_ms"] >= 0
+    if "written_bytes" in inner["args"]:
+        assert inner["args"]["written_bytes"] >= 100
+
+
+def test_trace_file_is_loadable_while_tracing(trace_file):
+    assert read_events_so_far(trace_file) == []
+    with trace.span("first"):
+        pass
+    with trace.span("second"):
+        pass
+    assert [event["name"] for event in read_events_so_far(trace_file)] == [
+        "first",
+        "second",
+    ]
+    trace.disable()
+    assert trace_file.read_text().count("\n") == 4
+    assert len(read_events(trace_file)) == 2
+
+
+def test_span_records_errors(trace_file):
+    with pytest.raises(KeyError):
+        with trace.span("failing"):
+            raise KeyError("missing")
+    trace.disable()
+    (event,) = read_events(trace_file)
+    assert event["args"]["error"] == "KeyError"
+
+
+def test_git_processes_are_traced(git_repository, trace_file):
+    with Git(git_repository, read_objects=False) as repository:
+        repository.run("rev-parse", "HEAD")
+        repository.run("rev-parse", "v9.9.9")
+        repository.resolve("HEAD")
+    trace.disable()
+    found, missing, batch = read_events(trace_file)
+    assert found["name"] == "git rev-parse"
+    assert found["cat"] == "subprocess"
+    assert found["args"]["exit_code"] == 0
+    assert found["args"]["stdout_bytes"] == 41
+    assert missing["args"]["exit_code"] != 0
+    assert batch["name"] == "git cat-file --batch-check"
+    assert batch["args"]["queries"] == 1
+    assert batch["args"]["exit_code"] == 0
@@ -0,0 +1,117 @@
+import pytest
+
+from conftest import git
+from molting.git import Git
+from molting.version import TagIndex, Version
+
+
+@pytest.mark.parametrize(
+    "text,expected",
+    [
+        ("1.2.3", Version(1, 2, 3)),
+        ("v1.2", Version(1, 2, 0)),
+        ("1.0.0-rc.1", Version(1, 0, 0, ("rc", "1"))),
+        ("1.0.0-rc.1+build.5", Version(1, 0, 0, ("rc", "1"), ("build", "5"))),
+        ("1.1.0rc1", Version(1, 1, 0, ("rc1",))),
+    ],
+)
+def test_parse(text, expected):
+    version = Version.parse(text)
+    assert version == expected
+    assert version.build == expected.build
+
+
+@pytest.mark.parametrize("text", ["", "1", "1.2.3.4", "1.x", "v1.2.3-"])
+def test_parse_invalid(text):
+    with pytest.raises(ValueError):
+        Version.parse(text)
+
+
+def test_parse_is_cached():
+    assert Version.parse("4.5.6") is Version.parse("4.5.6")
+
+
+def test_str():
+    assert str(Version.parse("v0.1")) == "0.1.0"
+    assert str(Version.parse("1.0.0-rc.1+abc")) == "1.0.0-rc.1+abc"
+
+
+def test_immutable():
+    with pytest.raises(AttributeError):
+        Version.parse("1.2.3").major = 2
+
+
+def test_ordering():
+    texts = [
+        "1.0.0",
+        "0.9.0",
+        "1.0.0-rc.1",
+        "1.0.0-alpha",
+        "1.0.0-alpha.beta",
+        "1.0.0-alpha.1",
+        "1.0.0-rc.11",
+        "1.0.0-rc.2",
+        "0.10.0",
+    ]
+    assert [str(version) for version in sorted(map(Version.parse, texts))] == [
+        "0.9.0",
+        "0.10.0",
+        "1.0.0-alpha",
+        "1.0.0-alpha.1",
+        "1.0.0-alpha.beta",
+        "1.0.0-rc.1",
+        "1.0.0-rc.2",
+        "1.0.0-rc.11",
+        "1.0.0",
+    ]
+
+
+def test_build_metadata_is_ignored_when_comparing():
+    assert Version.parse("1.0.0+a") == Version.parse("1.0.0+b")
+    assert len({Version.parse("1.0.0+a"), Version.parse("1.0.0")}) == 1
+
+
+def test_bump_drops_prerelease():
+    assert str(Version.parse("1.0.1-rc.1+abc").bump("patch")) == "1.0.1"
+    with pytest.raises(ValueError):
+        Version.parse("1.0.0").bump("micro")
+
+
+@pytest.mark.parametrize(
+    "text,version_part,expected",
+    [
+        ("1.1.0rc1", "minor", "1.1.0"),
+        ("1.1.0-rc.1", "minor", "1.1.0"),
+        ("1.1.0-rc.1", "patch", "1.1.0"),
+        ("1.1.0-rc.1", "major", "2.0.0"),
+        ("1.1.1-rc.1", "minor", "1.2.0"),
+        ("2.0.0-beta.2", "minor", "2.0.0"),
+        ("2.0.0-beta.2", "major", "2.0.0"),
+        ("1.1.0", "minor", "1.2.0"),
+    ],
+)
+def test_bump_releases_prerelease(text, version_part, expected):
+    assert str(Version.parse(text).bump(version_part)) == expected
+
+
+def test_tag_index():
+    tags = TagIndex(["v0.10.0", "v0.9.0", "v1.0.0-rc.1", "nightly", "vfoo", "v0.2"])
+    assert tags.tags == ["v0.2", "v0.9.0", "v0.10.0", "v1.0.0-rc.1"]
+    assert tags.latest() == "v1.0.0-rc.1"
+    assert tags.previous_release(Version.parse("0.10.0")) == "v0.10.0"
+    assert tags.previous_release(Version.parse("0.9.5")) == "v0.9.0"
+    assert tags.previous_release(Version.parse("0.1.0")) is None
+
+
+def test_tag_index_prefix():
+    tags = TagIndex(["api-v1.0.0", "cli-v2.0.0", "v3.0.0"], prefix="api-")
+    assert tags.tags == ["api-v1.0.0"]
+
+
+def test_tag_index_from_git(git_repository):
+    git(git_repository, "tag", "v0.0.1")
+    git(git_repository, "tag", "other")
+    with Git(git_repository) as repository:
+        tags = TagIndex.from_git(repository)
+        assert tags.tags == ["v0.0.1", "v0.1.0"]
+        assert repository.spawn_count == 1